@@ -6,7 +6,8 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import User, Game, Developer, Category, UserLibrary, Review, Notification
+from . import jobs
+from .models import User, Game, Developer, Category, UserLibrary, Review, Notification, ChangeLog, ExportJob
 
 
 @admin.register(User)
@@ -40,10 +41,6 @@ class DeveloperAdmin(admin.ModelAdmin):
     search_fields = ['name', 'country']
     readonly_fields = ['logo_preview']
 
-    def game_count(self, obj):
-        return obj.games.count()
-    game_count.short_description = 'Juegos'
-
     def logo_preview(self, obj):
         if obj.logo:
             return format_html('<img src="{}" width="100" />', obj.logo.url)
@@ -57,10 +54,6 @@ class CategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'game_count', 'icon']
     search_fields = ['name']
 
-    def game_count(self, obj):
-        return obj.games.count()
-    game_count.short_description = 'Juegos'
-
 
 @admin.register(Game)
 class GameAdmin(admin.ModelAdmin):
@@ -69,7 +62,8 @@ class GameAdmin(admin.ModelAdmin):
                    'total_reviews', 'cover_preview', 'created_at']
     list_filter = ['release_date', 'developer', 'categories', 'created_at']
     search_fields = ['title', 'description', 'developer__name']
-    readonly_fields = ['rating', 'total_reviews', 'created_at', 'updated_at', 'cover_preview']
+    readonly_fields = ['rating', 'total_reviews', 'stars_1', 'stars_2', 'stars_3', 'stars_4',
+                      'stars_5', 'created_at', 'updated_at', 'cover_preview']
     filter_horizontal = ['categories']
     date_hierarchy = 'release_date'
     fieldsets = (
@@ -80,7 +74,8 @@ class GameAdmin(admin.ModelAdmin):
             'fields': ('developer', 'categories', 'release_date', 'price', 'steam_url')
         }),
         ('Estadísticas', {
-            'fields': ('rating', 'total_reviews', 'created_at', 'updated_at')
+            'fields': ('rating', 'total_reviews', ('stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5'),
+                       'created_at', 'updated_at')
         }),
     )
 
@@ -121,6 +116,56 @@ class NotificationAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
 
 
+@admin.register(ChangeLog)
+class ChangeLogAdmin(admin.ModelAdmin):
+    """Admin para el registro de cambios de la sincronización"""
+    list_display = ['id', 'kind', 'object_id', 'user', 'created_at']
+    list_filter = ['kind', 'created_at']
+    readonly_fields = ['kind', 'object_id', 'user', 'created_at']
+    date_hierarchy = 'created_at'
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    """Admin para exportaciones en segundo plano: al crear una se encola"""
+    list_display = ['dataset', 'file_format', 'requested_by', 'status', 'progress', 'rows_per_second',
+                    'created_at', 'download_link']
+    list_filter = ['status', 'dataset', 'file_format']
+    readonly_fields = ['requested_by', 'status', 'total_rows', 'processed_rows', 'progress', 'rows_per_second',
+                      'download_link', 'error', 'created_at', 'started_at', 'finished_at']
+
+    def get_fields(self, request, obj=None):
+        if obj is None:
+            return ['dataset', 'file_format']
+        return ['dataset', 'file_format', *self.readonly_fields]
+
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None:
+            return []
+        return ['dataset', 'file_format', *self.readonly_fields]
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.requested_by = request.user
+        super().save_model(request, obj, form, change)
+        if not change:
+            jobs.enqueue(obj)
+
+    def progress(self, obj):
+        return f'{obj.percent_complete}% ({obj.processed_rows}/{obj.total_rows})'
+    progress.short_description = 'Avance'
+
+    def rows_per_second(self, obj):
+        return obj.rows_per_second
+    rows_per_second.short_description = 'Filas/s'
+
+    def download_link(self, obj):
+        if obj.status != 'done':
+            return '-'
+        return format_html('<a href="{}">Descargar</a>', reverse('export-job-download', kwargs={'pk': obj.pk}))
+    download_link.short_description = 'Archivo'
+
+
 # Personalización del sitio admin
 admin.site.site_header = "Administración de Biblioteca Steam"
 admin.site.site_title = "Biblioteca Steam Admin"
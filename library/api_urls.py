@@ -5,7 +5,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .api_views import (
     GameViewSet, ReviewViewSet, UserLibraryViewSet,
-    DeveloperViewSet, CategoryViewSet
+    DeveloperViewSet, CategoryViewSet, SyncViewSet, ExportJobViewSet
 )
 
 router = DefaultRouter()
@@ -14,6 +14,8 @@ router.register(r'reviews', ReviewViewSet, basename='review')
 router.register(r'library', UserLibraryViewSet, basename='library')
 router.register(r'developers', DeveloperViewSet, basename='developer')
 router.register(r'categories', CategoryViewSet, basename='category')
+router.register(r'sync', SyncViewSet, basename='sync')
+router.register(r'export-jobs', ExportJobViewSet, basename='export-job')
 
 urlpatterns = [
     path('', include(router.urls)),
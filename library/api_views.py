@@ -1,29 +1,105 @@
 """
 Vistas de la API REST
 """
-from rest_framework import viewsets, filters, status
+from decimal import Decimal
+from itertools import islice
+
+from rest_framework import mixins, viewsets, filters, status
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.settings import api_settings
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count
-from .models import Game, Review, UserLibrary, Developer, Category
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from . import autocomplete, fast_serializers, jobs, sync
+from .caching import (
+    CATEGORIES, DEVELOPERS, GAMES, HOME_SECTIONS, REVIEWS, bump_version, user_library
+)
+from .conditional import ConditionalGetMixin
+from .exports import LIBRARY_COLUMNS, REVIEW_COLUMNS, ExportMixin
+from .fast_serializers import FastGameSerializer, FastReviewSerializer
+from .filters import FullTextSearchFilter, RelevanceOrderingFilter
+from .models import MAX_ID, Game, Review, UserLibrary, UserStats, Developer, Category, ChangeLog, ExportJob
+from .pagination import KeysetPagination
+from .parsers import NDJSONParser
+from .payloads import cached_payloads, light_queryset
+from .renderers import NDJSONRenderer
+from .sparse import FIELDS_PARAM, OMIT_PARAM, SparseFieldsetMixin
 from .serializers import (
     GameSerializer, ReviewSerializer, UserLibrarySerializer,
-    DeveloperSerializer, CategorySerializer
+    DeveloperSerializer, CategorySerializer, BulkReviewSerializer, BulkLibraryOperationSerializer,
+    ExportJobSerializer
 )
 
+BULK_CHUNK_SIZE = 1000
+# Filas que se leen de la base de datos por vuelta al exportar en streaming
+STREAM_CHUNK_SIZE = 500
+# Máximo de juegos por petición en /api/games/batch/
+MAX_BATCH_SIZE = 100
+# Máximo de operaciones por petición en /api/library/bulk/
+MAX_BULK_OPERATIONS = 1000
+
 
-class GameViewSet(viewsets.ModelViewSet):
+class GameViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet para juegos"""
+    # Los contadores de reseñas se actualizan sin guardar el juego
+    version_names = [GAMES, REVIEWS, DEVELOPERS, CATEGORIES]
     queryset = Game.objects.select_related('developer').prefetch_related('categories').all()
     serializer_class = GameSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, RelevanceOrderingFilter]
     filterset_fields = ['developer', 'categories']
     search_fields = ['title', 'description', 'developer__name']
     ordering_fields = ['title', 'release_date', 'rating']
-    ordering = ['-release_date']
+    ordering = ['-release_date', 'title']
+    pagination_class = KeysetPagination
+
+    def list(self, request, *args, **kwargs):
+        """Lista armada desde la caché de representaciones; solo los ausentes se serializan"""
+        response = self.not_modified(request)
+        if response is not None:
+            return response
+        games = light_queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(games)
+        data = self.cached_data(games if page is None else page, fast=fast_serializers.enabled())
+        return Response(data) if page is None else self.get_paginated_response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        response = self.not_modified(request)
+        if response is not None:
+            return response
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        game = get_object_or_404(light_queryset(self.get_queryset()),
+                                 **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, game)
+        return Response(self.cached_data([game])[0])
+
+    def cached_data(self, games, fast=False):
+        request = self.request
+        context = self.get_serializer_context()
+        if fast:
+            serializer = FastGameSerializer(context)
+
+            def render(ids):
+                return {data['id']: data for data in serializer.serialize(Game.objects.filter(pk__in=ids))}
+        else:
+            serializer_class = self.get_serializer_class()
+
+            def render(ids):
+                return {
+                    pk: serializer_class(game, context=context).data
+                    for pk, game in self.sparse_queryset(self.get_queryset()).in_bulk(ids).items()
+                }
+        # Las URLs de las imágenes son absolutas (dependen del host) y cada
+        # combinación de campos parciales se cachea por separado
+        variant = f'{request.scheme}://{request.get_host()}|{request.query_params.get(FIELDS_PARAM, "*")}' \
+                  f'|{request.query_params.get(OMIT_PARAM, "")}'
+        return cached_payloads(games, render, variant=variant)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def add_to_library(self, request, pk=None):
@@ -39,53 +115,449 @@ class GameViewSet(viewsets.ModelViewSet):
         return Response({'detail': 'Juego ya está en tu biblioteca'}, 
                        status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=True, methods=['get'])
+    # El POST es solo de lectura (para listas largas de ids)
+    @action(detail=False, methods=['get', 'post'], permission_classes=[AllowAny])
+    def batch(self, request):
+        """Varios juegos en una sola petición (?ids=1,2,3 o POST {"ids": [...]}).
+
+        Los resultados salen en el orden pedido y los ids inexistentes se
+        informan en ``missing``. Usa la misma caché de representaciones que el
+        detalle: solo los juegos ausentes se cargan, con un select_related y un
+        prefetch para todo el lote.
+        """
+        if request.method == 'GET':
+            response = self.not_modified(request)
+            if response is not None:
+                return response
+            raw_ids = request.query_params.get('ids', '').split(',')
+        else:
+            raw_ids = request.data.get('ids') if isinstance(request.data, dict) else None
+            if not isinstance(raw_ids, list):
+                return Response({'detail': 'Se esperaba {"ids": [...]}.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in raw_ids if str(pk).strip()))
+        except (TypeError, ValueError):
+            return Response({'detail': 'Los ids deben ser números enteros.'}, status=status.HTTP_400_BAD_REQUEST)
+        # Un id fuera del rango de BigAutoField hace fallar la consulta en vez de no encontrar nada
+        if any(not 0 < pk <= MAX_ID for pk in ids):
+            return Response({'detail': f'Los ids deben estar entre 1 y {MAX_ID}.'},
+                           status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > MAX_BATCH_SIZE:
+            return Response({'detail': f'Se permiten como máximo {MAX_BATCH_SIZE} ids por petición.'},
+                           status=status.HTTP_400_BAD_REQUEST)
+
+        found = light_queryset(self.get_queryset()).in_bulk(ids)
+        games = [found[pk] for pk in ids if pk in found]
+        return Response({
+            'results': self.cached_data(games, fast=fast_serializers.enabled()),
+            'missing': [pk for pk in ids if pk not in found],
+        })
+
+    @action(detail=False, methods=['get'], url_path='autocomplete')
+    def autocomplete_titles(self, request):
+        """Sugerencias de juegos y desarrolladores para un prefijo (?prefix=&limit=)"""
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({'detail': 'limit debe ser un número entero.'},
+                           status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, autocomplete.MAX_LIMIT))
+        prefix = request.query_params.get('prefix', '')
+        return Response(autocomplete.suggest(prefix, limit=limit))
+
+    @action(detail=True, methods=['get'],
+            renderer_classes=api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer])
     def reviews(self, request, pk=None):
-        """Obtener reseñas de un juego"""
-        game = self.get_object()
-        reviews = game.reviews.select_related('user').all()
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data)
+        """Reseñas de un juego paginadas por cursor.
+
+        Con ``?format=ndjson`` (o ``Accept: application/x-ndjson``) se envían
+        todas en streaming, una por línea, leyendo la base de datos por lotes
+        con ``iterator()``: la memoria no crece con el número de reseñas.
+        """
+        game = get_object_or_404(Game.objects.only('pk'), pk=pk)
+        self.check_object_permissions(request, game)
+        reviews = Review.objects.filter(game_id=game.pk).select_related('user', 'game') \
+            .order_by('-created_at', '-id')
+        context = self.get_serializer_context()
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            response = StreamingHttpResponse(
+                self._stream_reviews(reviews, context), content_type=NDJSONRenderer.media_type
+            )
+            response['X-Accel-Buffering'] = 'no'
+            return response
+        page = self.paginate_queryset(reviews)
+        return self.get_paginated_response(ReviewSerializer(page, many=True, context=context).data)
 
+    def _stream_reviews(self, reviews, context):
+        """Líneas NDJSON serializadas por lotes de STREAM_CHUNK_SIZE filas"""
+        if fast_serializers.enabled():
+            serializer = FastReviewSerializer(context)
+            rows = serializer.values(reviews).iterator(chunk_size=STREAM_CHUNK_SIZE)
+            serialize = serializer.serialize_rows
+        else:
+            rows = reviews.iterator(chunk_size=STREAM_CHUNK_SIZE)
 
-class ReviewViewSet(viewsets.ModelViewSet):
+            def serialize(chunk):
+                return ReviewSerializer(chunk, many=True, context=context).data
+        renderer = NDJSONRenderer()
+        while True:
+            chunk = list(islice(rows, STREAM_CHUNK_SIZE))
+            if not chunk:
+                return
+            yield from renderer.render_lines(serialize(chunk))
+
+
+class ReviewViewSet(ExportMixin, ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet para reseñas"""
+    version_names = [REVIEWS, GAMES]
+    export_columns = REVIEW_COLUMNS
+    export_filename = 'resenas'
     queryset = Review.objects.select_related('user', 'game').all()
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['game', 'user', 'rating']
     ordering_fields = ['created_at', 'rating']
-    ordering = ['-created_at']
+    ordering = ['-created_at', '-id']
+    pagination_class = KeysetPagination
+
+    def list(self, request, *args, **kwargs):
+        response = self.not_modified(request)
+        if response is not None:
+            return response
+        if not fast_serializers.enabled():
+            return super().list(request, *args, **kwargs)
+        # Modo rápido: se pagina directamente sobre filas de values()
+        serializer = FastReviewSerializer(self.get_serializer_context())
+        rows = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        data = serializer.serialize_rows(rows if page is None else page)
+        return Response(data) if page is None else self.get_paginated_response(data)
+
+    def get_export_queryset(self):
+        """El staff exporta todas las reseñas (con los filtros del listado); el resto, solo las suyas"""
+        queryset = super().get_export_queryset()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(user=self.request.user)
+        return queryset
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated],
+            parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Importar reseñas en bloque (arreglo JSON o NDJSON).
+
+        Las filas se insertan con bulk_create por lotes y la calificación de
+        cada juego afectado se recalcula una sola vez al final. Responde 201 si
+        se creó alguna reseña, 400 si todas las filas fallaron y 200 si el
+        cuerpo estaba vacío.
+        """
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({'detail': 'Se esperaba un arreglo JSON o un cuerpo NDJSON.'},
+                           status=status.HTTP_400_BAD_REQUEST)
+
+        errors = []
+        created = 0
+        seen = set()
+        affected_games = set()
+        affected_users = set()
+        inserted = []
+        with transaction.atomic():
+            for start in range(0, len(rows), BULK_CHUNK_SIZE):
+                pending = self._validate_bulk_chunk(rows, start, seen, errors)
+                Review.objects.bulk_create([review for _, review in pending], batch_size=BULK_CHUNK_SIZE,
+                                           ignore_conflicts=True)
+                reviews = self._inserted_reviews(pending, errors)
+                inserted.extend(reviews)
+                created += len(reviews)
+                affected_games.update(review.game_id for review in reviews)
+                affected_users.update(review.user_id for review in reviews)
+            # bulk_create no emite señales: recalcular e invalidar la portada y la API explícitamente
+            Game.recompute_ratings(affected_games)
+            UserStats.recompute(affected_users)
+            review_ids = {}
+            for review in inserted:
+                review_ids.setdefault(review.user_id, []).append(review.pk)
+            for user_id, ids in review_ids.items():
+                ChangeLog.record('review', ids, user_id)
+            transaction.on_commit(lambda: [bump_version(name) for name in (HOME_SECTIONS, REVIEWS)])
+
+        errors.sort(key=lambda error: error['index'])
+        if created:
+            response_status = status.HTTP_201_CREATED
+        elif errors:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_200_OK
+        return Response({'created': created, 'errors': errors}, status=response_status)
+
+    def _validate_bulk_chunk(self, rows, start, seen, errors):
+        """Valida un lote de filas y descarta duplicados con consultas por conjunto"""
+        user = self.request.user
+        candidates = []
+        for index, row in enumerate(rows[start:start + BULK_CHUNK_SIZE], start=start):
+            serializer = BulkReviewSerializer(data=row)
+            if not serializer.is_valid():
+                errors.append({'index': index, 'errors': serializer.errors})
+                continue
+            data = serializer.validated_data
+            if 'user' in data and not user.is_staff:
+                errors.append({'index': index, 'errors': {
+                    'user': ['Solo el staff puede importar reseñas de otros usuarios.']}})
+                continue
+            candidates.append((index, data.pop('user', user.pk), data))
 
-class UserLibraryViewSet(viewsets.ModelViewSet):
+        game_ids = {data['game'] for _, _, data in candidates}
+        user_ids = {user_id for _, user_id, _ in candidates}
+        valid_games = set(Game.objects.filter(pk__in=game_ids).values_list('pk', flat=True))
+        valid_users = set(get_user_model().objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+        existing = set(Review.objects.filter(user_id__in=user_ids, game_id__in=game_ids)
+                       .values_list('user_id', 'game_id'))
+
+        reviews = []
+        for index, user_id, data in candidates:
+            key = (user_id, data['game'])
+            if data['game'] not in valid_games:
+                errors.append({'index': index, 'errors': {'game': ['El juego no existe.']}})
+            elif user_id not in valid_users:
+                errors.append({'index': index, 'errors': {'user': ['El usuario no existe.']}})
+            elif key in existing or key in seen:
+                errors.append({'index': index, 'errors': {
+                    'non_field_errors': ['El usuario ya tiene una reseña para este juego.']}})
+            else:
+                seen.add(key)
+                reviews.append((index, Review(
+                    user_id=user_id,
+                    game_id=data['game'],
+                    rating=data['rating'],
+                    comment=data['comment'],
+                    is_helpful=data.get('is_helpful', 0),
+                )))
+        return reviews
+
+    def _inserted_reviews(self, pending, errors):
+        """Reseñas del lote que bulk_create realmente insertó.
+
+        ``ignore_conflicts`` descarta sin avisar las filas que una escritura
+        concurrente insertó primero: se comparan con lo guardado para cada par
+        (usuario, juego) y las descartadas se informan como duplicadas.
+        """
+        if not pending:
+            return []
+        stored = {
+            (user_id, game_id): (pk, rating, comment)
+            for pk, user_id, game_id, rating, comment in Review.objects.filter(
+                user_id__in={review.user_id for _, review in pending},
+                game_id__in={review.game_id for _, review in pending},
+            ).values_list('pk', 'user_id', 'game_id', 'rating', 'comment')
+        }
+        inserted = []
+        for index, review in pending:
+            pk, *values = stored.get((review.user_id, review.game_id), (None, None, None))
+            if values == [review.rating, review.comment]:
+                review.pk = pk
+                inserted.append(review)
+            else:
+                errors.append({'index': index, 'errors': {
+                    'non_field_errors': ['El usuario ya tiene una reseña para este juego.']}})
+        return inserted
+
+
+class UserLibraryViewSet(ExportMixin, ConditionalGetMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet para biblioteca de usuario"""
     serializer_class = UserLibrarySerializer
     permission_classes = [IsAuthenticated]
+    export_columns = LIBRARY_COLUMNS
+    export_filename = 'biblioteca'
+
+    def get_version_names(self):
+        return [user_library(self.request.user.pk), GAMES]
 
     def get_queryset(self):
         return UserLibrary.objects.filter(user=self.request.user).select_related('game')
 
+    def get_export_queryset(self):
+        """El staff puede exportar la biblioteca de otro usuario con ?user=<id>"""
+        user_id = self.request.query_params.get('user', '')
+        if self.request.user.is_staff and user_id.isdigit():
+            return UserLibrary.objects.filter(user_id=user_id)
+        return super().get_export_queryset()
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Sincronizar la biblioteca con una lista de operaciones (arreglo JSON o NDJSON).
+
+        Cada operación es ``{"op": "add"|"set"|"remove", "game": id, ...campos}``.
+        Todas (hasta MAX_BULK_OPERATIONS) se aplican en una transacción con un
+        bulk_create, un bulk_update y un solo delete, y la respuesta trae un
+        resultado por operación.
+        """
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response({'detail': 'Se esperaba un arreglo JSON o un cuerpo NDJSON.'},
+                           status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > MAX_BULK_OPERATIONS:
+            return Response({'detail': f'Se permiten como máximo {MAX_BULK_OPERATIONS} operaciones por petición.'},
+                           status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(rows)
+        operations = {}
+        for index, row in enumerate(rows):
+            serializer = BulkLibraryOperationSerializer(data=row)
+            if not serializer.is_valid():
+                results[index] = {'index': index, 'status': 'error', 'errors': serializer.errors}
+            elif serializer.validated_data['game'] in operations:
+                results[index] = {'index': index, 'status': 'error', 'errors': {
+                    'game': ['Operación duplicada para este juego.']}}
+            else:
+                operations[serializer.validated_data['game']] = (index, serializer.validated_data)
+
+        user = request.user
+        with transaction.atomic():
+            valid_games = set(Game.objects.filter(pk__in=operations).values_list('pk', flat=True))
+            existing = {
+                item.game_id: item
+                for item in UserLibrary.objects.select_for_update().filter(user=user, game_id__in=operations)
+            }
+            to_create, to_update, to_delete, updated_fields = [], [], [], set()
+            # Cambios de UserStats por las filas agregadas y modificadas (bulk_* no emite señales)
+            hours, favorites = Decimal(0), 0
+            for game_id, (index, data) in operations.items():
+                op, item = data['op'], existing.get(game_id)
+                fields = {field: data[field] for field in BulkLibraryOperationSerializer.FIELDS if field in data}
+                if game_id not in valid_games:
+                    outcome = 'not_found'
+                elif op == 'remove':
+                    outcome = 'removed' if item else 'not_found'
+                    if item:
+                        to_delete.append(item.pk)
+                elif item is None:
+                    outcome = 'not_found' if op == 'set' else 'created'
+                    if op == 'add':
+                        to_create.append(UserLibrary(user=user, game_id=game_id, **fields))
+                elif not fields:
+                    outcome = 'exists'
+                else:
+                    outcome = 'updated'
+                    hours -= Decimal(str(item.hours_played or 0))
+                    favorites -= int(bool(item.is_favorite))
+                    for field, value in fields.items():
+                        setattr(item, field, value)
+                    item.updated_at = timezone.now()  # bulk_update no aplica auto_now
+                    updated_fields.update(fields, ['updated_at'])
+                    to_update.append(item)
+                    hours += Decimal(str(item.hours_played or 0))
+                    favorites += int(bool(item.is_favorite))
+                results[index] = {'index': index, 'game': game_id, 'status': outcome}
+
+            while to_create:
+                try:
+                    with transaction.atomic():
+                        UserLibrary.objects.bulk_create(to_create, batch_size=BULK_CHUNK_SIZE)
+                    break
+                except IntegrityError:
+                    # Otra escritura agregó alguno de estos juegos después de la lectura: ya estaban
+                    taken = set(UserLibrary.objects.filter(
+                        user=user, game_id__in=[item.game_id for item in to_create]
+                    ).values_list('game_id', flat=True))
+                    if not taken:
+                        raise
+                    for game_id in taken:
+                        results[operations[game_id][0]]['status'] = 'exists'
+                    to_create = [item for item in to_create if item.game_id not in taken]
+            if to_update:
+                UserLibrary.objects.bulk_update(to_update, sorted(updated_fields), batch_size=BULK_CHUNK_SIZE)
+            # El delete emite post_delete por fila: las señales ya descuentan UserStats
+            if to_delete:
+                UserLibrary.objects.filter(pk__in=to_delete).delete()
+            UserStats.apply_change(
+                user.pk,
+                library_count=len(to_create),
+                total_hours=hours + sum(Decimal(str(item.hours_played or 0)) for item in to_create),
+                favorites_count=favorites + sum(int(bool(item.is_favorite)) for item in to_create),
+            )
+            created_ids = UserLibrary.objects.filter(
+                user=user, game_id__in=[item.game_id for item in to_create]
+            ).values_list('pk', flat=True) if to_create else []
+            ChangeLog.record('library', [*created_ids, *(item.pk for item in to_update)], user.pk)
+            transaction.on_commit(lambda: bump_version(user_library(user.pk)))
+
+        return Response({'results': results})
 
-class DeveloperViewSet(viewsets.ReadOnlyModelViewSet):
+
+class DeveloperViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet para desarrolladores (solo lectura)"""
-    queryset = Developer.objects.annotate(game_count=Count('games')).all()
+    version_names = [DEVELOPERS, GAMES]
+    queryset = Developer.objects.all()
     serializer_class = DeveloperSerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name', 'country']
 
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet para categorías (solo lectura)"""
+    version_names = [CATEGORIES]
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
 
+
+class SyncViewSet(viewsets.ViewSet):
+    """Sincronización incremental para clientes sin conexión (?since=<token>).
+
+    Devuelve juegos, desarrolladores, categorías y, para el usuario
+    autenticado, su biblioteca y sus reseñas modificados desde el token, los
+    ids borrados en ``deleted`` y un ``token`` nuevo para la siguiente llamada.
+    Sin token (o con uno demasiado antiguo) la respuesta es una copia completa
+    (``full``) paginada: se sigue ``next`` (?page=) hasta que sea null.
+    """
+    permission_classes = [AllowAny]
+
+    def list(self, request):
+        params = request.query_params
+        context = {'request': request}
+        try:
+            if params.get('page'):
+                sequence, section, after = sync.decode_page(params['page'])
+                data = sync.snapshot(request.user, sequence, section, after, context=context)
+            else:
+                since = sync.decode_token(params['since']) if params.get('since') else None
+                # El token se toma antes de consultar: lo que cambie durante la consulta llega en la próxima
+                sequence = sync.current_sequence()
+                if since is None or sync.is_pruned(since):
+                    data = sync.snapshot(request.user, sequence, context=context)
+                else:
+                    data = sync.changes(request.user, since, context=context)
+        except sync.InvalidToken:
+            return Response({'detail': 'Token de sincronización inválido.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response({'token': sync.encode_token(sequence), **data})
+
+
+class ExportJobViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """Exportaciones completas en segundo plano (solo staff).
+
+    POST crea el trabajo y lo encola; GET informa estado, porcentaje y filas
+    por segundo; ``download`` entrega el archivo cuando está listo.
+    """
+    queryset = ExportJob.objects.select_related('requested_by').all()
+    serializer_class = ExportJobSerializer
+    permission_classes = [IsAdminUser]
+
+    def perform_create(self, serializer):
+        jobs.enqueue(serializer.save(requested_by=self.request.user))
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != 'done' or not job.file:
+            return Response({'detail': 'La exportación todavía no está lista.'}, status=status.HTTP_409_CONFLICT)
+        return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.file.name.split('/')[-1])
+
@@ -6,3 +6,5 @@ class LibraryConfig(AppConfig):
     name = 'library'
     verbose_name = 'Biblioteca de Steam'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,366 @@
+"""
+Índice de prefijos en memoria para el autocompletado de juegos y desarrolladores.
+
+Cada proceso mantiene su propio índice: arreglos ordenados de claves
+normalizadas (una por cada palabra inicial posible del nombre) que se
+consultan con ``bisect``. Cada escritura que cambia un nombre o un peso se
+publica en un registro de cambios en la caché, una entrada por versión con
+los ``(kind, id)`` afectados; cada proceso lee las entradas posteriores a su
+versión, relee esas filas y las aplica con ``upsert``/``remove``. Solo si falta
+una entrada (expiró o la caché se vació) el índice se reconstruye completo,
+en un hilo aparte y sin bloquear las consultas. La primera construcción del
+proceso también ocurre en ese hilo; hasta que termina, ``suggest`` consulta la
+base de datos (``search_database``).
+
+El peso de un juego es su cantidad de reseñas y el de un desarrollador su
+cantidad de juegos.
+"""
+import bisect
+import heapq
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+from .caching import bump_version, get_version
+from .search import TERM_RE, normalize
+
+AUTOCOMPLETE = 'library:autocomplete'
+# Vida de cada entrada del registro de cambios
+CHANGE_TIMEOUT = 60 * 60
+# Con más cambios pendientes que esto conviene reconstruir el índice completo
+MAX_PENDING = 1000
+# Segundos que se espera una entrada ausente (versión ya incrementada, entrada aún sin escribir)
+CHANGE_GRACE = 5
+# Versiones que se prueban al publicar un cambio antes de desistir
+PUBLISH_ATTEMPTS = 5
+# Entrada que pide a todos los procesos reconstruir el índice
+REBUILD = 'rebuild'
+# Rangos más grandes que esto guardan su top-k precalculado (prefijos cortos)
+LARGE_RANGE = 64
+MAX_LIMIT = 50
+# Claves agregadas más borradas que se acumulan antes de fundirlas con los arreglos principales
+MERGE_SIZE = 2048
+
+
+def index_keys(name):
+    """Claves de un nombre: el nombre normalizado desde cada una de sus palabras"""
+    words = TERM_RE.findall(normalize(name))
+    return {' '.join(words[start:]) for start in range(len(words))}
+
+
+class PrefixIndex:
+    """Entradas ``(kind, id) -> (nombre, peso)`` indexadas por prefijo normalizado.
+
+    Los prefijos cuyo rango supera ``LARGE_RANGE`` claves guardan su top-k,
+    calculado de abajo hacia arriba a partir del top-k de sus prefijos hijos;
+    así los prefijos cortos no recorren cientos de miles de entradas.
+
+    Los arreglos principales no se desplazan al aplicar cambios: las claves
+    nuevas van a un arreglo ordenado aparte (``extra_keys``) y las borradas se
+    marcan por posición en ``dead``. Cuando entre ambos superan
+    ``MERGE_SIZE`` se funden en una sola pasada.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.keys = []
+        self.refs = []
+        self.extra_keys = []
+        self.extra_refs = []
+        self.dead = set()
+        self.top_cache = {}
+        self.lock = threading.Lock()
+
+    def load(self, items):
+        """Reemplaza el contenido con ``(kind, id, nombre, peso)``"""
+        entries = {}
+        pairs = []
+        for kind, pk, name, weight in items:
+            entries[(kind, pk)] = (name, weight)
+            pairs.extend((key, (kind, pk)) for key in index_keys(name))
+        pairs.sort()
+        with self.lock:
+            self.entries = entries
+            self._replace([key for key, _ in pairs], [ref for _, ref in pairs])
+            self.top_cache = {}
+            self._top_refs('', 0, len(self.keys))
+
+    def _replace(self, keys, refs):
+        self.keys = keys
+        self.refs = refs
+        self.extra_keys = []
+        self.extra_refs = []
+        self.dead = set()
+
+    def upsert(self, kind, pk, name, weight):
+        with self.lock:
+            if self.entries.get((kind, pk)) == (name, weight):
+                return
+            self._remove((kind, pk))
+            self.entries[(kind, pk)] = (name, weight)
+            for key in index_keys(name):
+                position = bisect.bisect_left(self.extra_keys, key)
+                self.extra_keys.insert(position, key)
+                self.extra_refs.insert(position, (kind, pk))
+            self._merge_if_needed()
+
+    def remove(self, kind, pk):
+        with self.lock:
+            self._remove((kind, pk))
+            self._merge_if_needed()
+
+    def _remove(self, ref):
+        current = self.entries.pop(ref, None)
+        if current is None:
+            return
+        for key in index_keys(current[0]):
+            # Cada entrada está completa en los arreglos principales o en los agregados
+            position = self._find(self.extra_keys, self.extra_refs, key, ref)
+            if position is not None:
+                del self.extra_keys[position]
+                del self.extra_refs[position]
+                continue
+            position = self._find(self.keys, self.refs, key, ref)
+            if position is not None:
+                self.dead.add(position)
+                self._invalidate(key)
+
+    def _find(self, keys, refs, key, ref):
+        position = bisect.bisect_left(keys, key)
+        while position < len(keys) and keys[position] == key:
+            if refs[position] == ref and (keys is not self.keys or position not in self.dead):
+                return position
+            position += 1
+        return None
+
+    def _merge_if_needed(self):
+        if len(self.extra_keys) + len(self.dead) <= MERGE_SIZE:
+            return
+        # Cortes ordenados por posición: se copian los tramos intermedios enteros
+        cuts = sorted(
+            [(position, True, None, None) for position in self.dead]
+            + [(bisect.bisect_left(self.keys, key), False, key, ref)
+               for key, ref in zip(self.extra_keys, self.extra_refs)]
+        )
+        keys, refs = [], []
+        previous = 0
+        for position, dead, key, ref in cuts:
+            keys.extend(self.keys[previous:position])
+            refs.extend(self.refs[previous:position])
+            if dead:
+                previous = position + 1
+            else:
+                keys.append(key)
+                refs.append(ref)
+                previous = position
+        keys.extend(self.keys[previous:])
+        refs.extend(self.refs[previous:])
+        # Los top-k guardados siguen valiendo salvo para los prefijos de las claves agregadas
+        for key in set(self.extra_keys):
+            self._invalidate(key)
+        self._replace(keys, refs)
+
+    def _invalidate(self, key):
+        """Descarta el top-k guardado de cada prefijo de la clave; se recalcula al consultarlo"""
+        for length in range(len(key) + 1):
+            self.top_cache.pop(key[:length], None)
+
+    def _rank(self, ref):
+        return self.entries[ref][1], -ref[1]
+
+    def _live_refs(self, start, end):
+        if not self.dead:
+            return set(self.refs[start:end])
+        return {self.refs[position] for position in range(start, end) if position not in self.dead}
+
+    def _top_refs(self, prefix, start, end):
+        if end - start <= LARGE_RANGE:
+            return heapq.nlargest(MAX_LIMIT, self._live_refs(start, end), key=self._rank)
+        top = self.top_cache.get(prefix)
+        if top is None:
+            # Claves iguales al prefijo y luego un rango por cada carácter siguiente
+            position = bisect.bisect_right(self.keys, prefix, start, end)
+            candidates = self._live_refs(start, position)
+            while position < end:
+                child = self.keys[position][:len(prefix) + 1]
+                child_end = bisect.bisect_left(self.keys, child + '\uffff', position, end)
+                candidates.update(self._top_refs(child, position, child_end))
+                position = child_end
+            top = heapq.nlargest(MAX_LIMIT, candidates, key=self._rank)
+            self.top_cache[prefix] = top
+        return top
+
+    def search(self, prefix, limit=10):
+        """Las ``limit`` entradas de mayor peso cuyo nombre tiene una palabra con ese prefijo"""
+        prefix = ' '.join(TERM_RE.findall(normalize(prefix)))
+        if not prefix:
+            return []
+        with self.lock:
+            start = bisect.bisect_left(self.keys, prefix)
+            end = bisect.bisect_left(self.keys, prefix + '\uffff', start)
+            candidates = set(self._top_refs(prefix, start, end))
+            start = bisect.bisect_left(self.extra_keys, prefix)
+            end = bisect.bisect_left(self.extra_keys, prefix + '\uffff', start)
+            candidates.update(self.extra_refs[start:end])
+            return [
+                {'type': kind, 'id': pk, 'name': self.entries[(kind, pk)][0],
+                 'weight': self.entries[(kind, pk)][1]}
+                for kind, pk in heapq.nlargest(limit, candidates, key=self._rank)
+            ]
+
+
+def load_items(game_ids=None, developer_ids=None):
+    """``(kind, id, nombre, peso)`` de todos los juegos y desarrolladores, o solo de los ids dados"""
+    from .models import Developer, Game
+    for model, kind, ids, fields in ((Game, 'game', game_ids, ('id', 'title', 'total_reviews')),
+                                     (Developer, 'developer', developer_ids, ('id', 'name', 'game_count'))):
+        queryset = model.objects.values_list(*fields).order_by()
+        if ids is not None:
+            if not ids:
+                continue
+            queryset = queryset.filter(pk__in=ids)
+        for pk, name, weight in queryset:
+            yield kind, pk, name, weight
+
+
+def change_key(version):
+    return f'{AUTOCOMPLETE}:change:{version}'
+
+
+_index = PrefixIndex()
+# Versión del registro ya aplicada al índice (None: aún sin construir)
+_state = {'version': None, 'rebuilding': False, 'missing_since': None}
+_state_lock = threading.Lock()
+
+
+def publish(kind, pks):
+    """Registra que cambió el nombre o el peso de los objetos ``pks``; llamar tras confirmar la transacción"""
+    pks = sorted(set(pks))
+    if not pks:
+        return
+    change = [(kind, pk) for pk in pks] if len(pks) <= MAX_PENDING else REBUILD
+    # Con un incr no atómico (DatabaseCache) dos procesos pueden obtener la misma
+    # versión: el que llega segundo toma otra. Si nunca lo logra, la entrada
+    # ausente hace que los índices se reconstruyan.
+    for _ in range(PUBLISH_ATTEMPTS):
+        if cache.add(change_key(bump_version(AUTOCOMPLETE)), change, CHANGE_TIMEOUT):
+            return
+
+
+def get_index():
+    """Índice del proceso, al día con el registro de cambios (None mientras se construye por primera vez).
+
+    La primera consulta del proceso lanza la construcción en otro hilo;
+    después se aplican los cambios pendientes y, si hace falta reconstruirlo,
+    se sirve el índice actual mientras otro hilo lo hace.
+    """
+    with _state_lock:
+        if _state['version'] is None:
+            schedule_rebuild()
+            return None
+        catch_up()
+    return _index
+
+
+def suggest(prefix, limit=10):
+    """Sugerencias para ``prefix`` desde el índice o, si aún no está listo, desde la base de datos"""
+    index = get_index()
+    if index is None:
+        return search_database(prefix, limit)
+    return index.search(prefix, limit=limit)
+
+
+def search_database(prefix, limit=10):
+    """Como ``PrefixIndex.search`` con consultas a la base de datos.
+
+    Aproximada: busca el prefijo al inicio del nombre o tras un espacio, sin
+    quitar acentos ni signos como ``normalize``.
+    """
+    from .models import Developer, Game
+    prefix = ' '.join(TERM_RE.findall(normalize(prefix)))
+    if not prefix:
+        return []
+    found = []
+    for model, kind, name_field, weight_field in ((Game, 'game', 'title', 'total_reviews'),
+                                                  (Developer, 'developer', 'name', 'game_count')):
+        matches = model.objects.filter(
+            Q(**{f'{name_field}__istartswith': prefix}) | Q(**{f'{name_field}__icontains': f' {prefix}'})
+        ).order_by(f'-{weight_field}', 'pk').values_list('pk', name_field, weight_field)[:limit]
+        found.extend({'type': kind, 'id': pk, 'name': name, 'weight': weight} for pk, name, weight in matches)
+    return heapq.nlargest(limit, found, key=lambda item: (item['weight'], -item['id']))
+
+
+def rebuild():
+    """Recarga el índice completo y devuelve la versión desde la que aplicar cambios"""
+    version = get_version(AUTOCOMPLETE)
+    _index.load(load_items())
+    return version
+
+
+def schedule_rebuild():
+    """Reconstruye el índice en otro hilo; mientras tanto se sigue sirviendo el actual"""
+    if not _state['rebuilding']:
+        _state['rebuilding'] = True
+        threading.Thread(target=_rebuild_in_background, name='library-autocomplete', daemon=True).start()
+
+
+def _rebuild_in_background():
+    try:
+        version = rebuild()
+        with _state_lock:
+            _state.update(version=version, missing_since=None)
+    finally:
+        with _state_lock:
+            _state['rebuilding'] = False
+        # El hilo abre su propia conexión
+        connection.close()
+
+
+def catch_up():
+    """Aplica las entradas del registro posteriores a la versión del índice (con ``_state_lock`` tomado)"""
+    applied = _state['version']
+    current = get_version(AUTOCOMPLETE)
+    if _state['rebuilding'] or current == applied:
+        return
+    if current < applied or current - applied > MAX_PENDING:
+        # La caché perdió el contador o hay demasiados cambios
+        schedule_rebuild()
+        return
+    versions = range(applied + 1, current + 1)
+    found = cache.get_many([change_key(version) for version in versions])
+    refs = set()
+    for version in versions:
+        change = found.get(change_key(version))
+        if change is None:
+            break
+        if change == REBUILD:
+            schedule_rebuild()
+            return
+        refs.update(change)
+        applied = version
+    if applied < current:
+        now = time.monotonic()
+        if _state['missing_since'] is None:
+            _state['missing_since'] = now
+        elif now - _state['missing_since'] > CHANGE_GRACE:
+            schedule_rebuild()
+            return
+    else:
+        _state['missing_since'] = None
+    if refs:
+        rows = {
+            (kind, pk): (name, weight)
+            for kind, pk, name, weight in load_items(
+                game_ids=[pk for kind, pk in refs if kind == 'game'],
+                developer_ids=[pk for kind, pk in refs if kind == 'developer'],
+            )
+        }
+        for ref in refs:
+            if ref in rows:
+                _index.upsert(*ref, *rows[ref])
+            else:
+                _index.remove(*ref)
+    _state['version'] = applied
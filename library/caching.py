@@ -0,0 +1,104 @@
+"""
+Utilidades de caché con claves versionadas.
+
+Cada grupo de datos cacheados tiene un contador de versión; las escrituras
+lo incrementan y las lecturas arman la clave con la versión actual, así una
+invalidación no necesita conocer ni borrar las claves viejas (expiran solas).
+"""
+import time
+
+from django.core.cache import cache
+
+HOME_SECTIONS = 'library:home'
+# Versiones por tabla para los validadores ETag/Last-Modified de la API
+GAMES = 'library:games'
+REVIEWS = 'library:reviews'
+DEVELOPERS = 'library:developers'
+CATEGORIES = 'library:categories'
+UNREAD_TIMEOUT = 60 * 60
+# Segundos que un proceso puede tardar en recalcular antes de que otro lo intente
+LOCK_TIMEOUT = 10
+# Espera máxima (en pasos de 50 ms) por un valor que otro proceso está calculando
+LOCK_WAIT_STEPS = 20
+
+
+def get_version(name):
+    # Valor inicial único: si la caché pierde la clave, ningún proceso la confunde con la suya
+    return cache.get_or_set(f'{name}:version', time.time_ns, timeout=None)
+
+
+def user_library(user_id):
+    """Nombre de la versión de la biblioteca de un usuario"""
+    return f'library:user-library:{user_id}'
+
+
+def bump_version(name):
+    """Invalida todo lo cacheado bajo ``name`` y devuelve la nueva versión"""
+    cache.set(f'{name}:modified', time.time(), timeout=None)
+    try:
+        return cache.incr(f'{name}:version')
+    except ValueError:
+        version = time.time_ns()
+        cache.set(f'{name}:version', version, timeout=None)
+        return version
+
+
+def get_validators(names):
+    """Versiones y fecha de última modificación (timestamp) de varios grupos con una lectura"""
+    found = cache.get_many([f'{name}:{suffix}' for name in names for suffix in ('version', 'modified')])
+    versions = []
+    modified = 0
+    for name in names:
+        versions.append(found.get(f'{name}:version') or get_version(name))
+        stamp = found.get(f'{name}:modified') or cache.get_or_set(f'{name}:modified', time.time, timeout=None)
+        modified = max(modified, stamp)
+    return versions, modified
+
+
+def get_or_compute(name, compute, timeout):
+    """Valor de ``name`` para la versión actual, calculándolo una sola vez por versión.
+
+    Tras una invalidación solo el proceso que obtiene el candado consulta la
+    base de datos; los demás sirven el último valor calculado (aunque sea de
+    la versión anterior) o, si no hay ninguno, esperan brevemente el nuevo.
+    """
+    key = f'{name}:{get_version(name)}'
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    latest_key = f'{name}:latest'
+    if cache.add(f'{key}:lock', 1, LOCK_TIMEOUT):
+        try:
+            value = compute()
+            cache.set_many({key: value, latest_key: value}, timeout)
+        finally:
+            cache.delete(f'{key}:lock')
+        return value
+
+    value = cache.get(latest_key)
+    for _ in range(LOCK_WAIT_STEPS):
+        if value is not None:
+            break
+        time.sleep(0.05)
+        value = cache.get(key)
+    return value if value is not None else compute()
+
+
+def unread_notifications_key(user_id):
+    return f'library:unread:{user_id}'
+
+
+def unread_notifications_count(user_id):
+    """Notificaciones no leídas del usuario; el conteo se cachea hasta la próxima escritura"""
+    from .models import Notification
+    key = unread_notifications_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        cache.set(key, count, UNREAD_TIMEOUT)
+    return count
+
+
+def reset_unread_notifications(user_id):
+    cache.delete(unread_notifications_key(user_id))
@@ -0,0 +1,47 @@
+"""
+GET condicional (ETag / Last-Modified) para los ViewSets de la API.
+
+Los validadores se arman con los contadores de versión de las tablas de las
+que depende cada respuesta (ver ``library.caching``), sin serializar el
+cuerpo ni consultar la base de datos, de modo que un cliente con la copia
+vigente recibe ``304 Not Modified`` antes de ejecutar el queryset principal.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .caching import get_validators
+
+
+class ConditionalGetMixin:
+    """Responde 304 en ``list`` y ``retrieve`` si las versiones de ``version_names`` no cambiaron"""
+    version_names = ()
+
+    def get_version_names(self):
+        return list(self.version_names)
+
+    def list(self, request, *args, **kwargs):
+        return self.not_modified(request) or super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.not_modified(request) or super().retrieve(request, *args, **kwargs)
+
+    def not_modified(self, request):
+        """Calcula los validadores y devuelve la respuesta 304 si corresponde (si no, None)"""
+        versions, modified = get_validators(self.get_version_names())
+        # La representación también depende de la URL, el usuario y el formato pedido
+        key = '|'.join([
+            request.get_full_path(), str(request.user.pk), request.META.get('HTTP_ACCEPT', ''),
+            *(str(version) for version in versions),
+        ])
+        self.etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+        self.last_modified = int(modified)
+        return get_conditional_response(request._request, etag=self.etag, last_modified=self.last_modified)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, 'etag', None) and response.status_code in (200, 304):
+            response['ETag'] = self.etag
+            response['Last-Modified'] = http_date(self.last_modified)
+        return response
@@ -0,0 +1,223 @@
+"""
+Exportación tipada de bibliotecas y reseñas para la API (``?format=``).
+
+JSON y NDJSON se envían en streaming; Parquet y Arrow (formato IPC de
+streaming) se arman por lotes de columnas (``RecordBatch``) con las horas
+como decimal y las fechas como timestamp UTC, y cada lote sale apenas se
+escribe. En todos los casos las filas se leen con
+``values_list(...).iterator(chunk_size=...)``, sin instanciar modelos.
+
+Parquet y Arrow requieren la dependencia opcional ``pyarrow``.
+"""
+import datetime
+import decimal
+import io
+import json
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .renderers import ArrowStreamRenderer, NDJSONRenderer, ParquetRenderer
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Filas por lote leído de la base de datos (y por RecordBatch en los formatos columnares)
+BATCH_SIZE = 10000
+
+
+def _timestamp(pa):
+    return pa.timestamp('us', tz='UTC')
+
+
+# (nombre de la columna, lookup de values_list, tipo de Arrow)
+LIBRARY_COLUMNS = [
+    ('id', 'id', lambda pa: pa.int64()),
+    ('game', 'game_id', lambda pa: pa.int64()),
+    ('game_title', 'game__title', lambda pa: pa.string()),
+    ('developer_name', 'game__developer__name', lambda pa: pa.string()),
+    ('hours_played', 'hours_played', lambda pa: pa.decimal128(6, 2)),
+    ('is_favorite', 'is_favorite', lambda pa: pa.bool_()),
+    ('date_added', 'date_added', _timestamp),
+    ('last_played', 'last_played', _timestamp),
+    ('updated_at', 'updated_at', _timestamp),
+]
+
+# Bibliotecas de todos los usuarios (trabajos de exportación del staff)
+ALL_LIBRARIES_COLUMNS = LIBRARY_COLUMNS[:1] + [
+    ('user', 'user_id', lambda pa: pa.int64()),
+    ('user_username', 'user__username', lambda pa: pa.string()),
+] + LIBRARY_COLUMNS[1:]
+
+REVIEW_COLUMNS = [
+    ('id', 'id', lambda pa: pa.int64()),
+    ('user', 'user_id', lambda pa: pa.int64()),
+    ('user_username', 'user__username', lambda pa: pa.string()),
+    ('game', 'game_id', lambda pa: pa.int64()),
+    ('game_title', 'game__title', lambda pa: pa.string()),
+    ('rating', 'rating', lambda pa: pa.int8()),
+    ('comment', 'comment', lambda pa: pa.string()),
+    ('is_helpful', 'is_helpful', lambda pa: pa.int64()),
+    ('created_at', 'created_at', _timestamp),
+    ('updated_at', 'updated_at', _timestamp),
+]
+
+
+def columnar_available():
+    return pyarrow is not None
+
+
+def row_batches(queryset, columns, progress=None):
+    """Listas de hasta BATCH_SIZE tuplas con las columnas pedidas.
+
+    ``progress(n)``, si se indica, se llama con la cantidad de filas de cada lote.
+    """
+    rows = queryset.values_list(*(lookup for _, lookup, _ in columns)).iterator(chunk_size=BATCH_SIZE)
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            return
+        yield batch
+        if progress is not None:
+            progress(len(batch))
+
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        # Como string, igual que los DecimalField de la API: sin perder precisión
+        return str(value)
+    raise TypeError(f'Valor no serializable: {value!r}')
+
+
+def _json_lines(batch, names):
+    return [
+        json.dumps(dict(zip(names, row)), default=_json_default, ensure_ascii=False, separators=(',', ':'))
+        for row in batch
+    ]
+
+
+def ndjson_stream(queryset, columns, progress=None):
+    names = [name for name, _, _ in columns]
+    for batch in row_batches(queryset, columns, progress):
+        yield ''.join(line + '\n' for line in _json_lines(batch, names)).encode()
+
+
+def json_stream(queryset, columns, progress=None):
+    names = [name for name, _, _ in columns]
+    separator = '['
+    for batch in row_batches(queryset, columns, progress):
+        yield (separator + ','.join(_json_lines(batch, names))).encode()
+        separator = ','
+    yield b'[]' if separator == '[' else b']'
+
+
+class StreamSink(io.RawIOBase):
+    """Archivo de solo escritura que se vacía tras cada lote; ``tell`` cuenta lo escrito"""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def arrow_schema(columns):
+    return pyarrow.schema([(name, arrow_type(pyarrow)) for name, _, arrow_type in columns])
+
+
+def record_batches(queryset, columns, schema, progress=None):
+    """Un RecordBatch por lote de filas, convertido columna por columna"""
+    for batch in row_batches(queryset, columns, progress):
+        arrays = [
+            pyarrow.array(values, type=field.type)
+            for values, field in zip(zip(*batch), schema)
+        ]
+        yield pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def parquet_stream(queryset, columns, progress=None):
+    """Un row group por lote; el pie del archivo se envía al final"""
+    schema = arrow_schema(columns)
+    sink = StreamSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    for batch in record_batches(queryset, columns, schema, progress):
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def arrow_stream(queryset, columns, progress=None):
+    schema = arrow_schema(columns)
+    sink = StreamSink()
+    writer = pyarrow.ipc.new_stream(sink, schema)
+    yield sink.drain()
+    for batch in record_batches(queryset, columns, schema, progress):
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+# format de ?format= → (generador, extensión del archivo, requiere pyarrow)
+FORMATS = {
+    JSONRenderer.format: (json_stream, 'json', False),
+    NDJSONRenderer.format: (ndjson_stream, 'ndjson', False),
+    ParquetRenderer.format: (parquet_stream, 'parquet', True),
+    ArrowStreamRenderer.format: (arrow_stream, 'arrows', True),
+}
+
+
+class ExportMixin:
+    """Acción ``export`` para un ViewSet: ``?format=json|ndjson|parquet|arrow``.
+
+    La exportación no se pagina, así que exige autenticación; cada ViewSet
+    acota las filas en ``get_export_queryset``.
+    """
+    export_columns = ()
+    export_filename = 'export'
+
+    def get_export_queryset(self):
+        return self.filter_queryset(self.get_queryset())
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated],
+            renderer_classes=[JSONRenderer, NDJSONRenderer, ParquetRenderer, ArrowStreamRenderer])
+    def export(self, request):
+        """Exportar todas las filas del listado (con sus filtros) en el formato pedido"""
+        renderer = request.accepted_renderer
+        generate, extension, columnar = FORMATS[renderer.format]
+        if columnar and not columnar_available():
+            return Response({'detail': 'La exportación Parquet/Arrow requiere instalar pyarrow.'},
+                           status=status.HTTP_406_NOT_ACCEPTABLE, content_type='application/json')
+        response = StreamingHttpResponse(
+            generate(self.get_export_queryset(), self.export_columns), content_type=renderer.media_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.export_filename}.{extension}"'
+        return response
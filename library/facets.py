@@ -0,0 +1,97 @@
+"""
+Conteos por faceta del catálogo de juegos.
+
+Cada faceta cuenta los juegos que cumplen la búsqueda y los demás filtros
+activos, sin aplicar el filtro de la propia faceta, para que sus opciones
+sigan visibles al elegir una. Los conteos de todas las facetas salen de una
+sola consulta (``UNION ALL`` de un ``GROUP BY`` por faceta).
+"""
+from datetime import MAXYEAR, MINYEAR
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import CharField, Count, F, IntegerField, Q, Value
+from django.db.models.functions import Cast, ExtractYear, Floor
+
+# Umbrales de calificación mínima ofrecidos (cada uno cuenta los juegos con rating >= umbral)
+RATING_THRESHOLDS = (4, 3, 2, 1)
+# Opciones que se muestran por faceta, las de mayor conteo
+FACET_LIMIT = 10
+
+
+def active_filters(params):
+    """Filtros ``{faceta: Q}`` a partir de los parámetros GET de la lista de juegos.
+
+    Los valores inválidos o fuera de rango (ids mayores que un BigAutoField,
+    años fuera de ``date``, calificaciones no finitas) se ignoran.
+    """
+    from .models import MAX_ID
+    filters = {}
+    category = int_param(params, 'category', 1, MAX_ID)
+    if category is not None:
+        filters['category'] = Q(categories__id=category)
+    developer = int_param(params, 'developer', 1, MAX_ID)
+    if developer is not None:
+        filters['developer'] = Q(developer_id=developer)
+    year = int_param(params, 'year', MINYEAR, MAXYEAR)
+    if year is not None:
+        filters['year'] = Q(release_date__year=year)
+    try:
+        min_rating = Decimal(params['min_rating'])
+    except (KeyError, InvalidOperation):
+        pass
+    else:
+        if min_rating.is_finite():
+            filters['rating'] = Q(rating__gte=min_rating)
+    return filters
+
+
+def int_param(params, name, low, high):
+    """Entero de ``params[name]`` entre ``low`` y ``high``, o None"""
+    value = params.get(name, '')
+    # isdigit acepta dígitos no ASCII ("²") que int() rechaza
+    if value.isascii() and value.isdigit() and low <= int(value) <= high:
+        return int(value)
+    return None
+
+
+def apply_filters(queryset, filters, exclude=None):
+    for name, condition in filters.items():
+        if name != exclude:
+            queryset = queryset.filter(condition)
+    return queryset
+
+
+def facet_counts(queryset, filters):
+    """Conteos ``{faceta: [(valor, etiqueta, cantidad), ...]}`` para ``queryset`` ya buscado"""
+    from .models import Game
+    text = CharField()
+    groups = {
+        'category': (F('categories__id'), F('categories__name')),
+        'developer': (F('developer_id'), F('developer__name')),
+        'rating': (Cast(Floor('rating'), IntegerField()), Value('', output_field=text)),
+        'year': (ExtractYear('release_date'), Value('', output_field=text)),
+    }
+    parts = []
+    for name, (value, label) in groups.items():
+        matching = apply_filters(queryset, filters, exclude=name).order_by().values('pk')
+        parts.append(
+            Game.objects.filter(pk__in=matching).order_by().annotate(
+                facet=Value(name, output_field=text), value=value, label=label
+            ).values('facet', 'value', 'label').annotate(count=Count('id'))
+        )
+
+    counts = {name: [] for name in groups}
+    for row in parts[0].union(*parts[1:], all=True):
+        if row['value'] is not None:
+            counts[row['facet']].append((row['value'], row['label'], row['count']))
+
+    # Los umbrales de calificación acumulan los buckets enteros iguales o superiores
+    by_bucket = dict((value, count) for value, _, count in counts['rating'])
+    counts['rating'] = [
+        (threshold, f'{threshold}+', sum(count for bucket, count in by_bucket.items() if bucket >= threshold))
+        for threshold in RATING_THRESHOLDS
+    ]
+    counts['category'] = sorted(counts['category'], key=lambda item: (-item[2], item[1]))[:FACET_LIMIT]
+    counts['developer'] = sorted(counts['developer'], key=lambda item: (-item[2], item[1]))[:FACET_LIMIT]
+    counts['year'] = [(year, str(year), count) for year, _, count in sorted(counts['year'], reverse=True)]
+    return counts
@@ -0,0 +1,162 @@
+"""
+Serialización rápida (solo lectura) para los listados de alto volumen de la API.
+
+Construye los diccionarios directamente desde filas de ``values()`` en lugar
+de instancias de modelo, evitando la maquinaria por objeto de
+``ModelSerializer`` (``get_attribute``, ``SkipField``, campos anidados). Las
+conversiones de cada columna (fechas, decimales, zonas horarias, URLs de
+imágenes) son las de los propios campos de ``GameSerializer`` y
+``ReviewSerializer``, y las claves salen en el mismo orden: el JSON
+resultante es idéntico byte a byte.
+
+Se activa con el setting ``LIBRARY_FAST_SERIALIZERS``.
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .models import Category, Game, Review
+from .serializers import GameSerializer, ReviewSerializer
+
+
+def enabled():
+    return getattr(settings, 'LIBRARY_FAST_SERIALIZERS', False)
+
+
+class ValuesSerializer:
+    """Serializa filas de ``values()`` con los campos de ``serializer_class``.
+
+    ``columns`` asocia cada campo del serializer con su lookup en ``values()``.
+    Los campos con ``source`` a través de una relación nula se omiten, como
+    hace DRF; el resto de los campos se calculan en ``extra_fields``.
+    """
+    serializer_class = None
+    model = None
+    columns = {}
+    # Campos que DRF omite cuando la relación indicada es nula
+    optional_relations = {}
+
+    def __init__(self, context=None):
+        self.fields = self.serializer_class(context=context or {}).fields
+        self.converters = {}
+        for name, field in self.fields.items():
+            if name in self.columns:
+                self.converters[name] = self.converter(field)
+
+    def converter(self, field):
+        """Conversión de una columna; los tipos simples se devuelven tal cual"""
+        if isinstance(field, (serializers.IntegerField, serializers.CharField, serializers.PrimaryKeyRelatedField)):
+            return None
+        if isinstance(field, serializers.FileField):
+            storage = self.model._meta.get_field(field.source).storage
+            request = field.context.get('request')
+
+            def file_url(name):
+                if not name:
+                    return None
+                url = storage.url(name)
+                return request.build_absolute_uri(url) if request is not None else url
+            return file_url
+        if isinstance(field, serializers.DateTimeField) and settings.USE_TZ and \
+                str(getattr(field, 'format', api_settings.DATETIME_FORMAT)).lower() == ISO_8601:
+            # Como DateTimeField.to_representation, pero resolviendo la zona horaria una sola vez
+            tz = getattr(field, 'timezone', None) or timezone.get_current_timezone()
+
+            def iso_datetime(value):
+                value = value.astimezone(tz).isoformat()
+                return value[:-6] + 'Z' if value.endswith('+00:00') else value
+            return iso_datetime
+        return field.to_representation
+
+    def lookups(self):
+        """Columnas de ``values()`` para los campos presentes (con ``?fields=`` pueden ser menos)"""
+        lookups = ['id']
+        for name in self.fields:
+            if name in self.columns:
+                lookups.append(self.columns[name])
+            if name in self.optional_relations:
+                lookups.append(self.optional_relations[name])
+        return list(dict.fromkeys(lookups))
+
+    def serialize_rows(self, rows):
+        """Lista de representaciones, en el orden de ``rows``"""
+        rows = list(rows)
+        extra = self.extra_fields(rows)
+        plan = [
+            (name, self.columns.get(name), self.converters.get(name), extra.get(name),
+             self.optional_relations.get(name))
+            for name in self.fields
+        ]
+        result = []
+        for row in rows:
+            data = {}
+            for name, lookup, convert, compute, relation in plan:
+                if relation is not None and row[relation] is None:
+                    continue
+                if compute is not None:
+                    data[name] = compute(row)
+                    continue
+                value = row[lookup]
+                data[name] = value if value is None or convert is None else convert(value)
+            result.append(data)
+        return result
+
+    def values(self, queryset):
+        """``values()`` con las columnas necesarias y las del ordenamiento (para paginar)"""
+        ordering = [field.lstrip('-') for field in queryset.query.order_by]
+        return queryset.values(*dict.fromkeys(self.lookups() + ordering))
+
+    def serialize(self, queryset):
+        return self.serialize_rows(self.values(queryset))
+
+    def extra_fields(self, rows):
+        """``{campo: función(fila)}`` para los campos que no salen de una columna"""
+        return {}
+
+
+class FastGameSerializer(ValuesSerializer):
+    serializer_class = GameSerializer
+    model = Game
+    columns = {
+        'id': 'id', 'title': 'title', 'description': 'description', 'release_date': 'release_date',
+        'price': 'price', 'cover_image': 'cover_image', 'steam_url': 'steam_url',
+        'developer': 'developer_id', 'developer_name': 'developer__name', 'rating': 'rating',
+        'total_reviews': 'total_reviews', 'created_at': 'created_at', 'updated_at': 'updated_at',
+    }
+    optional_relations = {'developer_name': 'developer_id'}
+
+    def lookups(self):
+        lookups = super().lookups()
+        if 'rating_histogram' in self.fields:
+            lookups += list(Game.STAR_FIELDS)
+        return lookups
+
+    def extra_fields(self, rows):
+        extra = {
+            'rating_histogram': lambda row: {
+                str(stars): row[field] for stars, field in enumerate(Game.STAR_FIELDS, start=1)
+            },
+        }
+        if 'categories' not in self.fields:
+            return extra
+        # Las categorías de toda la página en una sola consulta, en el orden de Category.Meta
+        categories = {row['id']: [] for row in rows}
+        category_fields = self.fields['categories'].child.fields
+        links = Game.categories.through.objects.filter(game_id__in=categories).order_by(
+            *(f'category__{field}' for field in Category._meta.ordering)
+        ).values_list('game_id', *(f'category__{name}' for name in category_fields))
+        for game_id, *values in links:
+            categories[game_id].append(dict(zip(category_fields, values)))
+        extra['categories'] = lambda row: categories[row['id']]
+        return extra
+
+
+class FastReviewSerializer(ValuesSerializer):
+    serializer_class = ReviewSerializer
+    model = Review
+    columns = {
+        'id': 'id', 'user': 'user_id', 'user_username': 'user__username', 'game': 'game_id',
+        'game_title': 'game__title', 'rating': 'rating', 'comment': 'comment',
+        'created_at': 'created_at', 'updated_at': 'updated_at', 'is_helpful': 'is_helpful',
+    }
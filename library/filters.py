@@ -0,0 +1,36 @@
+"""
+Filtros personalizados para la API REST
+"""
+from rest_framework import filters
+
+from .search import fuzzy_search, get_search_backend
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """Búsqueda en ``?q=`` (como la lista HTML) o ``?search=``, resuelta por el backend de texto completo.
+
+    Con ``&fuzzy=1`` se usa la búsqueda difusa por trigramas del título.
+    """
+    query_param = 'q'
+    fuzzy_param = 'fuzzy'
+
+    def filter_queryset(self, request, queryset, view):
+        query = (request.query_params.get(self.query_param)
+                 or request.query_params.get(self.search_param, '')).strip()
+        if not query:
+            return queryset
+        if request.query_params.get(self.fuzzy_param) == '1':
+            return fuzzy_search(queryset, query)
+        return get_search_backend().search(queryset, query)
+
+
+class RelevanceOrderingFilter(filters.OrderingFilter):
+    """Ordena por relevancia cuando hay búsqueda y no se pidió otro orden"""
+
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param) and 'search_rank' in queryset.query.annotations:
+            ordering = ['-search_rank']
+            if 'title_length' in queryset.query.annotations:
+                ordering.append('title_length')
+            return ordering + list(self.get_default_ordering(view) or [])
+        return super().get_ordering(request, queryset, view)
@@ -103,6 +103,22 @@ class UserLibraryForm(forms.ModelForm):
         )
 
 
+class LibraryImportForm(forms.Form):
+    """Formulario para importar una biblioteca desde un archivo"""
+    file = forms.FileField(
+        label='Archivo',
+        help_text='CSV exportado desde tu biblioteca, o JSON/NDJSON con las columnas de la API'
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.helper = FormHelper()
+        self.helper.layout = Layout(
+            'file',
+            Submit('submit', 'Importar', css_class='btn btn-primary')
+        )
+
+
 class DeveloperForm(forms.ModelForm):
     """Formulario para crear/editar desarrolladores"""
     class Meta:
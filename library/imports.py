@@ -0,0 +1,242 @@
+"""
+Importación de bibliotecas desde CSV o JSON (vista ``import_library_view`` y
+comando ``import_library``).
+
+El archivo se lee fila por fila (CSV, NDJSON y los elementos de un arreglo
+JSON, de a bloques) y se procesa por lotes, cada uno en su transacción: los
+títulos de cada lote se resuelven contra el catálogo con una sola consulta
+sobre el índice de ``Game.title`` y las entradas nuevas se insertan con
+``bulk_create``. Si el archivo resulta inválido a mitad de camino, los lotes
+anteriores quedan importados y el reporte indica en qué fila se detuvo.
+Acepta el CSV de ``export_library_csv`` y los JSON/NDJSON de
+``/api/library/export/``.
+"""
+import csv
+import io
+import json
+import re
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+
+from .caching import bump_version, user_library
+from .models import ChangeLog, Game, UserLibrary, UserStats
+
+IMPORT_CHUNK_SIZE = 1000
+# Caracteres que se leen por vez de un arreglo JSON
+JSON_BLOCK_SIZE = 64 * 1024
+JSON_SPACE = re.compile(r'\s*')
+JSON_AFTER_ITEM = re.compile(r'[\s,\]]')
+FORMATS = ('csv', 'json')
+
+# Nombres aceptados para cada columna (CSV exportado y exportación de la API)
+TITLE_COLUMNS = ('Juego', 'game_title', 'title')
+DEVELOPER_COLUMNS = ('Desarrollador', 'developer_name', 'developer')
+HOURS_COLUMNS = ('Horas Jugadas', 'hours_played')
+FAVORITE_COLUMNS = ('Favorito', 'is_favorite')
+TRUE_VALUES = {'sí', 'si', 'yes', 'true', '1'}
+MAX_HOURS = Decimal('9999.99')
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def detect_format(filename):
+    return 'csv' if filename.lower().endswith('.csv') else 'json'
+
+
+def read_rows(binary_file, file_format):
+    """Genera diccionarios desde un archivo binario CSV, NDJSON o arreglo JSON"""
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    try:
+        if file_format == 'csv':
+            yield from csv.DictReader(text)
+            return
+        first = text.readline()
+        while first and not first.strip():
+            first = text.readline()
+        if first.lstrip().startswith('['):
+            yield from _json_array_items(first.lstrip()[1:], text)
+            return
+        if first:
+            yield json.loads(first)
+        for line in text:
+            if line.strip():
+                yield json.loads(line)
+    except ImportFormatError:
+        raise
+    except (ValueError, csv.Error) as exc:
+        raise ImportFormatError(f'Archivo inválido: {exc}') from exc
+    finally:
+        text.detach()
+
+
+def _json_array_items(buffer, text):
+    """Elementos de un arreglo JSON (``buffer`` sigue al ``[``) decodificados a medida que se leen"""
+    decoder = json.JSONDecoder()
+    position = 0
+    eof = False
+    expecting = 'first'
+    while True:
+        position = JSON_SPACE.match(buffer, position).end()
+        item = end = None
+        if position < len(buffer):
+            char = buffer[position]
+            if expecting == 'separator' or (expecting == 'first' and char == ']'):
+                if char == ']':
+                    if (buffer[position + 1:] + text.read()).strip():
+                        raise ImportFormatError('Archivo inválido: contenido después del arreglo JSON.')
+                    return
+                if char != ',':
+                    raise ImportFormatError(f'Archivo inválido: se esperaba "," o "]" y hay {char!r}.')
+                position += 1
+                expecting = 'value'
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if eof:
+                    raise
+            # Un número cortado por el bloque ("3." de "3.5") se decodifica igual: solo vale
+            # si lo sigue lo que puede seguir a un elemento
+            if end is not None and (eof or JSON_AFTER_ITEM.match(buffer, end)):
+                yield item
+                position = end
+                expecting = 'separator'
+                continue
+        elif eof:
+            raise ImportFormatError('Archivo inválido: el arreglo JSON no está cerrado.')
+        block = text.read(JSON_BLOCK_SIZE)
+        eof = not block
+        buffer, position = buffer[position:] + block, 0
+
+
+def _first(row, names):
+    for name in names:
+        if name in row:
+            return row[name]
+    return None
+
+
+def parse_row(row):
+    """(título, desarrollador, campos de la entrada) o ValueError"""
+    if not isinstance(row, dict):
+        raise ValueError('La fila no es un objeto.')
+    title = str(_first(row, TITLE_COLUMNS) or '').strip()
+    if not title:
+        raise ValueError('Falta el título del juego.')
+    developer = _first(row, DEVELOPER_COLUMNS)
+    developer = str(developer).strip() if developer not in (None, '', 'N/A') else None
+    fields = {}
+    hours = _first(row, HOURS_COLUMNS)
+    if hours not in (None, ''):
+        try:
+            hours = Decimal(str(hours).replace(',', '.')).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise ValueError(f'Horas inválidas: {hours}')
+        if not hours.is_finite():
+            # NaN pasa por quantize y no admite comparaciones
+            raise ValueError(f'Horas inválidas: {hours}')
+        if not Decimal(0) <= hours <= MAX_HOURS:
+            raise ValueError(f'Horas fuera de rango: {hours}')
+        fields['hours_played'] = hours
+    favorite = _first(row, FAVORITE_COLUMNS)
+    if favorite not in (None, ''):
+        fields['is_favorite'] = favorite if isinstance(favorite, bool) else str(favorite).strip().lower() in TRUE_VALUES
+    return title, developer, fields
+
+
+def import_library(user, rows, chunk_size=IMPORT_CHUNK_SIZE):
+    """Importa ``rows`` en la biblioteca de ``user`` y devuelve el reporte.
+
+    El reporte cuenta las filas importadas y las que ya estaban en la
+    biblioteca, y lista (con su número de fila) las ambiguas, las
+    desconocidas y las inválidas. Si la lectura falla con
+    ``ImportFormatError``, ``error`` indica la fila y el motivo; lo leído
+    hasta ahí ya quedó importado.
+    """
+    report = {'created': 0, 'existing': 0, 'ambiguous': [], 'unknown': [], 'invalid': [], 'error': None}
+    seen = set()
+    rows = enumerate(rows, start=1)
+    read = 0
+    try:
+        while report['error'] is None:
+            chunk = []
+            try:
+                for item in islice(rows, chunk_size):
+                    chunk.append(item)
+            except ImportFormatError as exc:
+                report['error'] = {'row': read + len(chunk) + 1, 'error': str(exc).rstrip('.')}
+            if chunk:
+                read += len(chunk)
+                with transaction.atomic():
+                    _import_chunk(user, chunk, seen, report)
+            if len(chunk) < chunk_size:
+                break
+    finally:
+        # bulk_create no emite señales
+        UserStats.recompute([user.pk])
+        bump_version(user_library(user.pk))
+    report['matched'] = report['created'] + report['existing']
+    return report
+
+
+def _import_chunk(user, chunk, seen, report):
+    parsed = []
+    for number, row in chunk:
+        try:
+            parsed.append((number, *parse_row(row)))
+        except ValueError as exc:
+            report['invalid'].append({'row': number, 'error': str(exc)})
+
+    # Una sola consulta por lote sobre el índice de títulos
+    candidates = {}
+    games = Game.objects.filter(title__in={title for _, title, _, _ in parsed}).order_by()
+    for game_id, title, developer in games.values_list('id', 'title', 'developer__name'):
+        candidates.setdefault(title, []).append((game_id, developer))
+
+    resolved = []
+    for number, title, developer, fields in parsed:
+        matches = candidates.get(title, [])
+        if len(matches) > 1 and developer:
+            matches = [match for match in matches if (match[1] or '').casefold() == developer.casefold()] \
+                or matches
+        if not matches:
+            report['unknown'].append({'row': number, 'title': title})
+        elif len(matches) > 1:
+            report['ambiguous'].append({'row': number, 'title': title, 'candidates': [m[0] for m in matches]})
+        else:
+            resolved.append((matches[0][0], fields))
+
+    existing = set(UserLibrary.objects.filter(
+        user=user, game_id__in=[game_id for game_id, _ in resolved]
+    ).order_by().values_list('game_id', flat=True))
+    new_items = []
+    for game_id, fields in resolved:
+        if game_id in existing or game_id in seen:
+            report['existing'] += 1
+            continue
+        seen.add(game_id)
+        new_items.append(UserLibrary(user=user, game_id=game_id, **fields))
+    while new_items:
+        try:
+            with transaction.atomic():
+                UserLibrary.objects.bulk_create(new_items)
+            break
+        except IntegrityError:
+            # Otra escritura agregó alguno de estos juegos después de la lectura: ya estaban
+            taken = set(UserLibrary.objects.filter(
+                user=user, game_id__in=[item.game_id for item in new_items]
+            ).values_list('game_id', flat=True))
+            if not taken:
+                raise
+            report['existing'] += len(taken)
+            new_items = [item for item in new_items if item.game_id not in taken]
+    report['created'] += len(new_items)
+    if new_items:
+        # bulk_create no emite señales (ni devuelve los ids en todos los motores)
+        ChangeLog.record('library', UserLibrary.objects.filter(
+            user=user, game_id__in=[item.game_id for item in new_items]
+        ).values_list('pk', flat=True), user.pk)
@@ -0,0 +1,128 @@
+"""
+Trabajos de exportación en segundo plano.
+
+Las exportaciones completas (todas las reseñas o todas las bibliotecas) no
+caben en una petición web: ``enqueue`` las envía, al confirmarse la
+transacción, a un pool de hilos local que escribe el archivo en
+``MEDIA_ROOT/exports/`` lote por lote con los generadores de
+``library.exports`` y guarda el avance (filas procesadas) en el
+``ExportJob``. Al terminar se notifica a quien la pidió.
+
+El pool vive en el proceso web. Un trabajo interrumpido por un reinicio deja
+de avanzar: al arrancar (``steam_library.wsgi``/``asgi``) y al crear el pool,
+``fail_stale_jobs`` marca como fallidos los que llevan ``STALE_AFTER`` sin
+avances, y se pueden volver a pedir.
+"""
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from . import exports
+from .models import ExportJob, Notification, Review, UserLibrary
+
+# Datos exportables: queryset y columnas
+DATASETS = {
+    'reviews': (lambda: Review.objects.order_by('id'), exports.REVIEW_COLUMNS),
+    'libraries': (lambda: UserLibrary.objects.order_by('id'), exports.ALL_LIBRARIES_COLUMNS),
+}
+
+# Un trabajo en curso sin avances durante este tiempo quedó huérfano (su proceso terminó)
+STALE_AFTER = timedelta(minutes=10)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            fail_stale_jobs()
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'LIBRARY_EXPORT_WORKERS', 2), thread_name_prefix='library-export'
+            )
+        return _executor
+
+
+def enqueue(job):
+    """Ejecuta el trabajo en el pool cuando se confirme la transacción que lo creó"""
+    job_id = job.pk
+    transaction.on_commit(lambda: get_executor().submit(_run_in_worker, job_id))
+
+
+def _run_in_worker(job_id):
+    try:
+        run_export_job(job_id)
+    finally:
+        # Cada hilo del pool abre su propia conexión
+        connection.close()
+
+
+def run_export_job(job_id):
+    """Genera el archivo del trabajo; el avance se guarda después de cada lote"""
+    job = ExportJob.objects.select_related('requested_by').get(pk=job_id)
+    path = None
+    try:
+        get_queryset, columns = DATASETS[job.dataset]
+        generate, extension, _ = exports.FORMATS[job.file_format]
+        queryset = get_queryset()
+        job.status, job.started_at, job.heartbeat_at = 'running', timezone.now(), timezone.now()
+        job.total_rows = queryset.count()
+        job.save(update_fields=['status', 'started_at', 'heartbeat_at', 'total_rows'])
+
+        def progress(rows):
+            ExportJob.objects.filter(pk=job_id).update(
+                processed_rows=F('processed_rows') + rows, heartbeat_at=timezone.now()
+            )
+
+        name = f'exports/{job.dataset}-{job.pk}-{uuid.uuid4().hex[:12]}.{extension}'
+        path = default_storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as handle:
+            for chunk in generate(queryset, columns, progress):
+                handle.write(chunk)
+    except Exception as exc:
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+        fail_job(job, str(exc))
+        raise
+
+    ExportJob.objects.filter(pk=job_id).update(status='done', file=name, finished_at=timezone.now())
+    Notification.objects.create(
+        user=job.requested_by,
+        notification_type='system',
+        title='Exportación lista',
+        message=f'La exportación de {job.get_dataset_display().lower()} '
+                f'({job.get_file_format_display()}) está lista para descargar.',
+        link=reverse('export-job-download', kwargs={'pk': job_id}),
+    )
+
+
+def fail_job(job, error):
+    """Marca el trabajo como fallido y avisa a quien lo pidió (una sola vez aunque dos procesos lo intenten)"""
+    marked = ExportJob.objects.filter(pk=job.pk).exclude(status__in=['done', 'failed']).update(
+        status='failed', error=error, finished_at=timezone.now()
+    )
+    if marked:
+        Notification.objects.create(
+            user=job.requested_by,
+            notification_type='system',
+            title='Exportación fallida',
+            message=f'La exportación de {job.get_dataset_display().lower()} falló: {error}',
+        )
+
+
+def fail_stale_jobs():
+    """Marca como fallidos los trabajos en curso que llevan ``STALE_AFTER`` sin avanzar"""
+    stale = ExportJob.objects.filter(status='running', heartbeat_at__lt=timezone.now() - STALE_AFTER)
+    for job in stale.select_related('requested_by'):
+        fail_job(job, 'el proceso que la generaba se detuvo')
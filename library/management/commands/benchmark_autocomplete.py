@@ -0,0 +1,47 @@
+"""
+Management command para medir la latencia del índice de autocompletado
+"""
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from library.autocomplete import PrefixIndex
+from library.management.commands.benchmark_fuzzy_search import synthetic_word
+
+
+class Command(BaseCommand):
+    help = 'Construye un índice de prefijos con títulos sintéticos (sin base de datos) y mide su latencia'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=500_000,
+                            help='Cantidad de títulos sintéticos (por defecto 500.000)')
+        parser.add_argument('--queries', type=int, default=10_000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        titles = [
+            ' '.join(synthetic_word(rng) for _ in range(rng.randint(1, 4))).title()
+            for _ in range(options['titles'])
+        ]
+
+        started = time.monotonic()
+        index = PrefixIndex()
+        index.load(('game', pk, title, rng.randint(0, 10_000)) for pk, title in enumerate(titles, start=1))
+        self.stdout.write(f'{len(titles)} títulos indexados en {time.monotonic() - started:.1f}s '
+                          f'({len(index.keys)} claves)')
+
+        timings = []
+        for _ in range(options['queries']):
+            word = rng.choice(rng.choice(titles).split()).lower()
+            prefix = word[:rng.randint(1, len(word))]
+            begin = time.perf_counter()
+            index.search(prefix, limit=10)
+            timings.append((time.perf_counter() - begin) * 1000)
+
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        self.stdout.write(self.style.SUCCESS(
+            f'mediana {statistics.median(timings):.3f} ms, p99 {p99:.3f} ms, máximo {timings[-1]:.2f} ms'
+        ))
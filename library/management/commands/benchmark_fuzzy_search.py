@@ -0,0 +1,111 @@
+"""
+Management command para medir la búsqueda difusa sobre un catálogo sintético
+"""
+import random
+import statistics
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from library.models import Game, GameTrigram
+from library.search import fuzzy_search, title_trigrams
+
+WORDS = [
+    'half', 'life', 'witcher', 'portal', 'cyber', 'punk', 'grand', 'theft', 'auto', 'dark',
+    'souls', 'elder', 'scrolls', 'fallout', 'mass', 'effect', 'dragon', 'age', 'star', 'wars',
+    'legend', 'hunter', 'space', 'empire', 'kingdom', 'racing', 'city', 'night', 'shadow', 'war',
+    'craft', 'quest', 'tales', 'rise', 'fall', 'lost', 'world', 'black', 'ops', 'red',
+]
+# Sílabas consonante + vocal + final opcional: ~2.000 combinaciones, para que el
+# vocabulario sintético tenga una distribución de trigramas cercana a la real
+SYLLABLES = [
+    onset + vowel + coda
+    for onset in ['', 'b', 'br', 'c', 'ch', 'd', 'dr', 'f', 'g', 'gr', 'h', 'k', 'l', 'm',
+                  'n', 'p', 'qu', 'r', 's', 'sh', 't', 'th', 'tr', 'v', 'w', 'z']
+    for vowel in ['a', 'e', 'i', 'o', 'u', 'ai', 'ou', 'y']
+    for coda in ['', 'n', 'r', 's', 'x', 'l', 'ck', 'rd', 'st', 'm']
+]
+
+
+def synthetic_word(rng):
+    """Palabra real o inventada, para que el vocabulario crezca con el catálogo"""
+    if rng.random() < 0.4:
+        return rng.choice(WORDS)
+    return ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+
+
+def misspell(title, rng):
+    """Intercambia dos letras contiguas de una palabra, como un error de tecleo"""
+    words = title.split()
+    index = rng.randrange(len(words))
+    word = words[index]
+    if len(word) > 3:
+        pos = rng.randrange(len(word) - 1)
+        word = word[:pos] + word[pos + 1] + word[pos] + word[pos + 2:]
+    words[index] = word
+    return ' '.join(words)
+
+
+class Command(BaseCommand):
+    help = ('Genera un catálogo sintético (dentro de una transacción que se revierte) y mide '
+            'la latencia de la búsqueda difusa frente a icontains')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=1_000_000,
+                            help='Cantidad de títulos sintéticos (por defecto 1.000.000)')
+        parser.add_argument('--queries', type=int, default=50,
+                            help='Cantidad de consultas con errores a medir')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            titles = self.populate(options['titles'], options['batch_size'], rng)
+            samples = [misspell(rng.choice(titles), rng) for _ in range(options['queries'])]
+
+            fuzzy = self.measure(lambda q: list(
+                fuzzy_search(Game.objects.all(), q).order_by('-search_rank', 'title_length')[:10]
+            ), samples)
+            baseline = self.measure(lambda q: list(
+                Game.objects.filter(title__icontains=q)[:10]
+            ), samples)
+            self.report('Difusa (trigramas)', fuzzy)
+            self.report('icontains', baseline)
+            transaction.set_rollback(True)
+
+    def populate(self, total, batch_size, rng):
+        started = time.monotonic()
+        titles = []
+        for start in range(0, total, batch_size):
+            games = []
+            for number in range(start, min(start + batch_size, total)):
+                title = ' '.join(synthetic_word(rng) for _ in range(rng.randint(2, 4))).title()
+                titles.append(title)
+                games.append(Game(title=title, description='', release_date=date(2000, 1, 1), price=0))
+            games = Game.objects.bulk_create(games)
+            # Inserción directa: el ORM sería el cuello de botella con millones de filas
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {GameTrigram._meta.db_table} (game_id, trigram) VALUES (%s, %s)',
+                    [(game.pk, trigram) for game in games for trigram in title_trigrams(game.title)]
+                )
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'{total} títulos indexados en {elapsed:.1f}s')
+        return titles
+
+    def measure(self, run, samples):
+        timings = []
+        for query in samples:
+            started = time.perf_counter()
+            run(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}: mediana {statistics.median(timings):.1f} ms, p95 {p95:.1f} ms'
+        ))
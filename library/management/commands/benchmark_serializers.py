@@ -0,0 +1,87 @@
+"""
+Management command para comparar los serializers de DRF con la serialización rápida
+"""
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from library.fast_serializers import FastGameSerializer, FastReviewSerializer
+from library.models import Category, Developer, Game, Review, User
+from library.serializers import GameSerializer, ReviewSerializer
+
+
+class Command(BaseCommand):
+    help = ('Genera datos sintéticos (dentro de una transacción que se revierte) y mide '
+            'GameSerializer/ReviewSerializer frente a la serialización rápida por tamaño de página')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-sizes', default='10,100,1000',
+                            help='Tamaños de página separados por coma (por defecto 10,100,1000)')
+        parser.add_argument('--repeat', type=int, default=20, help='Repeticiones por medición')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        page_sizes = [int(size) for size in options['page_sizes'].split(',')]
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            self.populate(max(page_sizes), rng)
+            for size in page_sizes:
+                games = Game.objects.order_by('-release_date', 'title', 'id')[:size]
+                reviews = Review.objects.order_by('-created_at', '-id')[:size]
+                self.compare(
+                    f'Juegos ({size})',
+                    lambda: GameSerializer(
+                        games.select_related('developer').prefetch_related('categories'), many=True
+                    ).data,
+                    lambda: FastGameSerializer().serialize(games),
+                    options['repeat'],
+                )
+                self.compare(
+                    f'Reseñas ({size})',
+                    lambda: ReviewSerializer(reviews.select_related('user', 'game'), many=True).data,
+                    lambda: FastReviewSerializer().serialize(reviews),
+                    options['repeat'],
+                )
+            transaction.set_rollback(True)
+
+    def populate(self, total, rng):
+        categories = [Category.objects.create(name=f'Benchmark {number}') for number in range(20)]
+        developers = Developer.objects.bulk_create([Developer(name=f'Estudio {number}') for number in range(50)])
+        users = User.objects.bulk_create([User(username=f'benchmark{number}') for number in range(total)])
+        games = Game.objects.bulk_create([
+            Game(title=f'Juego {number}', description='Descripción ' * 20, price=rng.randint(0, 6000) / 100,
+                 release_date=date(2000, 1, 1) + timedelta(days=rng.randrange(9000)),
+                 developer=rng.choice(developers + [None]), rating=rng.randint(0, 500) / 100,
+                 total_reviews=rng.randint(0, 100), steam_url=f'https://store.steampowered.com/app/{number}/')
+            for number in range(total)
+        ])
+        Game.categories.through.objects.bulk_create([
+            Game.categories.through(game_id=game.pk, category_id=category.pk)
+            for game in games for category in rng.sample(categories, 3)
+        ])
+        Review.objects.bulk_create([
+            Review(user=user, game=rng.choice(games), rating=rng.randint(1, 5), comment='Comentario ' * 10)
+            for user in users
+        ])
+
+    def compare(self, label, standard, fast, repeat):
+        renderer = JSONRenderer()
+        if renderer.render(standard()) != renderer.render(fast()):
+            raise CommandError(f'{label}: la salida rápida difiere de la del serializer')
+        standard_ms = self.measure(standard, repeat)
+        fast_ms = self.measure(fast, repeat)
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}: DRF {standard_ms:.2f} ms, rápido {fast_ms:.2f} ms ({standard_ms / fast_ms:.1f}x)'
+        ))
+
+    def measure(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
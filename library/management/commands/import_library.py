@@ -0,0 +1,51 @@
+"""
+Management command para importar la biblioteca de un usuario desde CSV o JSON
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from library.imports import FORMATS, IMPORT_CHUNK_SIZE, detect_format, import_library, read_rows
+
+
+class Command(BaseCommand):
+    help = ('Importa juegos a la biblioteca de un usuario desde un CSV (como el de la exportación) '
+            'o un JSON/NDJSON, resolviendo los títulos por lotes')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Usuario dueño de la biblioteca')
+        parser.add_argument('path', help='Archivo CSV, JSON o NDJSON')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Formato del archivo (por defecto según la extensión)')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                            help=f'Filas por lote (por defecto {IMPORT_CHUNK_SIZE})')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size debe ser mayor que cero')
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'El usuario {options["username"]} no existe')
+
+        file_format = options['format'] or detect_format(options['path'])
+        try:
+            with open(options['path'], 'rb') as handle:
+                report = import_library(user, read_rows(handle, file_format), options['chunk_size'])
+        except OSError as exc:
+            raise CommandError(f'No se pudo leer el archivo: {exc}')
+
+        for entry in report['ambiguous']:
+            self.stdout.write(self.style.WARNING(
+                f'Fila {entry["row"]}: "{entry["title"]}" es ambiguo (juegos {entry["candidates"]})'
+            ))
+        for entry in report['unknown']:
+            self.stdout.write(self.style.WARNING(f'Fila {entry["row"]}: "{entry["title"]}" no está en el catálogo'))
+        for entry in report['invalid']:
+            self.stdout.write(self.style.ERROR(f'Fila {entry["row"]}: {entry["error"]}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'{report["matched"]} juegos encontrados ({report["created"]} agregados, '
+            f'{report["existing"]} ya estaban), {len(report["ambiguous"])} ambiguos, '
+            f'{len(report["unknown"])} desconocidos, {len(report["invalid"])} inválidos'
+        ))
+        if report['error']:
+            raise CommandError(f'Fila {report["error"]["row"]}: {report["error"]["error"]}. '
+                               'Las filas anteriores quedaron importadas')
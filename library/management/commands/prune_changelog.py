@@ -0,0 +1,28 @@
+"""
+Management command para compactar y recortar el registro de cambios de /api/sync/
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from library.models import ChangeLog
+
+
+class Command(BaseCommand):
+    help = ('Borra del registro de cambios las entradas reemplazadas por otra posterior del mismo '
+            'objeto y las más antiguas que el período de retención')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.LIBRARY_SYNC_RETENTION_DAYS,
+            help='Días de registro que se conservan (por defecto LIBRARY_SYNC_RETENTION_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days debe ser mayor que cero')
+        compacted, expired = ChangeLog.prune(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(
+            f'{compacted} entradas reemplazadas y {expired} vencidas borradas'
+        ))
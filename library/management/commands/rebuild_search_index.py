@@ -0,0 +1,16 @@
+"""
+Management command para reconstruir el índice de búsqueda de juegos
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from library.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero el índice de texto completo del catálogo'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        with transaction.atomic():
+            backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Índice reconstruido con {type(backend).__name__}'))
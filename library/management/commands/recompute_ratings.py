@@ -0,0 +1,127 @@
+"""
+Management command para recalcular las calificaciones de todos los juegos
+"""
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from library import autocomplete
+from library.caching import GAMES, HOME_SECTIONS, bump_version
+from library.models import ChangeLog, Game, Review
+
+
+class Command(BaseCommand):
+    help = ('Recalcula calificación, total de reseñas e histograma de estrellas de los '
+            'juegos con una sola agregación agrupada sobre las reseñas')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Solo juegos modificados o con reseñas creadas o editadas desde esta fecha '
+                 '(YYYY-MM-DD o ISO 8601). Borrar una reseña actualiza el juego, así que '
+                 'también se incluyen los juegos con reseñas eliminadas',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Cantidad de juegos por cada bulk_update (por defecto 1000)',
+        )
+
+    def handle(self, *args, **options):
+        since = self.parse_since(options['since'])
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size debe ser mayor que cero')
+
+        started = time.monotonic()
+        games = Game.objects.all()
+        reviews = Review.objects.all()
+        if since is not None:
+            changed = Review.objects.filter(updated_at__gte=since).values('game_id')
+            games = games.filter(Q(pk__in=changed) | Q(updated_at__gte=since))
+            reviews = reviews.filter(game_id__in=games.values('pk'))
+
+        # Una única consulta GROUP BY game_id para todos los juegos afectados
+        stats = reviews.values('game_id').annotate(
+            **Game.histogram_aggregates()
+        ).order_by('game_id')
+
+        examined = updated = 0
+        batch = []
+        for row in stats.iterator(chunk_size=batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                updated += self.write_batch(batch)
+                examined += len(batch)
+                batch = []
+        if batch:
+            updated += self.write_batch(batch)
+            examined += len(batch)
+
+        # Juegos sin reseñas que aún conservan contadores antiguos
+        stale = games.filter(
+            ~Exists(Review.objects.filter(game=OuterRef('pk')))
+        ).filter(
+            Q(total_reviews__gt=0) | Q(rating_sum__gt=0) | Q(rating__gt=0)
+            | Q(stars_1__gt=0) | Q(stars_2__gt=0) | Q(stars_3__gt=0)
+            | Q(stars_4__gt=0) | Q(stars_5__gt=0)
+        )
+        with transaction.atomic():
+            stale_ids = list(stale.select_for_update().values_list('pk', flat=True))
+            # Con las filas bloqueadas se vuelve a comprobar: una reseña confirmada entre tanto las saca
+            reset = Game.objects.filter(pk__in=stale_ids).filter(
+                ~Exists(Review.objects.filter(game=OuterRef('pk')))
+            ).update(updated_at=timezone.now(), **{field: 0 for field in Game.COUNTER_FIELDS})
+            ChangeLog.record('game', stale_ids)
+            transaction.on_commit(lambda: autocomplete.publish('game', stale_ids))
+
+        if updated or reset:
+            bump_version(HOME_SECTIONS)
+            bump_version(GAMES)
+
+        elapsed = time.monotonic() - started
+        rate = examined / elapsed if elapsed else examined
+        self.stdout.write(self.style.SUCCESS(
+            f'{examined} juegos revisados, {updated} actualizados, {reset} reiniciados '
+            f'en {elapsed:.2f}s ({rate:.0f} juegos/s)'
+        ))
+
+    def parse_since(self, value):
+        if not value:
+            return None
+        since = parse_datetime(value)
+        if since is None:
+            day = parse_date(value)
+            if day is None:
+                raise CommandError(f'Fecha inválida para --since: {value}')
+            since = datetime(day.year, day.month, day.day)
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return since
+
+    def write_batch(self, batch):
+        """Compara con los valores guardados y recalcula solo los juegos que cambiaron.
+
+        La primera agregación se hizo sin bloqueos; los juegos que difieren se
+        bloquean y se vuelven a agregar en Game.recompute_ratings, para no pisar
+        los ajustes con F() que lleguen entre la lectura y la escritura.
+        """
+        games = Game.objects.only(*(('id',) + Game.COUNTER_FIELDS)).in_bulk(
+            [row['game_id'] for row in batch]
+        )
+        changed_ids = []
+        for row in batch:
+            game = games.get(row['game_id'])
+            if game is None:
+                continue
+            stored = [getattr(game, field) for field in Game.COUNTER_FIELDS]
+            game.set_counters(row)
+            if stored != [getattr(game, field) for field in Game.COUNTER_FIELDS]:
+                changed_ids.append(game.pk)
+        if not changed_ids:
+            return 0
+        with transaction.atomic():
+            return Game.recompute_ratings(changed_ids)
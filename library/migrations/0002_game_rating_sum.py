@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:58
+
+from django.db import migrations, models
+
+
+def backfill_rating_sum(apps, schema_editor):
+    Game = apps.get_model('library', 'Game')
+    Review = apps.get_model('library', 'Review')
+    stats = Review.objects.values('game_id').annotate(
+        rating_sum=models.Sum('rating'),
+        total_reviews=models.Count('id'),
+    ).order_by()
+    for row in stats.iterator():
+        Game.objects.filter(pk=row['game_id']).update(
+            rating_sum=row['rating_sum'],
+            total_reviews=row['total_reviews'],
+            rating=round(row['rating_sum'] / row['total_reviews'], 2),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, verbose_name='Suma de calificaciones'),
+        ),
+        migrations.RunPython(backfill_rating_sum, migrations.RunPython.noop),
+    ]
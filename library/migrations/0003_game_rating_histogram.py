@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:02
+
+from django.db import migrations, models
+
+
+def backfill_histogram(apps, schema_editor):
+    Game = apps.get_model('library', 'Game')
+    Review = apps.get_model('library', 'Review')
+    stats = Review.objects.values('game_id').annotate(**{
+        f'stars_{stars}': models.Count('id', filter=models.Q(rating=stars))
+        for stars in range(1, 6)
+    }).order_by()
+    for row in stats.iterator():
+        game_id = row.pop('game_id')
+        Game.objects.filter(pk=game_id).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0002_game_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='stars_1',
+            field=models.PositiveIntegerField(default=0, verbose_name='Reseñas de 1 estrella'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='stars_2',
+            field=models.PositiveIntegerField(default=0, verbose_name='Reseñas de 2 estrellas'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='stars_3',
+            field=models.PositiveIntegerField(default=0, verbose_name='Reseñas de 3 estrellas'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='stars_4',
+            field=models.PositiveIntegerField(default=0, verbose_name='Reseñas de 4 estrellas'),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='stars_5',
+            field=models.PositiveIntegerField(default=0, verbose_name='Reseñas de 5 estrellas'),
+        ),
+        migrations.RunPython(backfill_histogram, migrations.RunPython.noop),
+    ]
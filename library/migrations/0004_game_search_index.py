@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:10
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE library_game_fts USING fts5("
+            "title, description, developer_name, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            "INSERT INTO library_game_fts (rowid, title, description, developer_name) "
+            "SELECT g.id, g.title, g.description, COALESCE(d.name, '') "
+            "FROM library_game g LEFT JOIN library_developer d ON d.id = g.developer_id"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE TABLE library_game_search ("
+            "game_id bigint PRIMARY KEY REFERENCES library_game (id) ON DELETE CASCADE "
+            "DEFERRABLE INITIALLY DEFERRED, "
+            "document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX library_game_search_document_gin ON library_game_search USING GIN (document)"
+        )
+        schema_editor.execute(
+            "INSERT INTO library_game_search (game_id, document) SELECT g.id, "
+            "setweight(to_tsvector('simple', g.title), 'A') || "
+            "setweight(to_tsvector('simple', COALESCE(d.name, '')), 'B') || "
+            "setweight(to_tsvector('simple', g.description), 'C') "
+            "FROM library_game g LEFT JOIN library_developer d ON d.id = g.developer_id"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS library_game_fts')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP TABLE IF EXISTS library_game_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0003_game_rating_histogram'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:05
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def title_trigrams(text):
+    """Copia de library.search.title_trigrams al crear esta migración"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    trigrams = set()
+    for word in re.findall(r'\w+', text):
+        padded = f' {word} '
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def backfill_trigrams(apps, schema_editor):
+    Game = apps.get_model('library', 'Game')
+    GameTrigram = apps.get_model('library', 'GameTrigram')
+    batch = []
+    for game_id, title in Game.objects.values_list('id', 'title').iterator():
+        batch.extend(GameTrigram(game_id=game_id, trigram=trigram) for trigram in title_trigrams(title))
+        if len(batch) >= 5000:
+            GameTrigram.objects.bulk_create(batch)
+            batch = []
+    GameTrigram.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_game_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GameTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3, verbose_name='Trigrama')),
+                ('game', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='library.game', verbose_name='Juego')),
+            ],
+            options={
+                'verbose_name': 'Trigrama de juego',
+                'verbose_name_plural': 'Trigramas de juegos',
+                'unique_together': {('trigram', 'game')},
+            },
+        ),
+        migrations.RunPython(backfill_trigrams, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 01:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0005_game_trigram'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(fields=['-release_date', 'title', 'id'], name='library_game_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0006_game_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Fecha de actualización'),
+        ),
+        migrations.AddField(
+            model_name='developer',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Fecha de actualización'),
+        ),
+        migrations.AddField(
+            model_name='userlibrary',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización'),
+        ),
+        migrations.AlterField(
+            model_name='game',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Fecha de actualización'),
+        ),
+    ]
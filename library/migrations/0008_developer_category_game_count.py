@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:04
+
+from django.db import migrations, models
+
+
+def backfill_game_count(apps, schema_editor):
+    Developer = apps.get_model('library', 'Developer')
+    Category = apps.get_model('library', 'Category')
+    for model in (Developer, Category):
+        counts = model.objects.annotate(total=models.Count('games')).filter(total__gt=0).values_list('pk', 'total')
+        for pk, total in list(counts):
+            model.objects.filter(pk=pk).update(game_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0007_sync_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='game_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Cantidad de juegos'),
+        ),
+        migrations.AddField(
+            model_name='developer',
+            name='game_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='Cantidad de juegos'),
+        ),
+        migrations.RunPython(backfill_game_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0008_developer_category_game_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dataset', models.CharField(choices=[('reviews', 'Todas las reseñas'), ('libraries', 'Todas las bibliotecas')], max_length=20, verbose_name='Datos')),
+                ('file_format', models.CharField(choices=[('ndjson', 'NDJSON'), ('json', 'JSON'), ('parquet', 'Parquet'), ('arrow', 'Arrow (IPC)')], default='ndjson', max_length=10, verbose_name='Formato')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En curso'), ('done', 'Terminada'), ('failed', 'Fallida')], db_index=True, default='pending', max_length=10, verbose_name='Estado')),
+                ('total_rows', models.PositiveBigIntegerField(default=0, verbose_name='Filas totales')),
+                ('processed_rows', models.PositiveBigIntegerField(default=0, verbose_name='Filas procesadas')),
+                ('file', models.FileField(blank=True, upload_to='exports/', verbose_name='Archivo')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Inicio')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('requested_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Solicitada por')),
+            ],
+            options={
+                'verbose_name': 'Exportación',
+                'verbose_name_plural': 'Exportaciones',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-17 02:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_user_stats(apps, schema_editor):
+    User = apps.get_model('library', 'User')
+    UserLibrary = apps.get_model('library', 'UserLibrary')
+    Review = apps.get_model('library', 'Review')
+    UserStats = apps.get_model('library', 'UserStats')
+    library = {
+        row.pop('user_id'): row
+        for row in UserLibrary.objects.values('user_id').annotate(
+            library_count=models.Count('id'), total_hours=models.Sum('hours_played'),
+            favorites_count=models.Count('id', filter=models.Q(is_favorite=True)),
+        ).order_by()
+    }
+    reviews = {
+        row.pop('user_id'): row
+        for row in Review.objects.values('user_id').annotate(
+            reviews_count=models.Count('id'), rating_sum=models.Sum('rating'),
+        ).order_by()
+    }
+    UserStats.objects.bulk_create([
+        UserStats(user_id=user_id, **library.get(user_id, {}), **reviews.get(user_id, {}))
+        for user_id in User.objects.values_list('pk', flat=True).iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0009_export_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+                ('library_count', models.PositiveIntegerField(default=0, verbose_name='Juegos en biblioteca')),
+                ('total_hours', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Horas jugadas')),
+                ('favorites_count', models.PositiveIntegerField(default=0, verbose_name='Favoritos')),
+                ('reviews_count', models.PositiveIntegerField(default=0, verbose_name='Reseñas')),
+                ('rating_sum', models.PositiveIntegerField(default=0, verbose_name='Suma de calificaciones')),
+            ],
+            options={
+                'verbose_name': 'Estadísticas de usuario',
+                'verbose_name_plural': 'Estadísticas de usuarios',
+            },
+        ),
+        migrations.RunPython(backfill_user_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0010_user_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('game', 'Juego'), ('developer', 'Desarrollador'), ('category', 'Categoría'), ('library', 'Biblioteca'), ('review', 'Reseña')], max_length=20, verbose_name='Tipo')),
+                ('object_id', models.BigIntegerField(verbose_name='ID del objeto')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Fecha de registro')),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Registro de cambio',
+                'verbose_name_plural': 'Registro de cambios',
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['user', 'id'], name='library_cha_user_id_c432ba_idx'), models.Index(fields=['kind', 'object_id'], name='library_cha_kind_f284f8_idx')],
+            },
+        ),
+    ]
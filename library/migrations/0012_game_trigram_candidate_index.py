@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0011_change_log'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='gametrigram',
+            index=models.Index(fields=['game', 'trigram'], name='library_gam_game_id_3e94eb_idx'),
+        ),
+    ]
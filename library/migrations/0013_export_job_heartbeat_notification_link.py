@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0012_game_trigram_candidate_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Último avance'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='link',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='Enlace'),
+        ),
+    ]
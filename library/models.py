@@ -1,12 +1,21 @@
 """
 Modelos para la aplicación de Biblioteca de Steam
 """
-from django.db import models
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import models, transaction
+from django.db.models import Count, Exists, F, FloatField, OuterRef, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.urls import reverse
 from django.utils import timezone
 
+from . import autocomplete
+
+# Mayor id de un BigAutoField: SQLite no informa el rango y uno mayor hace fallar la consulta
+MAX_ID = 2 ** 63 - 1
+
 
 class User(AbstractUser):
     """Modelo de usuario personalizado"""
@@ -28,13 +37,34 @@ class User(AbstractUser):
         return reverse('library:user_profile', kwargs={'pk': self.pk})
 
 
-class Developer(models.Model):
+class CounterFieldsMixin:
+    """Modelo con contadores (``COUNTER_FIELDS``) que se mantienen con deltas atómicos"""
+    COUNTER_FIELDS = ()
+
+    def save(self, *args, **kwargs):
+        """Al actualizar no escribe los contadores: un save() completo no debe sobrescribirlos"""
+        if (not args and not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+
+class Developer(CounterFieldsMixin, models.Model):
     """Modelo para desarrolladores de juegos"""
     name = models.CharField(max_length=200, verbose_name='Nombre')
     country = models.CharField(max_length=100, blank=True, verbose_name='País')
     website = models.URLField(blank=True, null=True, verbose_name='Sitio web')
     description = models.TextField(blank=True, verbose_name='Descripción')
     logo = models.ImageField(upload_to='developers/', blank=True, null=True, verbose_name='Logo')
+    # Mantenido por las señales de Game (ver library.signals)
+    game_count = models.PositiveIntegerField(default=0, db_index=True, editable=False,
+                                             verbose_name='Cantidad de juegos')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Fecha de actualización')
+
+    COUNTER_FIELDS = ('game_count',)
 
     class Meta:
         verbose_name = 'Desarrollador'
@@ -48,11 +78,17 @@ class Developer(models.Model):
         return reverse('library:developer_detail', kwargs={'pk': self.pk})
 
 
-class Category(models.Model):
+class Category(CounterFieldsMixin, models.Model):
     """Modelo para categorías de juegos"""
     name = models.CharField(max_length=100, unique=True, verbose_name='Nombre')
     description = models.TextField(blank=True, verbose_name='Descripción')
     icon = models.CharField(max_length=50, blank=True, verbose_name='Icono')
+    # Mantenido por las señales de Game y de sus categorías (ver library.signals)
+    game_count = models.PositiveIntegerField(default=0, db_index=True, editable=False,
+                                             verbose_name='Cantidad de juegos')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Fecha de actualización')
+
+    COUNTER_FIELDS = ('game_count',)
 
     class Meta:
         verbose_name = 'Categoría'
@@ -63,7 +99,7 @@ class Category(models.Model):
         return self.name
 
 
-class Game(models.Model):
+class Game(CounterFieldsMixin, models.Model):
     """Modelo principal para juegos"""
     title = models.CharField(max_length=200, verbose_name='Título')
     description = models.TextField(verbose_name='Descripción')
@@ -78,8 +114,18 @@ class Game(models.Model):
                                 validators=[MinValueValidator(0), MaxValueValidator(5)],
                                 verbose_name='Calificación promedio')
     total_reviews = models.IntegerField(default=0, verbose_name='Total de reseñas')
+    rating_sum = models.PositiveIntegerField(default=0, verbose_name='Suma de calificaciones')
+    stars_1 = models.PositiveIntegerField(default=0, verbose_name='Reseñas de 1 estrella')
+    stars_2 = models.PositiveIntegerField(default=0, verbose_name='Reseñas de 2 estrellas')
+    stars_3 = models.PositiveIntegerField(default=0, verbose_name='Reseñas de 3 estrellas')
+    stars_4 = models.PositiveIntegerField(default=0, verbose_name='Reseñas de 4 estrellas')
+    stars_5 = models.PositiveIntegerField(default=0, verbose_name='Reseñas de 5 estrellas')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
-    updated_at = models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Fecha de actualización')
+
+    # Campos mantenidos por las reseñas; un save() completo no debe sobrescribirlos
+    STAR_FIELDS = ('stars_1', 'stars_2', 'stars_3', 'stars_4', 'stars_5')
+    COUNTER_FIELDS = ('rating', 'total_reviews', 'rating_sum') + STAR_FIELDS
 
     class Meta:
         verbose_name = 'Juego'
@@ -88,6 +134,8 @@ class Game(models.Model):
         indexes = [
             models.Index(fields=['-release_date']),
             models.Index(fields=['title']),
+            # Paginación por cursor del catálogo: (-release_date, title, id)
+            models.Index(fields=['-release_date', 'title', 'id'], name='library_game_keyset_idx'),
         ]
 
     def __str__(self):
@@ -96,13 +144,116 @@ class Game(models.Model):
     def get_absolute_url(self):
         return reverse('library:game_detail', kwargs={'pk': self.pk})
 
+    @property
+    def rating_histogram(self):
+        """Cantidad de reseñas por estrella, de 1 a 5"""
+        return {stars: getattr(self, f'stars_{stars}') for stars in range(1, 6)}
+
+    @classmethod
+    def apply_review_change(cls, game_id, added=None, removed=None):
+        """Suma la calificación ``added`` y/o resta ``removed`` en un único UPDATE.
+
+        Las expresiones se evalúan sobre los valores de la fila en la base de
+        datos, por lo que escrituras concurrentes no se pisan entre sí.
+        """
+        if added == removed:
+            return
+        new_sum = F('rating_sum') + (added or 0) - (removed or 0)
+        new_count = F('total_reviews') + int(added is not None) - int(removed is not None)
+        changes = {}
+        if added is not None:
+            changes[f'stars_{added}'] = F(f'stars_{added}') + 1
+        if removed is not None:
+            changes[f'stars_{removed}'] = F(f'stars_{removed}') - 1
+        ChangeLog.record('game', [game_id])
+        if added is None or removed is None:
+            # total_reviews es el peso del juego en el autocompletado
+            transaction.on_commit(lambda: autocomplete.publish('game', [game_id]))
+        cls.objects.filter(pk=game_id).update(
+            updated_at=timezone.now(),
+            rating_sum=new_sum,
+            total_reviews=new_count,
+            rating=Coalesce(
+                Cast(Cast(new_sum, FloatField()) / NullIf(new_count, 0), cls._meta.get_field('rating')),
+                Value(0),
+                output_field=cls._meta.get_field('rating'),
+            ),
+            **changes
+        )
+
+    @staticmethod
+    def average_rating(rating_sum, total_reviews):
+        """Promedio redondeado a dos decimales a partir de la suma y el conteo"""
+        if not total_reviews:
+            return Decimal('0.00')
+        return (Decimal(rating_sum) / total_reviews).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+
+    @staticmethod
+    def histogram_aggregates():
+        """Agregados de conteo por estrella, para usar en aggregate()/annotate() sobre reseñas"""
+        return {
+            f'stars_{stars}': models.Count('id', filter=models.Q(rating=stars))
+            for stars in range(1, 6)
+        }
+
+    def set_counters(self, histogram):
+        """Asigna histograma, conteo, suma y promedio a partir de los conteos por estrella"""
+        for field in self.STAR_FIELDS:
+            setattr(self, field, histogram.get(field) or 0)
+        self.total_reviews = sum(getattr(self, field) for field in self.STAR_FIELDS)
+        self.rating_sum = sum(stars * count for stars, count in self.rating_histogram.items())
+        self.rating = self.average_rating(self.rating_sum, self.total_reviews)
+        # bulk_update no aplica auto_now; la representación del juego cambió
+        self.updated_at = timezone.now()
+
+    @classmethod
+    def recompute_ratings(cls, game_ids):
+        """Recalcula los contadores de varios juegos con una agregación agrupada y bulk_update.
+
+        Debe llamarse dentro de una transacción: los juegos se bloquean antes
+        de agregar, así que un apply_review_change concurrente espera y se
+        suma sobre el valor recalculado en lugar de perderse.
+        """
+        games = list(cls.objects.select_for_update().filter(pk__in=game_ids).only(
+            'id', *cls.COUNTER_FIELDS
+        ).order_by('pk'))
+        stats = {
+            row['game_id']: row
+            for row in Review.objects.filter(game_id__in=game_ids).values('game_id').annotate(
+                **cls.histogram_aggregates()
+            ).order_by()
+        }
+        for game in games:
+            game.set_counters(stats.get(game.pk, {}))
+        cls.objects.bulk_update(games, cls.COUNTER_FIELDS + ('updated_at',), batch_size=500)
+        game_ids = [game.pk for game in games]
+        ChangeLog.record('game', game_ids)
+        transaction.on_commit(lambda: autocomplete.publish('game', game_ids))
+        return len(games)
+
     def update_rating(self):
-        """Actualiza la calificación promedio del juego"""
-        reviews = self.reviews.all()
-        if reviews.exists():
-            self.rating = reviews.aggregate(models.Avg('rating'))['rating__avg']
-            self.total_reviews = reviews.count()
-            self.save(update_fields=['rating', 'total_reviews'])
+        """Recalcula desde cero la calificación promedio y el histograma del juego"""
+        self.set_counters(self.reviews.aggregate(**self.histogram_aggregates()))
+        self.save(update_fields=[*self.COUNTER_FIELDS, 'updated_at'])
+
+
+class GameTrigram(models.Model):
+    """Índice invertido de trigramas del título para la búsqueda difusa"""
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name='trigrams',
+                            verbose_name='Juego')
+    trigram = models.CharField(max_length=3, verbose_name='Trigrama')
+
+    class Meta:
+        verbose_name = 'Trigrama de juego'
+        verbose_name_plural = 'Trigramas de juegos'
+        unique_together = ['trigram', 'game']
+        indexes = [
+            # Conteo de trigramas compartidos de cada candidato sin leer la tabla
+            models.Index(fields=['game', 'trigram']),
+        ]
+
+    def __str__(self):
+        return f"{self.trigram!r} - {self.game_id}"
 
 
 class UserLibrary(models.Model):
@@ -117,6 +268,7 @@ class UserLibrary(models.Model):
                                       verbose_name='Horas jugadas')
     is_favorite = models.BooleanField(default=False, verbose_name='Favorito')
     last_played = models.DateTimeField(null=True, blank=True, verbose_name='Última vez jugado')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')
 
     class Meta:
         verbose_name = 'Biblioteca de Usuario'
@@ -168,14 +320,115 @@ class Review(models.Model):
 
     def save(self, *args, **kwargs):
         """Actualiza la calificación del juego al guardar"""
-        super().save(*args, **kwargs)
-        self.game.update_rating()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and not {'rating', 'game', 'game_id'} & set(update_fields):
+            super().save(*args, **kwargs)
+            return
+
+        with transaction.atomic():
+            previous = None
+            if not self._state.adding and self.pk:
+                previous = Review.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'game_id', 'rating'
+                ).first()
+            super().save(*args, **kwargs)
+
+            if previous is None:
+                Game.apply_review_change(self.game_id, added=self.rating)
+            elif previous[0] != self.game_id:
+                Game.apply_review_change(previous[0], removed=previous[1])
+                Game.apply_review_change(self.game_id, added=self.rating)
+            else:
+                Game.apply_review_change(self.game_id, added=self.rating, removed=previous[1])
 
     def delete(self, *args, **kwargs):
-        """Actualiza la calificación del juego al eliminar"""
-        game = self.game
-        super().delete(*args, **kwargs)
-        game.update_rating()
+        """Bloquea la fila y toma su juego y calificación actuales.
+
+        Los contadores del juego se descuentan en la señal ``post_delete``
+        (``library.signals``), que también cubre cascadas y borrados por queryset.
+        """
+        with transaction.atomic():
+            current = Review.objects.select_for_update().filter(pk=self.pk).values_list(
+                'game_id', 'rating'
+            ).first()
+            if current is None:
+                # Ya eliminada por otra escritura: no hay nada que descontar
+                self._skip_rating_change = True
+            else:
+                self.game_id, self.rating = current
+            return super().delete(*args, **kwargs)
+
+
+class UserStats(models.Model):
+    """Resumen denormalizado de la biblioteca y las reseñas de cada usuario.
+
+    Las señales de ``UserLibrary`` y ``Review`` (``library.signals``) lo
+    ajustan con incrementos F(); las escrituras masivas, que no emiten
+    señales, lo recalculan con ``recompute``.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats',
+                                verbose_name='Usuario')
+    library_count = models.PositiveIntegerField(default=0, verbose_name='Juegos en biblioteca')
+    total_hours = models.DecimalField(max_digits=12, decimal_places=2, default=0,
+                                      verbose_name='Horas jugadas')
+    favorites_count = models.PositiveIntegerField(default=0, verbose_name='Favoritos')
+    reviews_count = models.PositiveIntegerField(default=0, verbose_name='Reseñas')
+    rating_sum = models.PositiveIntegerField(default=0, verbose_name='Suma de calificaciones')
+
+    FIELDS = ('library_count', 'total_hours', 'favorites_count', 'reviews_count', 'rating_sum')
+
+    class Meta:
+        verbose_name = 'Estadísticas de usuario'
+        verbose_name_plural = 'Estadísticas de usuarios'
+
+    def __str__(self):
+        return f"{self.user_id} - {self.library_count} juegos, {self.reviews_count} reseñas"
+
+    @property
+    def average_rating(self):
+        """Calificación promedio que dio el usuario, o None si no tiene reseñas"""
+        return self.rating_sum / self.reviews_count if self.reviews_count else None
+
+    @classmethod
+    def apply_change(cls, user_id, **deltas):
+        """Suma los incrementos ``deltas`` (campo=valor) a la fila del usuario en un único UPDATE"""
+        changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+        if changes:
+            cls.objects.filter(user_id=user_id).update(**changes)
+
+    @classmethod
+    def recompute(cls, user_ids):
+        """Recalcula desde cero las filas de ``user_ids`` con dos agregaciones agrupadas"""
+        user_ids = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+        if not user_ids:
+            return
+        library = {
+            row.pop('user_id'): row
+            for row in UserLibrary.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+                library_count=Count('id'), total_hours=Sum('hours_played'),
+                favorites_count=Count('id', filter=Q(is_favorite=True)),
+            ).order_by()
+        }
+        reviews = {
+            row.pop('user_id'): row
+            for row in Review.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+                reviews_count=Count('id'), rating_sum=Sum('rating'),
+            ).order_by()
+        }
+        rows = []
+        for user_id in user_ids:
+            values = {**library.get(user_id, {}), **reviews.get(user_id, {})}
+            rows.append(cls(user_id=user_id, **{field: values.get(field) or 0 for field in cls.FIELDS}))
+        cls.objects.bulk_create(rows, update_conflicts=True, unique_fields=['user'], update_fields=cls.FIELDS)
+
+    @classmethod
+    def for_user(cls, user_id):
+        """Fila del usuario; si aún no existe se calcula en el momento"""
+        stats = cls.objects.filter(user_id=user_id).first()
+        if stats is None:
+            cls.recompute([user_id])
+            stats = cls.objects.filter(user_id=user_id).first() or cls(user_id=user_id)
+        return stats
 
 
 class Notification(models.Model):
@@ -195,7 +448,8 @@ class Notification(models.Model):
     message = models.TextField(verbose_name='Mensaje')
     is_read = models.BooleanField(default=False, verbose_name='Leída')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
-    link = models.URLField(blank=True, null=True, verbose_name='Enlace')
+    # URL absoluta o ruta del sitio (las notificaciones de los trabajos en segundo plano no conocen el host)
+    link = models.CharField(max_length=200, blank=True, null=True, verbose_name='Enlace')
 
     class Meta:
         verbose_name = 'Notificación'
@@ -209,3 +463,129 @@ class Notification(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.title}"
 
+
+class ChangeLog(models.Model):
+    """Registro de cambios (y borrados) para la sincronización incremental de la API.
+
+    Las filas se insertan al confirmar la transacción que modificó el objeto
+    (``transaction.on_commit``): el orden de los ids sigue el orden de
+    confirmación, así que un id sirve como token de ``/api/sync/`` aunque la
+    transacción haya tardado en confirmar. ``prune`` (comando
+    ``prune_changelog``) compacta y recorta el registro.
+    """
+    KIND_CHOICES = [
+        ('game', 'Juego'),
+        ('developer', 'Desarrollador'),
+        ('category', 'Categoría'),
+        ('library', 'Biblioteca'),
+        ('review', 'Reseña'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name='Tipo')
+    object_id = models.BigIntegerField(verbose_name='ID del objeto')
+    # Dueño de los objetos por usuario; sin restricción para sobrevivir al borrado del usuario
+    user = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+                             related_name='+', verbose_name='Usuario')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Fecha de registro')
+
+    class Meta:
+        verbose_name = 'Registro de cambio'
+        verbose_name_plural = 'Registro de cambios'
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['user', 'id']),
+            models.Index(fields=['kind', 'object_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id}"
+
+    @classmethod
+    def prune(cls, before):
+        """Borra las entradas con otra posterior para el mismo objeto y las anteriores a ``before``.
+
+        Un cliente cuyo token sea anterior a una entrada recortada recibe una
+        copia completa (ver ``library.sync.is_pruned``); la entrada más
+        reciente se conserva siempre para poder detectarlo. Devuelve la
+        cantidad de entradas compactadas y la de entradas vencidas.
+        """
+        newer = cls.objects.filter(kind=OuterRef('kind'), object_id=OuterRef('object_id'), id__gt=OuterRef('id'))
+        compacted, _ = cls.objects.filter(Exists(newer)).delete()
+        latest = cls.objects.order_by('-id').values_list('id', flat=True).first()
+        expired, _ = cls.objects.filter(created_at__lt=before, id__lt=latest or 0).delete()
+        return compacted, expired
+
+    @classmethod
+    def record(cls, kind, object_ids, user_id=None):
+        """Registra ``object_ids`` cuando la transacción actual se confirme"""
+        cls.record_owned(kind, [(object_id, user_id) for object_id in object_ids])
+
+    @classmethod
+    def record_owned(cls, kind, rows):
+        """Como ``record``, con pares ``(object_id, user_id)`` de varios usuarios"""
+        rows = list(rows)
+        if rows:
+            transaction.on_commit(lambda: cls.objects.bulk_create([
+                cls(kind=kind, object_id=object_id, user_id=user_id) for object_id, user_id in rows
+            ], batch_size=1000))
+
+
+class ExportJob(models.Model):
+    """Exportación completa de reseñas o bibliotecas, generada en segundo plano (ver library.jobs)"""
+    DATASET_CHOICES = [
+        ('reviews', 'Todas las reseñas'),
+        ('libraries', 'Todas las bibliotecas'),
+    ]
+    FORMAT_CHOICES = [
+        ('ndjson', 'NDJSON'),
+        ('json', 'JSON'),
+        ('parquet', 'Parquet'),
+        ('arrow', 'Arrow (IPC)'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('running', 'En curso'),
+        ('done', 'Terminada'),
+        ('failed', 'Fallida'),
+    ]
+
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs',
+                                     verbose_name='Solicitada por')
+    dataset = models.CharField(max_length=20, choices=DATASET_CHOICES, verbose_name='Datos')
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='ndjson',
+                                   verbose_name='Formato')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending', db_index=True,
+                              verbose_name='Estado')
+    total_rows = models.PositiveBigIntegerField(default=0, verbose_name='Filas totales')
+    processed_rows = models.PositiveBigIntegerField(default=0, verbose_name='Filas procesadas')
+    file = models.FileField(upload_to='exports/', blank=True, verbose_name='Archivo')
+    error = models.TextField(blank=True, verbose_name='Error')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Inicio')
+    # Se actualiza con cada lote; un trabajo en curso que deja de avanzar quedó huérfano
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='Último avance')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Fin')
+
+    class Meta:
+        verbose_name = 'Exportación'
+        verbose_name_plural = 'Exportaciones'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_dataset_display()} ({self.get_file_format_display()}) - {self.get_status_display()}"
+
+    @property
+    def percent_complete(self):
+        if self.status == 'done':
+            return 100.0
+        if not self.total_rows:
+            return 0.0
+        return round(min(self.processed_rows / self.total_rows, 1) * 100, 1)
+
+    @property
+    def rows_per_second(self):
+        if self.started_at is None:
+            return 0.0
+        elapsed = ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+        return round(self.processed_rows / elapsed, 1) if elapsed > 0 else 0.0
+
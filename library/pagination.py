@@ -0,0 +1,232 @@
+"""
+Paginación por cursor (keyset) para las vistas HTML y la API.
+
+En lugar de OFFSET/LIMIT y un COUNT(*), cada página se pide a partir de los
+valores de ordenamiento de la última fila de la anterior:
+``WHERE (release_date, title, id) < (...)`` en términos del ordenamiento. El
+costo de una página no depende de su profundidad. Los cursores son opacos
+(JSON en base64), recuerdan el ordenamiento para el que se generaron y los
+campos del ordenamiento no deben ser nulos.
+"""
+import base64
+import binascii
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _json_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    raise TypeError(f'Valor no serializable en un cursor: {value!r}')
+
+
+def encode_cursor(values, ordering, reverse=False):
+    payload = json.dumps({'v': values, 'o': ordering, 'r': int(reverse)}, default=_json_value,
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Devuelve ``(valores, ordenamiento, reverse)``; lanza InvalidCursor si no es válido"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return list(payload['v']), list(payload['o']), bool(payload['r'])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+
+
+class KeysetPage:
+    """Página de resultados con los cursores de la siguiente y la anterior"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Pagina ``queryset`` según su ``order_by`` (o el de ``ordering``), desempatando por id"""
+
+    def __init__(self, queryset, per_page, ordering=None):
+        ordering = list(ordering or queryset.query.order_by or queryset.model._meta.ordering)
+        if not {'id', '-id', 'pk', '-pk'} & set(ordering):
+            ordering.append('id')
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [field.lstrip('-') for field in ordering]
+
+    def get_page(self, cursor=None):
+        """Página posterior (o anterior) al cursor; la primera si no hay cursor"""
+        values, reverse = None, False
+        if cursor:
+            values, ordering, reverse = decode_cursor(cursor)
+            if ordering != self.ordering or len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            values = self._to_python(values, cursor)
+        ordering = [self._flip(field) for field in self.ordering] if reverse else self.ordering
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(ordering, values))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+        if not rows:
+            return KeysetPage(rows)
+
+        first, last = self._values(rows[0]), self._values(rows[-1])
+        if reverse:
+            return KeysetPage(rows, encode_cursor(last, self.ordering),
+                              encode_cursor(first, self.ordering, reverse=True) if has_more else None)
+        return KeysetPage(rows, encode_cursor(last, self.ordering) if has_more else None,
+                          encode_cursor(first, self.ordering, reverse=True) if values is not None else None)
+
+    def _field(self, name):
+        """Campo del modelo (o salida de la anotación) de un elemento del ordenamiento"""
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        model = self.queryset.model
+        if name == 'pk':
+            return model._meta.pk
+        *relations, last = name.split('__')
+        for relation in relations:
+            model = model._meta.get_field(relation).related_model
+        return model._meta.get_field(last)
+
+    def _to_python(self, values, cursor):
+        """Convierte los valores del cursor con cada campo; cualquier fallo es un cursor inválido"""
+        converted = []
+        try:
+            for name, value in zip(self.fields, values):
+                field = self._field(name)
+                value = field.to_python(value)
+                # SQLite no informa rangos de enteros a los validadores del campo
+                if value is None or (isinstance(value, int) and not -2 ** 63 <= value < 2 ** 63):
+                    raise InvalidCursor(cursor)
+                field.run_validators(value)
+                converted.append(value)
+        except (ValidationError, FieldDoesNotExist, AttributeError, TypeError, ValueError, OverflowError):
+            raise InvalidCursor(cursor)
+        return converted
+
+    def _values(self, obj):
+        if isinstance(obj, dict):  # filas de values()
+            return [obj[field] for field in self.fields]
+        return [getattr(obj, 'pk' if field == 'pk' else field) for field in self.fields]
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def _after(self, ordering, values):
+        """Filas que van después de ``values`` en ``ordering``: (a > x) OR (a = x AND b > y) ..."""
+        condition = Q()
+        for position, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[position]})
+            for previous in range(position):
+                step &= Q(**{self.fields[previous]: values[previous]})
+            condition |= step
+        return condition
+
+
+def paginate_request(request, queryset, per_page, param='cursor'):
+    """Página para una vista HTML, con ``next_url``/``previous_url`` que conservan los demás parámetros.
+
+    Un cursor inválido (p. ej. de un enlace viejo) muestra la primera página.
+    """
+    paginator = KeysetPaginator(queryset, per_page)
+    try:
+        page = paginator.get_page(request.GET.get(param))
+    except InvalidCursor:
+        page = paginator.get_page()
+    for name, cursor in (('next_url', page.next_cursor), ('previous_url', page.previous_cursor)):
+        url = None
+        if cursor is not None:
+            query = request.GET.copy()
+            query.pop('page', None)
+            query[param] = cursor
+            url = f'?{query.urlencode()}'
+        setattr(page, name, url)
+    return page
+
+
+class KeysetPagination(BasePagination):
+    """Paginación por cursor de DRF sobre KeysetPaginator (sin conteo total)"""
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            self.page = KeysetPaginator(queryset, self.page_size).get_page(
+                request.query_params.get(self.cursor_query_param)
+            )
+        except InvalidCursor:
+            raise NotFound(self.invalid_cursor_message)
+        return list(self.page)
+
+    def get_next_link(self):
+        return self._link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.page.previous_cursor)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,24 @@
+"""
+Parsers adicionales para la API REST
+"""
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """Parser para cuerpos NDJSON: un objeto JSON por línea"""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        rows = []
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as exc:
+                raise ParseError(f'JSON inválido en la línea {number}: {exc}')
+        return rows
@@ -0,0 +1,45 @@
+"""
+Caché de la representación serializada de los juegos en la API.
+
+Cada fragmento se guarda con la clave ``(id, updated_at)``: cualquier cambio
+en el juego, sus contadores de reseñas, su desarrollador o sus categorías
+actualiza ``updated_at`` (ver ``library.signals``), así que las claves viejas
+simplemente dejan de usarse. Las listas se arman con un solo ``get_many`` y
+solo los juegos ausentes se cargan y serializan.
+"""
+from django.core.cache import cache
+
+PAYLOAD_TIMEOUT = 60 * 60 * 24
+# Campos que bastan para paginar y construir las claves, sin cargar relaciones
+KEY_FIELDS = ('id', 'updated_at')
+
+
+def payload_key(game, variant):
+    return f'library:game-payload:{game.pk}:{game.updated_at.timestamp():.6f}:{variant}'
+
+
+def light_queryset(queryset):
+    """El mismo queryset cargando solo las columnas necesarias para la clave y el orden"""
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    fields = set(KEY_FIELDS) | {
+        field.lstrip('-') for field in ordering
+        if field.lstrip('-') not in queryset.query.annotations and field.lstrip('-') != 'pk'
+    }
+    return queryset.select_related(None).prefetch_related(None).only(*fields)
+
+
+def cached_payloads(games, render, variant=''):
+    """Representaciones de ``games`` (con ``id`` y ``updated_at``) en el mismo orden.
+
+    ``render(ids)`` devuelve ``{id: representación}``; solo se llama para los
+    juegos que no están en caché.
+    """
+    games = list(games)
+    keys = {game.pk: payload_key(game, variant) for game in games}
+    found = cache.get_many(keys.values())
+    missing = [pk for pk, key in keys.items() if key not in found]
+    if missing:
+        fresh = {keys[pk]: data for pk, data in render(missing).items()}
+        cache.set_many(fresh, PAYLOAD_TIMEOUT)
+        found.update(fresh)
+    return [found[keys[game.pk]] for game in games if keys[game.pk] in found]
@@ -0,0 +1,44 @@
+"""
+Renderers adicionales para la API REST
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Renderer NDJSON: un objeto JSON por línea (``?format=ndjson``)"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return b''.join(self.render_lines(data if isinstance(data, list) else [data]))
+
+    def render_lines(self, items):
+        """Genera cada elemento como una línea JSON compacta"""
+        renderer = JSONRenderer()
+        for item in items:
+            yield renderer.render(item) + b'\n'
+
+
+class ColumnarRenderer(BaseRenderer):
+    """Formatos binarios que las vistas envían en streaming (ver ``library.exports``).
+
+    ``render`` solo se usa para las respuestas de error, que salen como JSON.
+    """
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return JSONRenderer().render(data)
+
+
+class ParquetRenderer(ColumnarRenderer):
+    media_type = 'application/vnd.apache.parquet'
+    format = 'parquet'
+
+
+class ArrowStreamRenderer(ColumnarRenderer):
+    media_type = 'application/vnd.apache.arrow.stream'
+    format = 'arrow'
@@ -0,0 +1,291 @@
+"""
+Búsqueda de texto completo sobre el catálogo de juegos.
+
+Cada motor de base de datos usa su propio índice: una tabla virtual FTS5 en
+SQLite y una columna ``tsvector`` con índice GIN en PostgreSQL. Para otros
+motores se usa ``icontains`` como antes. El backend puede forzarse con el
+setting ``LIBRARY_SEARCH_BACKEND`` (ruta a una clase).
+
+La búsqueda difusa (tolerante a errores de escritura) usa un índice invertido
+de trigramas de los títulos, independiente del motor de base de datos.
+"""
+import math
+import re
+import unicodedata
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, FloatField, OuterRef, Q, Subquery
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, Length
+from django.utils.module_loading import import_string
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+# Fracción mínima de los trigramas de la consulta que debe contener un título
+FUZZY_THRESHOLD = 0.3
+# Entradas del índice que se leen como máximo para reunir candidatos (setting LIBRARY_FUZZY_CANDIDATES):
+# más entradas encuentran más títulos escritos con palabras comunes, a costa de latencia
+FUZZY_CANDIDATES = 5000
+# Los tamaños de las listas cambian despacio: se cachean para elegir los trigramas raros
+TRIGRAM_SIZE_TIMEOUT = 60 * 60
+
+
+def search_terms(query):
+    """Palabras de la consulta, sin operadores ni signos de puntuación"""
+    return TERM_RE.findall(query.lower())
+
+
+def normalize(text):
+    """Minúsculas y sin acentos, para comparar títulos"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def title_trigrams(text):
+    """Trigramas de cada palabra al estilo de pg_trgm (" wi", "wit", ..., "er ").
+
+    Se omite el trigrama de la inicial sola ("  w"): aparece en una de cada
+    pocas palabras del catálogo y solo alargaría las listas del índice.
+    """
+    trigrams = set()
+    for word in TERM_RE.findall(normalize(text)):
+        padded = f' {word} '
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def index_game_trigrams(games):
+    """Regenera los trigramas de los juegos dados (instancias con ``pk`` y ``title``)"""
+    from .models import GameTrigram
+    games = list(games)
+    GameTrigram.objects.filter(game_id__in=[game.pk for game in games]).delete()
+    GameTrigram.objects.bulk_create([
+        GameTrigram(game_id=game.pk, trigram=trigram)
+        for game in games
+        for trigram in title_trigrams(game.title)
+    ], batch_size=1000)
+
+
+def candidate_trigrams(trigrams, budget=FUZZY_CANDIDATES):
+    """Los trigramas más raros de la consulta cuyas listas del índice suman a lo sumo ``budget`` entradas.
+
+    Cada conteo se corta en ``budget``, así que ninguna lista común se lee
+    entera, y se cachea. Siempre se devuelve al menos el más raro.
+    """
+    from .models import GameTrigram
+    keys = {trigram: f'library:trigram-size:{budget}:{trigram.encode().hex()}' for trigram in trigrams}
+    cached = cache.get_many(list(keys.values()))
+    sizes = {trigram: cached[key] for trigram, key in keys.items() if key in cached}
+    missing = {
+        trigram: GameTrigram.objects.filter(trigram=trigram).values('pk')[:budget].count()
+        for trigram in trigrams if trigram not in sizes
+    }
+    cache.set_many({keys[trigram]: size for trigram, size in missing.items()}, TRIGRAM_SIZE_TIMEOUT)
+    sizes.update(missing)
+    selected, total = [], 0
+    for size, trigram in sorted((size, trigram) for trigram, size in sizes.items()):
+        if selected and total + size > budget:
+            break
+        selected.append(trigram)
+        total += size
+    return selected
+
+
+def fuzzy_search(queryset, query, threshold=FUZZY_THRESHOLD):
+    """Filtra por similitud de trigramas del título y anota ``search_rank`` (0 a 1).
+
+    Los candidatos son los juegos de las listas del índice de los trigramas
+    más raros de la consulta, hasta ``LIBRARY_FUZZY_CANDIDATES`` entradas: un
+    error de tipeo crea trigramas raros o inexistentes, pero el título buscado
+    conserva casi todos los demás y suele aparecer en alguna de esas listas
+    (no siempre si todas sus palabras son comunes). El costo no depende del
+    tamaño del catálogo. Solo a los candidatos se les cuentan los trigramas
+    compartidos (índice ``(game, trigram)``), y todo queda en subconsultas:
+    los filtros que el llamador aplique después se combinan en la misma
+    consulta.
+    """
+    from .models import GameTrigram
+    trigrams = sorted(title_trigrams(query))
+    if not trigrams:
+        return queryset.none()
+    min_shared = max(1, math.ceil(len(trigrams) * threshold))
+    budget = getattr(settings, 'LIBRARY_FUZZY_CANDIDATES', FUZZY_CANDIDATES)
+    # Aun si el más raro es una lista común, no se leen más de ``budget`` entradas
+    candidates = GameTrigram.objects.filter(trigram__in=candidate_trigrams(trigrams, budget)).order_by().values(
+        'game_id'
+    )[:budget]
+    shared = GameTrigram.objects.filter(trigram__in=trigrams).order_by().values('game_id').annotate(
+        shared=Count('id')
+    )
+    matches = shared.filter(game_id__in=candidates, shared__gte=min_shared).values('game_id')
+    return queryset.filter(pk__in=matches).annotate(
+        search_rank=Cast(Subquery(shared.filter(game_id=OuterRef('pk')).values('shared')), FloatField())
+        / len(trigrams),
+        title_length=Length('title'),
+    )
+
+
+class SearchBackend:
+    """Backend base: filtra con icontains y no calcula relevancia"""
+
+    def search(self, queryset, query):
+        """Filtra ``queryset`` por ``query``; si hay relevancia la anota como ``search_rank``"""
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(developer__name__icontains=query)
+        )
+
+    def index_games(self, game_ids):
+        """Indexa (o reindexa) los juegos indicados"""
+
+    def remove_games(self, game_ids):
+        """Elimina los juegos indicados del índice"""
+
+    def rebuild(self):
+        """Reconstruye el índice completo"""
+
+    def documents(self, game_ids):
+        from .models import Game
+        return Game.objects.filter(pk__in=game_ids).values_list(
+            'id', 'title', 'description', 'developer__name'
+        ).order_by()
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """Índice en la tabla virtual FTS5 ``library_game_fts`` (rowid = id del juego)"""
+    table = 'library_game_fts'
+    # Pesos de bm25 para título, descripción y desarrollador
+    weights = (10.0, 1.0, 5.0)
+
+    def match_expression(self, query):
+        return ' '.join(f'"{term}"*' for term in search_terms(query))
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return queryset.none()
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [match])
+        ).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({self.table}, {weights}) FROM {self.table} '
+            f'WHERE {self.table} MATCH %s AND rowid = "library_game"."id"',
+            [match], output_field=FloatField()
+        ))
+
+    def index_games(self, game_ids):
+        game_ids = list(game_ids)
+        if not game_ids:
+            return
+        rows = [
+            (game_id, title, description, developer_name or '')
+            for game_id, title, description, developer_name in self.documents(game_ids)
+        ]
+        with connection.cursor() as cursor:
+            self._delete(cursor, game_ids)
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, title, description, developer_name) '
+                f'VALUES (%s, %s, %s, %s)',
+                rows
+            )
+
+    def remove_games(self, game_ids):
+        game_ids = list(game_ids)
+        if game_ids:
+            with connection.cursor() as cursor:
+                self._delete(cursor, game_ids)
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, title, description, developer_name) '
+                f'SELECT g.id, g.title, g.description, COALESCE(d.name, \'\') '
+                f'FROM library_game g LEFT JOIN library_developer d ON d.id = g.developer_id'
+            )
+
+    def _delete(self, cursor, game_ids):
+        placeholders = ', '.join(['%s'] * len(game_ids))
+        cursor.execute(f'DELETE FROM {self.table} WHERE rowid IN ({placeholders})', game_ids)
+
+
+class PostgresFullTextBackend(SearchBackend):
+    """Índice ``tsvector`` con GIN en la tabla ``library_game_search``"""
+    table = 'library_game_search'
+    config = 'simple'
+    document_sql = (
+        "setweight(to_tsvector(%(config)s, {title}), 'A') || "
+        "setweight(to_tsvector(%(config)s, {developer}), 'B') || "
+        "setweight(to_tsvector(%(config)s, {description}), 'C')"
+    )
+
+    def tsquery(self, query):
+        return ' & '.join(f'{term}:*' for term in search_terms(query))
+
+    def search(self, queryset, query):
+        tsquery = self.tsquery(query)
+        if not tsquery:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT game_id FROM {self.table} WHERE document @@ to_tsquery(%s, %s)',
+            [self.config, tsquery]
+        )).annotate(search_rank=RawSQL(
+            f'SELECT ts_rank(document, to_tsquery(%s, %s)) FROM {self.table} '
+            f'WHERE game_id = "library_game"."id"',
+            [self.config, tsquery], output_field=FloatField()
+        ))
+
+    def index_games(self, game_ids):
+        game_ids = list(game_ids)
+        if not game_ids:
+            return
+        document = self.document_sql.format(title='%(title)s', developer='%(developer)s',
+                                            description='%(description)s')
+        rows = [
+            {'config': self.config, 'id': game_id, 'title': title,
+             'description': description, 'developer': developer_name or ''}
+            for game_id, title, description, developer_name in self.documents(game_ids)
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} (game_id, document) VALUES (%(id)s, {document}) '
+                f'ON CONFLICT (game_id) DO UPDATE SET document = EXCLUDED.document',
+                rows
+            )
+
+    def remove_games(self, game_ids):
+        game_ids = list(game_ids)
+        if game_ids:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {self.table} WHERE game_id = ANY(%s)', [game_ids])
+
+    def rebuild(self):
+        document = self.document_sql.format(title='g.title', developer="COALESCE(d.name, '')",
+                                            description='g.description')
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (game_id, document) SELECT g.id, {document} '
+                f'FROM library_game g LEFT JOIN library_developer d ON d.id = g.developer_id',
+                {'config': self.config}
+            )
+
+
+VENDOR_BACKENDS = {
+    'sqlite': SQLiteFTS5Backend,
+    'postgresql': PostgresFullTextBackend,
+}
+
+_backend = None
+
+
+def get_search_backend():
+    """Devuelve el backend configurado, o el adecuado para el motor de base de datos"""
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'LIBRARY_SEARCH_BACKEND', None)
+        backend_class = import_string(path) if path else VENDOR_BACKENDS.get(connection.vendor, SearchBackend)
+        _backend = backend_class()
+    return _backend
@@ -3,19 +3,22 @@ Serializers para la API REST
 """
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
-from .models import Game, Review, UserLibrary, Developer, Category
+from django.urls import reverse
+from . import exports
+from .models import Game, Review, UserLibrary, Developer, Category, ExportJob
+from .sparse import SparseFieldsSerializerMixin
 
 User = get_user_model()
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer para categorías"""
     class Meta:
         model = Category
         fields = ['id', 'name', 'description', 'icon']
 
 
-class DeveloperSerializer(serializers.ModelSerializer):
+class DeveloperSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer para desarrolladores"""
     game_count = serializers.IntegerField(read_only=True)
     
@@ -24,19 +27,21 @@ class DeveloperSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'country', 'website', 'description', 'logo', 'game_count']
 
 
-class GameSerializer(serializers.ModelSerializer):
+class GameSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer para juegos"""
     developer_name = serializers.CharField(source='developer.name', read_only=True)
     categories = CategorySerializer(many=True, read_only=True)
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
+    column_dependencies = {'rating_histogram': Game.STAR_FIELDS}
     
     class Meta:
         model = Game
         fields = ['id', 'title', 'description', 'release_date', 'price', 'cover_image',
                  'steam_url', 'developer', 'developer_name', 'categories', 'rating',
-                 'total_reviews', 'created_at', 'updated_at']
+                 'total_reviews', 'rating_histogram', 'created_at', 'updated_at']
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer para reseñas"""
     user_username = serializers.CharField(source='user.username', read_only=True)
     game_title = serializers.CharField(source='game.title', read_only=True)
@@ -48,7 +53,20 @@ class ReviewSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'created_at', 'updated_at']
 
 
-class UserLibrarySerializer(serializers.ModelSerializer):
+class BulkReviewSerializer(ReviewSerializer):
+    """Valida filas de importación masiva de reseñas.
+
+    Juego y usuario se reciben como IDs y la vista verifica su existencia y
+    la unicidad (usuario, juego) en bloque, evitando consultas por fila.
+    """
+    game = serializers.IntegerField(min_value=1)
+    user = serializers.IntegerField(min_value=1, required=False)
+
+    class Meta(ReviewSerializer.Meta):
+        validators = []
+
+
+class UserLibrarySerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """Serializer para biblioteca de usuario"""
     game_title = serializers.CharField(source='game.title', read_only=True)
     game_cover = serializers.ImageField(source='game.cover_image', read_only=True)
@@ -60,6 +78,27 @@ class UserLibrarySerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'date_added']
 
 
+class BulkLibraryOperationSerializer(serializers.Serializer):
+    """Valida una operación de sincronización masiva de la biblioteca.
+
+    ``add`` agrega el juego (y aplica los campos si ya estaba), ``set``
+    actualiza los campos de un juego de la biblioteca y ``remove`` lo quita.
+    """
+    OPERATIONS = ('add', 'set', 'remove')
+    FIELDS = ('hours_played', 'is_favorite', 'last_played')
+
+    op = serializers.ChoiceField(choices=OPERATIONS)
+    game = serializers.IntegerField(min_value=1)
+    hours_played = serializers.DecimalField(max_digits=6, decimal_places=2, min_value=0, required=False)
+    is_favorite = serializers.BooleanField(required=False)
+    last_played = serializers.DateTimeField(required=False, allow_null=True)
+
+    def validate(self, data):
+        if data['op'] == 'set' and not any(field in data for field in self.FIELDS):
+            raise serializers.ValidationError('La operación set requiere al menos un campo.')
+        return data
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Serializer para usuarios"""
     library_count = serializers.IntegerField(read_only=True)
@@ -71,3 +110,31 @@ class UserSerializer(serializers.ModelSerializer):
                  'is_premium', 'date_joined', 'library_count', 'reviews_count']
         read_only_fields = ['date_joined']
 
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    """Serializer para los trabajos de exportación (avance y descarga)"""
+    requested_by = serializers.CharField(source='requested_by.username', read_only=True)
+    percent_complete = serializers.FloatField(read_only=True)
+    rows_per_second = serializers.FloatField(read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ExportJob
+        fields = ['id', 'requested_by', 'dataset', 'file_format', 'status', 'total_rows', 'processed_rows',
+                 'percent_complete', 'rows_per_second', 'download_url', 'error', 'created_at',
+                 'started_at', 'finished_at']
+        read_only_fields = ['status', 'total_rows', 'processed_rows', 'error', 'created_at',
+                           'started_at', 'finished_at']
+
+    def get_download_url(self, obj):
+        if obj.status != 'done':
+            return None
+        url = reverse('export-job-download', kwargs={'pk': obj.pk})
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def validate_file_format(self, value):
+        if exports.FORMATS[value][2] and not exports.columnar_available():
+            raise serializers.ValidationError('La exportación Parquet/Arrow requiere instalar pyarrow.')
+        return value
+
@@ -0,0 +1,443 @@
+"""
+Señales de la aplicación library
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import autocomplete
+from .caching import (
+    CATEGORIES, DEVELOPERS, GAMES, HOME_SECTIONS, REVIEWS, bump_version, reset_unread_notifications,
+    user_library,
+)
+from .models import (
+    Category, ChangeLog, Developer, Game, Notification, Review, User, UserLibrary, UserStats
+)
+from .search import get_search_backend, index_game_trigrams
+
+SEARCH_FIELDS = {'title', 'description', 'developer', 'developer_id'}
+
+
+# ==================== ÍNDICE DE BÚSQUEDA ====================
+
+@receiver(post_save, sender=Game)
+def index_game(sender, instance, update_fields=None, **kwargs):
+    """Reindexa el juego si cambió alguno de los campos buscables"""
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        get_search_backend().index_games([instance.pk])
+    if update_fields is None or 'title' in update_fields:
+        index_game_trigrams([instance])
+
+
+@receiver(post_delete, sender=Game)
+def unindex_game(sender, instance, **kwargs):
+    get_search_backend().remove_games([instance.pk])
+
+
+@receiver(post_save, sender=Developer)
+def index_developer_games(sender, instance, created, **kwargs):
+    """El nombre del desarrollador forma parte del documento de cada juego"""
+    if not created:
+        get_search_backend().index_games(instance.games.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Developer)
+def remember_developer_games(sender, instance, **kwargs):
+    instance._search_game_ids = list(instance.games.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Developer)
+def reindex_orphaned_games(sender, instance, **kwargs):
+    """Tras borrar el desarrollador sus juegos quedan sin él (SET_NULL)"""
+    get_search_backend().index_games(getattr(instance, '_search_game_ids', []))
+
+
+# ==================== AUTOCOMPLETADO ====================
+# Solo se publican los cambios de nombre o de peso (reseñas de un juego,
+# juegos de un desarrollador); los pesos escritos con update() se publican
+# donde se escriben (Game.apply_review_change, adjust_game_count).
+
+def publish_autocomplete(kind, pks):
+    pks = list(pks)
+    transaction.on_commit(lambda: autocomplete.publish(kind, pks))
+
+
+@receiver(pre_save, sender=Game)
+def remember_game_suggestion(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None and not {'title', 'total_reviews'} & set(update_fields)):
+        return
+    instance._previous_suggestion = Game.objects.filter(pk=instance.pk).values_list(
+        'title', 'total_reviews'
+    ).first()
+
+
+@receiver(post_save, sender=Game)
+def autocomplete_game(sender, instance, created, **kwargs):
+    previous = instance.__dict__.pop('_previous_suggestion', None)
+    if created or (previous is not None and previous != (instance.title, instance.total_reviews)):
+        publish_autocomplete('game', [instance.pk])
+
+
+@receiver(pre_save, sender=Developer)
+def remember_developer_name(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None and 'name' not in update_fields):
+        return
+    instance._previous_name = Developer.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Developer)
+def autocomplete_developer(sender, instance, created, **kwargs):
+    previous = instance.__dict__.pop('_previous_name', None)
+    if created or (previous is not None and previous != instance.name):
+        publish_autocomplete('developer', [instance.pk])
+
+
+@receiver(post_delete, sender=Game)
+@receiver(post_delete, sender=Developer)
+def autocomplete_remove(sender, instance, **kwargs):
+    # Django pone el pk en None al terminar el borrado: se lee ahora
+    publish_autocomplete('game' if sender is Game else 'developer', [instance.pk])
+
+
+# ==================== CALIFICACIONES ====================
+
+def deleting_game(origin):
+    """¿El borrado en curso es en cascada desde juegos? (``origin`` es el juego o el queryset borrado)"""
+    return isinstance(origin, Game) or getattr(origin, 'model', None) is Game
+
+
+@receiver(post_delete, sender=Review)
+def uncount_deleted_review(sender, instance, origin=None, **kwargs):
+    """Descuenta la reseña del juego y del usuario; también se emite en borrados por queryset.
+
+    En la cascada del borrado de un juego no se hace nada por fila: ver
+    settle_deleted_game_dependents.
+    """
+    if deleting_game(origin):
+        return
+    if not instance.__dict__.pop('_skip_rating_change', False):
+        Game.apply_review_change(instance.game_id, removed=instance.rating)
+        UserStats.apply_change(instance.user_id, reviews_count=-1, rating_sum=-instance.rating)
+
+
+# ==================== PORTADA ====================
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_home_sections(sender, origin=None, **kwargs):
+    """Las secciones de la portada dependen de fechas, calificaciones y conteos de reseñas"""
+    if sender is Review and deleting_game(origin):
+        return
+    transaction.on_commit(lambda: bump_version(HOME_SECTIONS))
+
+
+# ==================== NOTIFICACIONES ====================
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def invalidate_unread_count(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: reset_unread_notifications(user_id))
+
+
+# ==================== ESTADÍSTICAS DE USUARIO ====================
+# UserStats se ajusta con F() en la misma transacción que cada escritura;
+# el borrado de reseñas se descuenta en uncount_deleted_review.
+
+LIBRARY_STATS_FIELDS = {'user', 'user_id', 'hours_played', 'is_favorite'}
+REVIEW_STATS_FIELDS = {'user', 'user_id', 'rating'}
+
+
+def library_item_stats(user_id, hours_played, is_favorite, sign=1):
+    return user_id, {
+        'library_count': sign,
+        'total_hours': sign * Decimal(str(hours_played or 0)),
+        'favorites_count': sign * int(bool(is_favorite)),
+    }
+
+
+def apply_stats_change(previous, current):
+    """Aplica la diferencia entre dos (usuario, valores); con el mismo usuario en un solo UPDATE"""
+    if previous[0] == current[0]:
+        UserStats.apply_change(current[0], **{
+            field: delta - previous[1][field] for field, delta in current[1].items()
+        })
+    else:
+        UserStats.apply_change(previous[0], **{field: -delta for field, delta in previous[1].items()})
+        UserStats.apply_change(current[0], **current[1])
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=UserLibrary)
+def remember_library_stats(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None and not LIBRARY_STATS_FIELDS & set(update_fields)):
+        return
+    instance._previous_stats = UserLibrary.objects.filter(pk=instance.pk).values_list(
+        'user_id', 'hours_played', 'is_favorite'
+    ).first()
+
+
+@receiver(post_save, sender=UserLibrary)
+def count_library_item(sender, instance, created, **kwargs):
+    current = library_item_stats(instance.user_id, instance.hours_played, instance.is_favorite)
+    if created:
+        UserStats.apply_change(current[0], **current[1])
+        return
+    previous = instance.__dict__.pop('_previous_stats', None)
+    if previous is not None:
+        apply_stats_change(library_item_stats(*previous), current)
+
+
+@receiver(post_delete, sender=UserLibrary)
+def uncount_library_item(sender, instance, origin=None, **kwargs):
+    if deleting_game(origin):
+        return
+    user_id, deltas = library_item_stats(instance.user_id, instance.hours_played, instance.is_favorite, -1)
+    UserStats.apply_change(user_id, **deltas)
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_stats(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None and not REVIEW_STATS_FIELDS & set(update_fields)):
+        return
+    instance._previous_stats = Review.objects.filter(pk=instance.pk).values_list('user_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def count_review(sender, instance, created, **kwargs):
+    current = (instance.user_id, {'reviews_count': 1, 'rating_sum': instance.rating})
+    if created:
+        UserStats.apply_change(current[0], **current[1])
+        return
+    previous = instance.__dict__.pop('_previous_stats', None)
+    if previous is not None:
+        apply_stats_change((previous[0], {'reviews_count': 1, 'rating_sum': previous[1]}), current)
+
+
+# ==================== VALIDADORES DE LA API ====================
+
+TABLE_VERSIONS = {Game: GAMES, Review: REVIEWS, Developer: DEVELOPERS, Category: CATEGORIES}
+
+
+# Un receptor por modelo: uno sin sender impediría el borrado rápido (sin
+# cargar las filas) de cualquier modelo, por ejemplo el de GameTrigram.
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=Developer)
+@receiver(post_delete, sender=Developer)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def bump_table_version(sender, origin=None, **kwargs):
+    if sender is Review and deleting_game(origin):
+        return
+    name = TABLE_VERSIONS[sender]
+    transaction.on_commit(lambda: bump_version(name))
+
+
+@receiver(m2m_changed, sender=Game.categories.through)
+def bump_game_categories_version(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(lambda: bump_version(GAMES))
+
+
+@receiver(post_save, sender=UserLibrary)
+@receiver(post_delete, sender=UserLibrary)
+def bump_user_library_version(sender, instance, origin=None, **kwargs):
+    if deleting_game(origin):
+        return
+    name = user_library(instance.user_id)
+    transaction.on_commit(lambda: bump_version(name))
+
+
+# ==================== REPRESENTACIÓN DE LOS JUEGOS ====================
+# El payload cacheado de cada juego se identifica por su updated_at: los
+# cambios en su desarrollador o sus categorías también deben actualizarlo.
+
+def touch_games(games):
+    ChangeLog.record('game', games.values_list('pk', flat=True))
+    games.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Developer)
+def touch_developer_games(sender, instance, created, **kwargs):
+    if not created:
+        touch_games(Game.objects.filter(developer=instance))
+
+
+@receiver(post_delete, sender=Developer)
+def touch_orphaned_games(sender, instance, **kwargs):
+    touch_games(Game.objects.filter(pk__in=getattr(instance, '_search_game_ids', [])))
+
+
+@receiver(post_save, sender=Category)
+def touch_category_games(sender, instance, created, **kwargs):
+    if not created:
+        touch_games(Game.objects.filter(categories=instance))
+
+
+@receiver(pre_delete, sender=Category)
+def remember_category_games(sender, instance, **kwargs):
+    instance._game_ids = list(instance.games.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+def touch_uncategorized_games(sender, instance, **kwargs):
+    touch_games(Game.objects.filter(pk__in=getattr(instance, '_game_ids', [])))
+
+
+@receiver(m2m_changed, sender=Game.categories.through)
+def touch_recategorized_games(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        game_ids = [instance.pk]
+    elif action == 'pre_clear':
+        instance._game_ids = list(instance.games.values_list('pk', flat=True))
+        return
+    elif action == 'post_clear':
+        game_ids = getattr(instance, '_game_ids', [])
+    else:
+        game_ids = pk_set or []
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        touch_games(Game.objects.filter(pk__in=game_ids))
+
+
+# ==================== CONTADORES DE JUEGOS ====================
+# Developer.game_count y Category.game_count se ajustan con F() en cada cambio,
+# en lugar de un COUNT sobre toda la tabla de juegos en cada listado.
+
+def adjust_game_count(model, pks, delta):
+    pks = [pk for pk in pks if pk is not None]
+    if not pks or not delta:
+        return
+    changes = {'game_count': F('game_count') + delta}
+    if model is Developer:
+        # game_count forma parte de la representación del desarrollador en la API
+        changes['updated_at'] = timezone.now()
+        ChangeLog.record('developer', pks)
+        publish_autocomplete('developer', pks)
+    model.objects.filter(pk__in=pks).update(**changes)
+
+
+@receiver(pre_save, sender=Game)
+def remember_game_developer(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None and not {'developer', 'developer_id'} & set(update_fields)):
+        return
+    instance._previous_developer_id = Game.objects.filter(pk=instance.pk).values_list(
+        'developer_id', flat=True
+    ).first()
+
+
+@receiver(post_save, sender=Game)
+def count_game_developer(sender, instance, created, **kwargs):
+    if created:
+        adjust_game_count(Developer, [instance.developer_id], 1)
+        return
+    previous = instance.__dict__.pop('_previous_developer_id', instance.developer_id)
+    if previous != instance.developer_id:
+        adjust_game_count(Developer, [previous], -1)
+        adjust_game_count(Developer, [instance.developer_id], 1)
+
+
+@receiver(pre_delete, sender=Game)
+def remember_game_categories(sender, instance, **kwargs):
+    # Las filas de la tabla intermedia se borran en cascada sin m2m_changed
+    instance._category_ids = list(instance.categories.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Game)
+def uncount_deleted_game(sender, instance, **kwargs):
+    adjust_game_count(Developer, [instance.developer_id], -1)
+    adjust_game_count(Category, getattr(instance, '_category_ids', []), -1)
+
+
+@receiver(pre_delete, sender=Game)
+def remember_game_dependents(sender, instance, **kwargs):
+    # Reseñas y entradas de biblioteca que se borrarán en cascada, con su usuario
+    instance._review_owners = list(Review.objects.filter(game=instance).values_list('pk', 'user_id'))
+    instance._library_owners = list(UserLibrary.objects.filter(game=instance).values_list('pk', 'user_id'))
+
+
+@receiver(post_delete, sender=Game)
+def settle_deleted_game_dependents(sender, instance, **kwargs):
+    """Ajusta una sola vez lo que las filas borradas en cascada ajustarían una por una"""
+    reviews = instance.__dict__.pop('_review_owners', [])
+    library = instance.__dict__.pop('_library_owners', [])
+    user_ids = {user_id for _, user_id in reviews + library}
+    if not user_ids:
+        return
+    UserStats.recompute(user_ids)
+    ChangeLog.record_owned('review', reviews)
+    ChangeLog.record_owned('library', library)
+    names = [REVIEWS] if reviews else []
+    names += [user_library(user_id) for user_id in {user_id for _, user_id in library}]
+
+    def bump_versions():
+        for name in names:
+            bump_version(name)
+    transaction.on_commit(bump_versions)
+
+
+@receiver(m2m_changed, sender=Game.categories.through)
+def count_game_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        related = instance.games if reverse else instance.categories
+        instance._cleared_ids = list(related.values_list('pk', flat=True))
+        return
+    if action == 'pre_remove':
+        # pk_set trae todos los ids pedidos, incluso los que no estaban enlazados
+        links = Game.categories.through.objects
+        if reverse:
+            links = links.filter(category_id=instance.pk, game_id__in=pk_set).values_list('game_id', flat=True)
+        else:
+            links = links.filter(game_id=instance.pk, category_id__in=pk_set).values_list('category_id', flat=True)
+        instance._removed_ids = list(links)
+        return
+    if action == 'post_add':
+        changed = list(pk_set or [])
+    elif action == 'post_remove':
+        changed = instance.__dict__.pop('_removed_ids', [])
+    elif action == 'post_clear':
+        changed = instance.__dict__.pop('_cleared_ids', [])
+    else:
+        return
+    delta = 1 if action == 'post_add' else -1
+    if reverse:
+        # instance es la categoría y changed son juegos
+        adjust_game_count(Category, [instance.pk], delta * len(changed))
+    else:
+        adjust_game_count(Category, changed, delta)
+
+
+# ==================== SINCRONIZACIÓN ====================
+# Cada alta, cambio o borrado queda en ChangeLog para /api/sync/; las
+# escrituras con update()/bulk_*() lo registran explícitamente.
+
+CHANGE_KINDS = {Game: 'game', Developer: 'developer', Category: 'category', UserLibrary: 'library', Review: 'review'}
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+@receiver(post_save, sender=Developer)
+@receiver(post_delete, sender=Developer)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=UserLibrary)
+@receiver(post_delete, sender=UserLibrary)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def log_change(sender, instance, origin=None, **kwargs):
+    if sender in (Review, UserLibrary) and deleting_game(origin):
+        return
+    ChangeLog.record(CHANGE_KINDS[sender], [instance.pk], getattr(instance, 'user_id', None))
@@ -0,0 +1,109 @@
+"""
+Campos parciales (``?fields=`` / ``?omit=``) para la API.
+
+El serializer de primer nivel descarta los campos no pedidos y el ViewSet
+recorta el queryset en consecuencia: ``only()`` con las columnas que usan los
+campos restantes, ``select_related`` solo de las relaciones recorridas y
+``prefetch_related`` solo de las relaciones múltiples pedidas (por ejemplo,
+sin ``categories`` no se consulta la tabla intermedia).
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse_field_list(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsSerializerMixin:
+    """Filtra los campos según ``context['sparse_fields']`` = (incluidos o None, omitidos).
+
+    Solo aplica al serializer de primer nivel: los anidados (p. ej. las
+    categorías de un juego) conservan todos sus campos.
+    """
+    # Columnas del modelo que necesita cada campo que no es una columna (propiedades)
+    column_dependencies = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        sparse = self.context.get('sparse_fields')
+        if sparse is None or not self.is_top_level():
+            return fields
+        include, omit = sparse
+        return {
+            name: field for name, field in fields.items()
+            if (include is None or name in include) and name not in omit
+        }
+
+    def is_top_level(self):
+        return self.parent is None or (
+            self.parent is self.root and isinstance(self.parent, serializers.ListSerializer)
+        )
+
+
+class SparseFieldsetMixin:
+    """ViewSet con ``?fields=``/``?omit=`` en las lecturas y el queryset recortado a esos campos"""
+
+    def sparse_fields(self):
+        """(incluidos o None, omitidos) pedidos en la consulta, o None si no se pidió nada"""
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return None
+        params = request.query_params
+        if FIELDS_PARAM not in params and OMIT_PARAM not in params:
+            return None
+        include = parse_field_list(params[FIELDS_PARAM]) if FIELDS_PARAM in params else None
+        return include, parse_field_list(params.get(OMIT_PARAM, ''))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['sparse_fields'] = self.sparse_fields()
+        return context
+
+    def filter_queryset(self, queryset):
+        return self.sparse_queryset(super().filter_queryset(queryset))
+
+    def sparse_queryset(self, queryset):
+        """Recorta columnas y relaciones a las que usan los campos pedidos"""
+        if self.sparse_fields() is None:
+            return queryset
+        serializer = self.get_serializer()
+        opts = queryset.model._meta
+        columns = {opts.pk.name}
+        related, prefetched = set(), set()
+        dependencies = getattr(serializer, 'column_dependencies', {})
+        for name, field in serializer.fields.items():
+            if name in dependencies:
+                columns.update(dependencies[name])
+                continue
+            if not field.source_attrs:  # source='*'
+                return queryset
+            attribute = field.source_attrs[0]
+            if attribute in queryset.query.annotations:
+                continue
+            try:
+                model_field = opts.get_field(attribute)
+            except FieldDoesNotExist:
+                # Propiedad sin dependencias declaradas: no se puede recortar
+                return queryset
+            if model_field.many_to_many or model_field.one_to_many:
+                prefetched.add(attribute)
+            elif model_field.is_relation and len(field.source_attrs) > 1:
+                related.add(attribute)
+                columns.update([attribute, '__'.join(field.source_attrs[:2])])
+            else:
+                columns.add(attribute)
+        # El paginador por cursor lee los campos del ordenamiento de cada fila
+        columns.update(
+            field.lstrip('-') for field in queryset.query.order_by
+            if field.lstrip('-') not in queryset.query.annotations and field.lstrip('-') != 'pk'
+        )
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        if prefetched:
+            queryset = queryset.prefetch_related(*prefetched)
+        return queryset.only(*columns)
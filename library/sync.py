@@ -0,0 +1,167 @@
+"""
+Sincronización incremental para clientes sin conexión (``/api/sync/``).
+
+Cada alta, cambio o borrado de un objeto sincronizable se registra en
+``ChangeLog`` al confirmarse su transacción, así que los ids del registro
+siguen el orden de confirmación. El token es el último id entregado: con
+``?since=<token>`` se leen las entradas posteriores, se devuelven las filas
+que aún existen y se informan como borradas las que ya no. El costo es
+proporcional a lo que cambió y no al tamaño del catálogo, y una transacción
+larga no se pierde aunque su ``updated_at`` sea anterior al token. La
+biblioteca y las reseñas solo se incluyen para su propio usuario.
+
+Garantía: ninguna entrada con id menor o igual al token puede aparecer
+después. El único intervalo entre la asignación del id y su confirmación es
+el de la inserción de esa misma entrada; las entradas de los últimos
+``SYNC_SETTLE`` segundos se vuelven a enviar en la llamada siguiente para
+cubrirlo (los clientes aplican filas completas, repetirlas no cambia nada).
+
+Sin token, o con uno anterior a lo que ``prune_changelog`` ya recortó, se
+entrega una copia completa (``full``) en páginas de ``SYNC_PAGE_SIZE`` filas
+recorridas por id: ``next`` lleva a la página siguiente y el ``token`` de
+todas las páginas es el tomado al empezar la copia.
+"""
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Category, ChangeLog, Developer, Game, Review, UserLibrary
+from .serializers import (
+    CategorySerializer, DeveloperSerializer, GameSerializer, ReviewSerializer, UserLibrarySerializer
+)
+
+# Antigüedad mínima de una entrada para que el token avance sobre ella
+SYNC_SETTLE = timedelta(seconds=2)
+# Filas por página de la copia completa
+SYNC_PAGE_SIZE = 500
+
+# (sección de la respuesta, tipo en ChangeLog, serializer, ¿por usuario?)
+SECTIONS = [
+    ('games', 'game', GameSerializer, False),
+    ('developers', 'developer', DeveloperSerializer, False),
+    ('categories', 'category', CategorySerializer, False),
+    ('library', 'library', UserLibrarySerializer, True),
+    ('reviews', 'review', ReviewSerializer, True),
+]
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def encode(payload):
+    payload = json.dumps(payload, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode(token, keys):
+    """Enteros no negativos ``keys`` del token, en ese orden"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        values = [payload[key] for key in keys]
+    except (binascii.Error, ValueError, KeyError, TypeError, AttributeError) as exc:
+        raise InvalidToken(token) from exc
+    if any(not isinstance(value, int) or isinstance(value, bool) or value < 0 for value in values):
+        raise InvalidToken(token)
+    return values
+
+
+def encode_token(sequence):
+    return encode({'s': sequence})
+
+
+def decode_token(token):
+    """Id del registro desde el que continuar"""
+    return decode(token, ['s'])[0]
+
+
+def encode_page(sequence, section, after):
+    return encode({'s': sequence, 'p': section, 'a': after})
+
+
+def decode_page(token):
+    """Id del registro al empezar la copia, sección (índice de SECTIONS) y último id entregado"""
+    sequence, section, after = decode(token, ['s', 'p', 'a'])
+    if section >= len(SECTIONS):
+        raise InvalidToken(token)
+    return sequence, section, after
+
+
+def current_sequence():
+    """Id del registro para el próximo token; se toma antes de consultar los datos"""
+    settled = ChangeLog.objects.filter(created_at__lte=timezone.now() - SYNC_SETTLE).order_by('-id').values_list(
+        'id', flat=True
+    ).first()
+    return settled or 0
+
+
+def is_pruned(since):
+    """¿Se recortó alguna entrada posterior a ``since``? (entonces hace falta una copia completa)"""
+    first = ChangeLog.objects.order_by('id').values_list('id', flat=True).first()
+    return first is not None and since < first - 1
+
+
+def section_queryset(name, user):
+    """Queryset completo de cada sección, con sus relaciones cargadas"""
+    if name == 'games':
+        return Game.objects.select_related('developer').prefetch_related('categories')
+    if name == 'developers':
+        return Developer.objects.all()
+    if name == 'categories':
+        return Category.objects.all()
+    if name == 'library':
+        return UserLibrary.objects.filter(user=user).select_related('game')
+    return Review.objects.filter(user=user).select_related('user', 'game')
+
+
+def visible_sections(user):
+    authenticated = user is not None and user.is_authenticated
+    return [(index, section) for index, section in enumerate(SECTIONS) if authenticated or not section[3]]
+
+
+def snapshot(user, sequence, section=0, after=0, context=None):
+    """Página de la copia completa desde la sección ``section`` y el id ``after``"""
+    data = {}
+    remaining = SYNC_PAGE_SIZE
+    next_page = None
+    for index, (name, _, serializer_class, _) in visible_sections(user):
+        data[name] = []
+        if index < section or next_page is not None:
+            continue
+        queryset = section_queryset(name, user).order_by('pk')
+        if index == section:
+            queryset = queryset.filter(pk__gt=after)
+        data[name] = serializer_class(queryset[:remaining], many=True, context=context).data
+        remaining -= len(data[name])
+        if not remaining:
+            next_page = encode_page(sequence, index, data[name][-1]['id'])
+    data['deleted'] = {name: [] for name in data}
+    return {**data, 'full': True, 'next': next_page}
+
+
+def changes(user, since, context=None):
+    """Filas creadas o modificadas después del id ``since`` y los ids borrados"""
+    authenticated = user is not None and user.is_authenticated
+    sections = [section for _, section in visible_sections(user)]
+    data = {}
+    deleted = {}
+    owned = Q(user=user) if authenticated else Q(pk__in=[])
+    entries = ChangeLog.objects.filter(id__gt=since).filter(
+        Q(kind__in=[kind for _, kind, _, per_user in SECTIONS if not per_user]) | owned
+    )
+    changed = {}
+    for kind, object_id in entries.order_by('id').values_list('kind', 'object_id'):
+        changed.setdefault(kind, set()).add(object_id)
+    for name, kind, serializer_class, _ in sections:
+        queryset = section_queryset(name, user).filter(
+            pk__in=entries.filter(kind=kind).values('object_id')
+        ).order_by('updated_at', 'id')
+        data[name] = serializer_class(queryset, many=True, context=context).data
+        present = {row['id'] for row in data[name]}
+        deleted[name] = sorted(changed.get(kind, set()) - present)
+    data['deleted'] = deleted
+    return {**data, 'full': False, 'next': None}
@@ -1,11 +1,33 @@
 """
 Tests para la aplicación library
 """
-from django.test import TestCase, Client
+import base64
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.core.management import CommandError, call_command
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
-from .models import Game, Developer, Category, UserLibrary, Review, Notification
+from django.utils import timezone
+from steam_library.context_processors import notifications_count
+from .caching import (
+    HOME_SECTIONS, bump_version, get_version, unread_notifications_count, unread_notifications_key
+)
+from . import autocomplete, exports, jobs, sync
+from .facets import facet_counts
+from .models import (
+    Game, Developer, Category, UserLibrary, Review, Notification, ChangeLog, ExportJob, UserStats
+)
 
 User = get_user_model()
 
@@ -92,6 +114,81 @@ class ReviewModelTest(TestCase):
         self.assertEqual(review.user, self.user)
         self.assertEqual(review.game, self.game)
 
+    def test_rating_deltas_on_create_update_delete(self):
+        other = User.objects.create_user(username='user2', password='pass')
+        review = Review.objects.create(user=self.user, game=self.game, rating=4, comment='Bien')
+        Review.objects.create(user=other, game=self.game, rating=1, comment='Mal')
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.rating_sum, 5)
+        self.assertEqual(self.game.total_reviews, 2)
+        self.assertEqual(float(self.game.rating), 2.5)
+        self.assertEqual(self.game.rating_histogram, {1: 1, 2: 0, 3: 0, 4: 1, 5: 0})
+
+        review.rating = 2
+        review.save()
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.rating_sum, 3)
+        self.assertEqual(self.game.total_reviews, 2)
+        self.assertEqual(float(self.game.rating), 1.5)
+        self.assertEqual(self.game.rating_histogram, {1: 1, 2: 1, 3: 0, 4: 0, 5: 0})
+
+        review.delete()
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.rating_sum, 1)
+        self.assertEqual(self.game.total_reviews, 1)
+        self.assertEqual(float(self.game.rating), 1.0)
+        self.assertEqual(self.game.rating_histogram, {1: 1, 2: 0, 3: 0, 4: 0, 5: 0})
+
+    def test_cascade_and_queryset_deletes_update_counters(self):
+        other = User.objects.create_user(username='user2', password='pass')
+        third = User.objects.create_user(username='user3', password='pass')
+        Review.objects.create(user=self.user, game=self.game, rating=4, comment='Bien')
+        Review.objects.create(user=other, game=self.game, rating=2, comment='Regular')
+        Review.objects.create(user=third, game=self.game, rating=5, comment='Genial')
+        self.user.delete()
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.total_reviews, self.game.rating_sum, float(self.game.rating)), (2, 7, 3.5))
+        self.assertEqual(self.game.rating_histogram, {1: 0, 2: 1, 3: 0, 4: 0, 5: 1})
+        Review.objects.all().delete()
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.total_reviews, self.game.rating_sum, float(self.game.rating)), (0, 0, 0.0))
+
+    def test_game_delete_settles_reviews_once(self):
+        def delete_game_with(reviews):
+            game = Game.objects.create(title='Efímero', description='Desc', release_date='2020-01-01', price=1)
+            for number in range(reviews):
+                user = User.objects.create_user(username=f'fan{reviews}-{number}', password='pass')
+                Review.objects.create(user=user, game=game, rating=4, comment='Bien')
+                UserLibrary.objects.create(user=user, game=game, hours_played=2)
+            with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+                game.delete()
+            return len(queries)
+
+        self.assertEqual(delete_game_with(2), delete_game_with(6))
+        stats = UserStats.for_user(User.objects.get(username='fan6-0').pk)
+        self.assertEqual((stats.reviews_count, stats.rating_sum, stats.library_count), (0, 0, 0))
+        self.assertEqual(ChangeLog.objects.filter(kind='review').count(), 8)
+        self.assertEqual(ChangeLog.objects.filter(kind='library').exclude(user=None).count(), 8)
+
+    def test_deleting_stale_instance_uses_stored_rating(self):
+        review = Review.objects.create(user=self.user, game=self.game, rating=4, comment='Bien')
+        Review.objects.filter(pk=review.pk).update(rating=2)
+        Game.objects.filter(pk=self.game.pk).update(rating_sum=2, stars_4=0, stars_2=1)
+        review.delete()
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.total_reviews, self.game.rating_sum), (0, 0))
+        self.assertEqual(self.game.rating_histogram, {1: 0, 2: 0, 3: 0, 4: 0, 5: 0})
+
+    def test_game_save_does_not_overwrite_counters(self):
+        stale = Game.objects.get(pk=self.game.pk)
+        Review.objects.create(user=self.user, game=self.game, rating=5, comment='Genial')
+        stale.title = 'Nuevo título'
+        stale.save()
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.title, 'Nuevo título')
+        self.assertEqual(self.game.total_reviews, 1)
+        self.assertEqual(float(self.game.rating), 5.0)
+
 
 class UserLibraryModelTest(TestCase):
     """Tests para el modelo UserLibrary"""
@@ -184,6 +281,17 @@ class GameViewsTest(TestCase):
         response = self.client.get(reverse('library:game_detail', args=[self.game.pk]))
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'Test Game')
+
+    def test_game_detail_rating_distribution(self):
+        Review.objects.create(user=self.user, game=self.game, rating=4, comment='Bien')
+        Review.objects.create(user=self.staff_user, game=self.game, rating=5, comment='Genial')
+        response = self.client.get(reverse('library:game_detail', args=[self.game.pk]))
+        self.assertEqual(response.context['total_reviews'], 2)
+        self.assertEqual(float(response.context['avg_rating']), 4.5)
+        self.assertEqual(
+            [(row['stars'], row['count'], row['percent']) for row in response.context['rating_distribution']],
+            [(5, 1, 50), (4, 1, 50), (3, 0, 0), (2, 0, 0), (1, 0, 0)]
+        )
     
     def test_game_create_requires_staff(self):
         self.client.login(username='testuser', password='testpass123')
@@ -280,6 +388,18 @@ class LibraryViewsTest(TestCase):
         response = self.client.get(reverse('library:export_library_csv'))
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'Juego,Desarrollador,Horas Jugadas,Favorito,Fecha Agregado')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith('Game,Dev,10.00,No,'))
+
+    def test_staff_exports_other_user_library(self):
+        User.objects.create_user(username='support', password='testpass123', is_staff=True)
+        self.client.login(username='support', password='testpass123')
+        response = self.client.get(reverse('library:export_library_csv'), {'user': self.user.pk})
+        self.assertIn('biblioteca_testuser.csv', response['Content-Disposition'])
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 2)
 
 
 class APITest(TestCase):
@@ -307,6 +427,7 @@ class APITest(TestCase):
     def test_game_detail_api(self):
         response = self.client.get(f'/api/games/{self.game.pk}/')
         self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rating_histogram'], {'1': 0, '2': 0, '3': 0, '4': 0, '5': 0})
     
     def test_review_create_api(self):
         from rest_framework.authtoken.models import Token
@@ -372,3 +493,1401 @@ class SearchTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertContains(response, 'RPG Game')
 
+
+
+class RecomputeRatingsCommandTest(TestCase):
+    """Tests para el comando recompute_ratings"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user1', password='pass')
+        self.other = User.objects.create_user(username='user2', password='pass')
+        self.game = Game.objects.create(
+            title='Game', description='Desc', release_date='2024-01-01', price=19.99
+        )
+        self.empty_game = Game.objects.create(
+            title='Empty', description='Desc', release_date='2024-01-01', price=9.99
+        )
+        Review.objects.create(user=self.user, game=self.game, rating=5, comment='A')
+        Review.objects.create(user=self.other, game=self.game, rating=4, comment='B')
+
+    def test_recompute_repairs_counters(self):
+        Game.objects.filter(pk=self.game.pk).update(rating=1, total_reviews=9, rating_sum=9)
+        Game.objects.filter(pk=self.empty_game.pk).update(rating=3, total_reviews=1, rating_sum=3)
+        out = StringIO()
+        call_command('recompute_ratings', stdout=out)
+        self.game.refresh_from_db()
+        self.empty_game.refresh_from_db()
+        self.assertEqual((self.game.rating_sum, self.game.total_reviews), (9, 2))
+        self.assertEqual(float(self.game.rating), 4.5)
+        self.assertEqual(self.empty_game.total_reviews, 0)
+        self.assertEqual(float(self.empty_game.rating), 0)
+        self.assertIn('1 actualizados', out.getvalue())
+
+    def test_review_added_during_recompute_is_kept(self):
+        from library.management.commands.recompute_ratings import Command
+        third = User.objects.create_user(username='user3', password='pass')
+        Game.objects.filter(pk=self.game.pk).update(total_reviews=9)
+        write_batch = Command.write_batch
+
+        def concurrent_review(command, batch):
+            # La reseña llega después de la agregación sin bloqueos y ajusta el juego con F()
+            Review.objects.create(user=third, game=self.game, rating=3, comment='C')
+            return write_batch(command, batch)
+        with mock.patch.object(Command, 'write_batch', concurrent_review):
+            call_command('recompute_ratings', stdout=StringIO())
+        self.game.refresh_from_db()
+        self.assertEqual((self.game.total_reviews, self.game.rating_sum, self.game.stars_3), (3, 12, 1))
+
+    def test_recompute_since_skips_untouched_games(self):
+        Game.objects.filter(pk=self.game.pk).update(total_reviews=9)
+        call_command('recompute_ratings', since='2999-01-01', stdout=StringIO())
+        self.game.refresh_from_db()
+        self.assertEqual(self.game.total_reviews, 9)
+
+    def test_recompute_since_includes_games_with_deleted_reviews(self):
+        long_ago = timezone.now() - timedelta(days=365)
+        Review.objects.update(updated_at=long_ago)
+        Game.objects.update(updated_at=long_ago)
+        Game.objects.filter(pk=self.empty_game.pk).update(total_reviews=4)
+        Review.objects.filter(game=self.game).delete()
+        # Contadores desviados que la resta del borrado no alcanzó a corregir
+        Game.objects.filter(pk=self.game.pk).update(total_reviews=2, rating_sum=9)
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        out = StringIO()
+        call_command('recompute_ratings', since=since, stdout=out)
+        self.game.refresh_from_db()
+        self.empty_game.refresh_from_db()
+        self.assertEqual((self.game.total_reviews, self.game.rating_sum), (0, 0))
+        self.assertEqual(self.empty_game.total_reviews, 4)
+        self.assertIn('1 reiniciados', out.getvalue())
+
+
+class BulkReviewAPITest(TestCase):
+    """Tests para la importación masiva de reseñas"""
+
+    def setUp(self):
+        from rest_framework.authtoken.models import Token
+        self.user = User.objects.create_user(username='importer', password='pass')
+        self.token = Token.objects.create(user=self.user)
+        self.game1 = Game.objects.create(
+            title='Game 1', description='Desc', release_date='2024-01-01', price=19.99
+        )
+        self.game2 = Game.objects.create(
+            title='Game 2', description='Desc', release_date='2024-01-01', price=19.99
+        )
+
+    def test_bulk_json_reports_row_errors(self):
+        rows = [
+            {'game': self.game1.pk, 'rating': 5, 'comment': 'A'},
+            {'game': self.game1.pk, 'rating': 3, 'comment': 'Duplicada'},
+            {'game': 999999, 'rating': 4, 'comment': 'Sin juego'},
+            {'game': self.game2.pk, 'rating': 9, 'comment': 'Fuera de rango'},
+            {'game': self.game2.pk, 'rating': 2, 'comment': 'B'},
+        ]
+        response = self.client.post(
+            '/api/reviews/bulk/', json.dumps(rows), content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual([e['index'] for e in response.json()['errors']], [1, 2, 3])
+        self.game1.refresh_from_db()
+        self.game2.refresh_from_db()
+        self.assertEqual((self.game1.total_reviews, float(self.game1.rating)), (1, 5.0))
+        self.assertEqual((self.game2.total_reviews, float(self.game2.rating)), (1, 2.0))
+
+    def test_bulk_ndjson(self):
+        body = '\n'.join(json.dumps({'game': game.pk, 'rating': 4, 'comment': 'NDJSON'})
+                         for game in (self.game1, self.game2))
+        response = self.client.post(
+            '/api/reviews/bulk/', body, content_type='application/x-ndjson',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Review.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_rejects_user_field_for_non_staff(self):
+        other = User.objects.create_user(username='other', password='pass')
+        rows = [{'game': self.game1.pk, 'user': other.pk, 'rating': 4, 'comment': 'X'}]
+        response = self.client.post(
+            '/api/reviews/bulk/', json.dumps(rows), content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Review.objects.exists())
+
+    def test_bulk_counts_only_inserted_rows(self):
+        bulk_create = Review.objects.bulk_create
+
+        def concurrent_insert(reviews, **kwargs):
+            # Otra escritura inserta la reseña del juego 1 entre la validación y el INSERT
+            Review.objects.create(user=self.user, game=self.game1, rating=1, comment='Concurrente')
+            return bulk_create(reviews, **kwargs)
+
+        rows = [{'game': game.pk, 'rating': 4, 'comment': 'Lote'} for game in (self.game1, self.game2)]
+        with mock.patch.object(Review.objects, 'bulk_create', side_effect=concurrent_insert):
+            response = self.client.post(
+                '/api/reviews/bulk/', json.dumps(rows), content_type='application/json',
+                HTTP_AUTHORIZATION=f'Token {self.token.key}'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual([e['index'] for e in response.json()['errors']], [0])
+
+    def test_bulk_empty_input(self):
+        response = self.client.post(
+            '/api/reviews/bulk/', '[]', content_type='application/json',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'created': 0, 'errors': []})
+
+
+class FullTextSearchTest(TestCase):
+    """Tests para el índice de búsqueda de texto completo"""
+
+    def setUp(self):
+        self.developer = Developer.objects.create(name='Valve')
+        self.title_match = Game.objects.create(
+            title='Portal', description='Puzzles', release_date='2011-04-19', price=9.99,
+            developer=self.developer
+        )
+        self.description_match = Game.objects.create(
+            title='Other', description='Inspired by portal', release_date='2024-01-01', price=9.99
+        )
+
+    def test_results_ranked_by_relevance(self):
+        response = self.client.get(reverse('library:game_list'), {'q': 'portal'})
+        self.assertEqual(list(response.context['games']), [self.title_match, self.description_match])
+
+    def test_index_follows_game_and_developer_changes(self):
+        self.developer.name = 'Valve Software'
+        self.developer.save()
+        response = self.client.get('/api/games/', {'search': 'software'})
+        self.assertEqual([game['id'] for game in response.json()['results']], [self.title_match.pk])
+
+        self.title_match.delete()
+        response = self.client.get('/api/games/', {'search': 'portal'})
+        self.assertEqual([game['id'] for game in response.json()['results']], [self.description_match.pk])
+
+    def test_prefix_and_accent_insensitive(self):
+        Game.objects.create(title='Acción Total', description='Desc', release_date='2024-01-01', price=1)
+        response = self.client.get(reverse('library:game_list'), {'q': 'accio'})
+        self.assertContains(response, 'Acción Total')
+
+
+class FuzzySearchTest(TestCase):
+    """Tests para la búsqueda difusa por trigramas"""
+
+    def setUp(self):
+        self.witcher = Game.objects.create(
+            title='The Witcher 3: Wild Hunt', description='RPG', release_date='2015-05-19', price=39.99
+        )
+        self.half_life = Game.objects.create(
+            title='Half-Life 2', description='Shooter', release_date='2004-11-16', price=9.99
+        )
+
+    def test_trigrams_follow_title_changes(self):
+        self.assertTrue(self.witcher.trigrams.filter(trigram='wit').exists())
+        self.witcher.title = 'Portal'
+        self.witcher.save()
+        self.assertFalse(self.witcher.trigrams.filter(trigram='wit').exists())
+        self.assertTrue(self.witcher.trigrams.filter(trigram='por').exists())
+
+    def test_fuzzy_list_view_tolerates_typos(self):
+        response = self.client.get(reverse('library:game_list'), {'q': 'Wticher', 'fuzzy': '1'})
+        self.assertEqual(list(response.context['games']), [self.witcher])
+        response = self.client.get(reverse('library:game_list'), {'q': 'Wticher'})
+        self.assertEqual(list(response.context['games']), [])
+
+    def test_fuzzy_api_ranked_by_similarity(self):
+        response = self.client.get('/api/games/', {'q': 'half life2', 'fuzzy': '1'})
+        self.assertEqual(response.json()['results'][0]['id'], self.half_life.pk)
+        response = self.client.get('/api/games/', {'search': 'wticher', 'fuzzy': '1'})
+        self.assertEqual([game['id'] for game in response.json()['results']], [self.witcher.pk])
+
+    def test_candidates_come_from_rarest_trigrams(self):
+        from .search import candidate_trigrams, title_trigrams
+        cache.clear()
+        for title in ('Portal', 'Portal Two', 'Portal Zero'):
+            Game.objects.create(title=title, description='Desc', release_date='2011-04-19', price=9.99)
+        self.assertEqual(set(candidate_trigrams(sorted(title_trigrams('portal zero')), budget=4)),
+                         title_trigrams('zero'))
+
+    def test_trigrams_are_fast_deleted(self):
+        from .models import GameTrigram
+        # Sin receptores de borrado para GameTrigram basta un único DELETE
+        with self.assertNumQueries(1):
+            GameTrigram.objects.filter(game=self.witcher).delete()
+
+    def test_filters_after_search_keep_rank(self):
+        from .search import fuzzy_search
+        witcher_2 = Game.objects.create(
+            title='The Witcher 2', description='RPG', release_date='2011-05-17', price=9.99
+        )
+        games = fuzzy_search(Game.objects.all(), 'witcher').filter(price__lt=20)
+        self.assertEqual([(game.pk, game.search_rank) for game in games], [(witcher_2.pk, 1.0)])
+
+
+class AutocompleteTest(TestCase):
+    """Tests para el autocompletado por prefijo"""
+
+    def setUp(self):
+        cache.clear()
+        # Cada test empieza como un proceso nuevo, sin índice construido
+        autocomplete._state.update(version=None, rebuilding=False, missing_since=None)
+        self.developer = Developer.objects.create(name='Wizards Studio')
+        self.witcher = Game.objects.create(
+            title='The Witcher 3', description='RPG', release_date='2015-05-19', price=39.99,
+            developer=self.developer
+        )
+        self.wild = Game.objects.create(
+            title='Wild Arms', description='RPG', release_date='1997-04-30', price=9.99
+        )
+        Game.objects.filter(pk=self.wild.pk).update(total_reviews=5)
+        # La primera construcción corre en otro hilo; aquí se hace en línea
+        autocomplete._state['version'] = autocomplete.rebuild()
+
+    def suggestions(self, prefix, **params):
+        response = self.client.get('/api/games/autocomplete/', {'prefix': prefix, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(item['type'], item['id']) for item in response.json()]
+
+    def test_prefix_matches_any_word_ranked_by_weight(self):
+        self.assertEqual(self.suggestions('wi'), [
+            ('game', self.wild.pk), ('developer', self.developer.pk), ('game', self.witcher.pk)
+        ])
+        self.assertEqual(self.suggestions('WITC'), [('game', self.witcher.pk)])
+        self.assertEqual(self.suggestions('wi', limit=1), [('game', self.wild.pk)])
+        self.assertEqual(self.suggestions(''), [])
+
+    def test_database_serves_until_first_build(self):
+        autocomplete._state['version'] = None
+        with mock.patch.object(autocomplete, 'schedule_rebuild') as schedule:
+            self.assertEqual(self.suggestions('wi'), [
+                ('game', self.wild.pk), ('developer', self.developer.pk), ('game', self.witcher.pk)
+            ])
+            self.assertEqual(self.suggestions('arm', limit=1), [('game', self.wild.pk)])
+        self.assertEqual(schedule.call_count, 2)
+
+    def test_changes_match_a_fresh_load(self):
+        items = [('game', pk, f'Title {pk % 7} Word{pk}', pk % 5) for pk in range(1, 200)]
+        for merge_size in (0, 10_000):
+            index = autocomplete.PrefixIndex()
+            index.load(items)
+            with mock.patch.object(autocomplete, 'MERGE_SIZE', merge_size):
+                for pk in range(1, 200, 3):
+                    index.upsert('game', pk, f'Renamed {pk % 4}', pk % 9)
+                for pk in range(2, 200, 5):
+                    index.remove('game', pk)
+            fresh = autocomplete.PrefixIndex()
+            fresh.load((kind, pk, name, weight) for (kind, pk), (name, weight) in index.entries.items())
+            for prefix in ('t', 'title 3', 'ren', 'renamed 2', 'word1', 'w'):
+                self.assertEqual(index.search(prefix, limit=20), fresh.search(prefix, limit=20))
+
+    def test_index_follows_game_and_developer_changes(self):
+        self.suggestions('wi')
+        with self.captureOnCommitCallbacks(execute=True):
+            portal = Game.objects.create(title='Portal', description='Puzzles',
+                                         release_date='2007-10-10', price=9.99)
+            self.witcher.delete()
+            self.developer.name = 'Valve'
+            self.developer.save()
+        self.assertEqual(self.suggestions('por'), [('game', portal.pk)])
+        self.assertEqual(self.suggestions('wi'), [('game', self.wild.pk)])
+        self.assertEqual(self.suggestions('val'), [('developer', self.developer.pk)])
+
+    def test_changes_from_other_processes_apply_without_rebuild(self):
+        self.suggestions('wi')
+        # Otro proceso renombra el juego y publica el cambio
+        Game.objects.filter(pk=self.wild.pk).update(title='Portal Arms')
+        autocomplete.publish('game', [self.wild.pk])
+        with mock.patch.object(autocomplete.PrefixIndex, 'load') as load:
+            self.assertEqual(self.suggestions('por'), [('game', self.wild.pk)])
+            self.assertEqual(self.suggestions('wi'), [('developer', self.developer.pk), ('game', self.witcher.pk)])
+        load.assert_not_called()
+
+    def test_weights_follow_reviews_and_game_counts(self):
+        self.suggestions('wi')
+        with self.captureOnCommitCallbacks(execute=True):
+            for number in range(6):
+                user = User.objects.create_user(username=f'fan{number}', password='pass')
+                Review.objects.create(user=user, game=self.witcher, rating=5, comment='Genial')
+            Game.objects.create(title='Gwent', description='Cartas', release_date='2018-10-23', price=0,
+                                developer=self.developer)
+        response = self.client.get('/api/games/autocomplete/', {'prefix': 'wi'})
+        self.assertEqual([(item['type'], item['id'], item['weight']) for item in response.json()], [
+            ('game', self.witcher.pk, 6), ('game', self.wild.pk, 5), ('developer', self.developer.pk, 2)
+        ])
+
+    def test_publish_skips_versions_already_taken(self):
+        # Un incr no atómico puede devolver la misma versión a dos procesos
+        version = get_version(autocomplete.AUTOCOMPLETE)
+        with mock.patch.object(autocomplete, 'bump_version', side_effect=[version + 1, version + 1, version + 2]):
+            autocomplete.publish('game', [self.wild.pk])
+            autocomplete.publish('game', [self.witcher.pk])
+        self.assertEqual(cache.get(autocomplete.change_key(version + 1)), [('game', self.wild.pk)])
+        self.assertEqual(cache.get(autocomplete.change_key(version + 2)), [('game', self.witcher.pk)])
+
+    def test_unrelated_saves_do_not_publish(self):
+        version = get_version(autocomplete.AUTOCOMPLETE)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.witcher.price = 19.99
+            self.witcher.save()
+            self.developer.save()
+        self.assertEqual(get_version(autocomplete.AUTOCOMPLETE), version)
+
+    def test_lost_changes_rebuild_in_background(self):
+        self.suggestions('wi')
+        with mock.patch.object(autocomplete, 'schedule_rebuild') as schedule, \
+                mock.patch.object(autocomplete, 'CHANGE_GRACE', 0):
+            # La versión avanzó pero su entrada no está (expiró o se perdió)
+            bump_version(autocomplete.AUTOCOMPLETE)
+            self.assertEqual(len(self.suggestions('wi')), 3)
+            schedule.assert_not_called()
+            self.assertEqual(len(self.suggestions('wi')), 3)
+            schedule.assert_called_once_with()
+        autocomplete._state.update(version=get_version(autocomplete.AUTOCOMPLETE), missing_since=None)
+        with mock.patch.object(autocomplete, 'schedule_rebuild') as schedule, \
+                mock.patch.object(autocomplete, 'MAX_PENDING', 1):
+            autocomplete.publish('game', [self.wild.pk, self.witcher.pk])
+            self.suggestions('wi')
+            schedule.assert_called_once_with()
+
+
+class FacetCountsTest(TestCase):
+    """Tests para los conteos por faceta de la lista de juegos"""
+
+    def setUp(self):
+        self.valve = Developer.objects.create(name='Valve')
+        self.cdpr = Developer.objects.create(name='CD Projekt')
+        self.action = Category.objects.create(name='Acción')
+        self.rpg = Category.objects.create(name='RPG')
+        self.portal = Game.objects.create(title='Portal', description='Puzzles', release_date='2007-10-10',
+                                          price=9.99, developer=self.valve)
+        self.half_life = Game.objects.create(title='Half-Life 2', description='Shooter',
+                                             release_date='2004-11-16', price=9.99, developer=self.valve)
+        self.witcher = Game.objects.create(title='The Witcher 3', description='RPG',
+                                           release_date='2015-05-19', price=39.99, developer=self.cdpr)
+        self.portal.categories.add(self.action)
+        self.half_life.categories.add(self.action)
+        self.witcher.categories.add(self.action, self.rpg)
+        Game.objects.filter(pk=self.witcher.pk).update(rating=4.5)
+        Game.objects.filter(pk=self.half_life.pk).update(rating=3.2)
+
+    def facets(self, **params):
+        response = self.client.get(reverse('library:game_list'), params)
+        return {
+            facet['name']: {option['label']: option['count'] for option in facet['options']}
+            for facet in response.context['facets']
+        }
+
+    def test_counts_follow_search_and_other_filters(self):
+        facets = self.facets()
+        self.assertEqual(facets['category'], {'Acción': 3, 'RPG': 1})
+        self.assertEqual(facets['developer'], {'Valve': 2, 'CD Projekt': 1})
+        self.assertEqual(facets['rating'], {'4+': 1, '3+': 2, '2+': 2, '1+': 2})
+        self.assertEqual(facets['year'], {'2015': 1, '2007': 1, '2004': 1})
+
+        facets = self.facets(category=self.rpg.pk)
+        self.assertEqual(facets['category'], {'Acción': 3, 'RPG': 1})
+        self.assertEqual(facets['developer'], {'CD Projekt': 1})
+
+        facets = self.facets(q='portal', min_rating=3)
+        self.assertEqual(facets['developer'], {})
+        self.assertEqual(facets['rating'], {'4+': 0, '3+': 0, '2+': 0, '1+': 0})
+        self.assertEqual(facets['year'], {})
+
+    def test_out_of_range_values_are_ignored(self):
+        for params in ({'min_rating': 'nan'}, {'min_rating': 'inf'}, {'min_rating': '-Infinity'},
+                       {'year': '99999'}, {'year': '0'}, {'year': '²'},
+                       {'category': '9' * 30}, {'developer': str(2 ** 63)}):
+            response = self.client.get(reverse('library:game_list'), params)
+            self.assertEqual(response.status_code, 200, params)
+            self.assertEqual(len(response.context['games']), 3, params)
+
+    def test_facet_links_filter_the_list(self):
+        response = self.client.get(reverse('library:game_list'), {'developer': self.valve.pk, 'year': 2004})
+        self.assertEqual(list(response.context['games']), [self.half_life])
+
+    def test_counts_in_one_query(self):
+        with self.assertNumQueries(1):
+            counts = facet_counts(Game.objects.all(), {})
+        self.assertEqual(len(counts['category']), 2)
+
+
+class KeysetPaginationTest(TestCase):
+    """Tests para la paginación por cursor"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='testpass123')
+        # Fechas repetidas para que el desempate por título e id importe
+        self.games = [
+            Game.objects.create(title=f'Game {number:02d}', description='Desc',
+                                release_date=f'2024-01-{number % 3 + 1:02d}', price=1)
+            for number in range(25)
+        ]
+
+    def test_html_pages_follow_ordering_without_count(self):
+        expected = list(Game.objects.order_by('-release_date', 'title', 'id'))
+        seen, url = [], reverse('library:game_list')
+        while url:
+            with self.assertNumQueries(4):  # página, categorías de la página, facetas y total del catálogo
+                response = self.client.get(url)
+            page = response.context['page_obj']
+            seen.extend(page)
+            url = page.next_url and reverse('library:game_list') + page.next_url
+        self.assertEqual(seen, expected)
+
+        response = self.client.get(reverse('library:game_list') + page.previous_url)
+        self.assertEqual(list(response.context['games']), expected[12:24])
+
+    def test_api_cursor_pages(self):
+        expected = [game.pk for game in Game.objects.order_by('-release_date', 'title', 'id')]
+        seen, url = [], '/api/games/'
+        while url:
+            data = self.client.get(url).json()
+            self.assertNotIn('count', data)
+            seen.extend(game['id'] for game in data['results'])
+            previous, url = data['previous'], data['next']
+        self.assertEqual(seen, expected)
+        self.assertEqual([game['id'] for game in self.client.get(previous).json()['results']], expected[10:20])
+
+        response = self.client.get('/api/games/', {'ordering': 'title'})
+        second = self.client.get(response.json()['next']).json()['results']
+        self.assertEqual(second[0]['title'], 'Game 10')
+        self.assertEqual(self.client.get('/api/games/', {'cursor': 'basura'}).status_code, 404)
+
+    def test_mismatched_or_crafted_cursors(self):
+        from .pagination import encode_cursor
+        cursor = self.client.get('/api/games/', {'ordering': 'title'}).json()['next']
+        cursor = cursor.split('cursor=')[1].split('&')[0]
+        # Un cursor del orden por título no sirve para otro orden
+        self.assertEqual(self.client.get('/api/games/', {'ordering': 'rating', 'cursor': cursor}).status_code, 404)
+        ordering = ['-release_date', 'title', 'id']
+        for values in (['no-es-fecha', 'Game', 1], ['2024-01-01', 'Game', 10 ** 30], ['2024-01-01', None, 1],
+                       [[1], 'Game', 1]):
+            crafted = encode_cursor(values, ordering)
+            self.assertEqual(self.client.get('/api/games/', {'cursor': crafted}).status_code, 404)
+            response = self.client.get(reverse('library:game_list'), {'cursor': crafted})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(list(response.context['games'])[0], self.games[2])
+
+    def test_notifications_pages(self):
+        for number in range(15):
+            Notification.objects.create(user=self.user, title=f'Aviso {number}', message='Mensaje')
+        self.client.login(username='reader', password='testpass123')
+        response = self.client.get(reverse('library:notifications'))
+        first = list(response.context['notifications'])
+        response = self.client.get(reverse('library:notifications') + response.context['notifications'].next_url)
+        second = list(response.context['notifications'])
+        self.assertEqual(len(first), 10)
+        self.assertEqual(first + second, list(Notification.objects.order_by('-created_at', '-id')))
+
+
+class HomeSectionsCacheTest(TestCase):
+    """Tests para las secciones cacheadas de la portada"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='critic', password='testpass123')
+        self.old = Game.objects.create(title='Old Game', description='Desc', release_date='2001-01-01', price=1)
+        self.new = Game.objects.create(title='New Game', description='Desc', release_date='2024-01-01', price=1)
+
+    def test_sections_served_from_cache(self):
+        self.client.get(reverse('library:home'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('library:home'))
+        self.assertEqual(response.context['recent_games'], [self.new, self.old])
+
+    def test_review_invalidates_sections(self):
+        response = self.client.get(reverse('library:home'))
+        self.assertEqual(response.context['featured_games'][0], self.old)
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(user=self.user, game=self.new, rating=5, comment='Genial')
+        response = self.client.get(reverse('library:home'))
+        self.assertEqual(response.context['featured_games'][0], self.new)
+        self.assertEqual(response.context['popular_games'][0], self.new)
+
+    def test_concurrent_miss_serves_latest_value(self):
+        self.client.get(reverse('library:home'))
+        bump_version(HOME_SECTIONS)
+        # Otro proceso tiene el candado de la nueva versión: se sirve el último valor
+        cache.add(f'{HOME_SECTIONS}:{get_version(HOME_SECTIONS)}:lock', 1)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('library:home'))
+        self.assertEqual(response.context['recent_games'], [self.new, self.old])
+
+
+class UnreadNotificationsCountTest(TestCase):
+    """Tests para el contador cacheado de notificaciones no leídas"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='testpass123')
+        self.client.login(username='reader', password='testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.notifications = [
+                Notification.objects.create(user=self.user, title=f'Aviso {number}', message='Mensaje')
+                for number in range(3)
+            ]
+
+    def unread(self):
+        response = self.client.get(reverse('library:notifications'))
+        return response.context['unread_notifications_count']()
+
+    def test_count_cached_and_updated_on_writes(self):
+        self.assertEqual(self.unread(), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_notifications_count(self.user.pk), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('library:mark_notification_read', args=[self.notifications[0].pk]))
+        self.assertEqual(unread_notifications_count(self.user.pk), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.user, title='Otro', message='Mensaje')
+        self.assertEqual(unread_notifications_count(self.user.pk), 3)
+
+        self.client.post(reverse('library:mark_all_notifications_read'))
+        self.assertEqual(unread_notifications_count(self.user.pk), 0)
+
+    def test_context_processor_is_lazy(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        with self.assertNumQueries(0):
+            context = notifications_count(request)
+        self.assertIsNone(cache.get(unread_notifications_key(self.user.pk)))
+        with self.assertNumQueries(1):
+            self.assertEqual(context['unread_notifications_count'](), 3)
+            self.assertEqual(context['unread_notifications_count'](), 3)
+
+
+class ConditionalGetTest(TestCase):
+    """Tests para ETag / Last-Modified en la API"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='poller', password='testpass123')
+        self.game = Game.objects.create(title='Portal', description='Puzzles', release_date='2007-10-10', price=9.99)
+
+    def test_not_modified_without_queries(self):
+        response = self.client.get('/api/games/')
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/games/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(f'/api/games/{self.game.pk}/')
+        response = self.client.get(f'/api/games/{self.game.pk}/',
+                                   HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_change_validators(self):
+        etag = self.client.get('/api/games/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(user=self.user, game=self.game, rating=4, comment='Bien')
+        response = self.client.get('/api/games/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['total_reviews'], 1)
+
+        etag = self.client.get('/api/categories/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Puzzle')
+        self.assertEqual(self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_library_validator_is_per_user(self):
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.client.login(username='poller', password='testpass123')
+        etag = self.client.get('/api/library/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            UserLibrary.objects.create(user=other, game=self.game)
+        self.assertEqual(self.client.get('/api/library/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            UserLibrary.objects.create(user=self.user, game=self.game)
+        self.assertEqual(self.client.get('/api/library/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class GamePayloadCacheTest(TestCase):
+    """Tests para la caché de representaciones de juegos"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='critic', password='testpass123')
+        self.developer = Developer.objects.create(name='Valve')
+        self.category = Category.objects.create(name='Puzzle')
+        self.game = Game.objects.create(title='Portal', description='Puzzles', release_date='2007-10-10',
+                                        price=9.99, developer=self.developer)
+        self.game.categories.add(self.category)
+        self.other = Game.objects.create(title='Half-Life', description='Shooter',
+                                         release_date='1998-11-19', price=9.99)
+
+    def game_payload(self):
+        return self.client.get(f'/api/games/{self.game.pk}/').json()
+
+    def test_cached_list_matches_serializer(self):
+        first = self.client.get('/api/games/').json()
+        # Solo la consulta de la página: las representaciones salen de la caché
+        with self.assertNumQueries(1):
+            second = self.client.get('/api/games/').json()
+        self.assertEqual(first, second)
+        self.assertEqual(self.game_payload(), first['results'][0])
+        self.assertEqual(first['results'][0]['categories'][0]['name'], 'Puzzle')
+
+    def test_related_changes_invalidate_payload(self):
+        self.game_payload()
+        self.developer.name = 'Valve Software'
+        self.developer.save()
+        self.assertEqual(self.game_payload()['developer_name'], 'Valve Software')
+
+        self.category.name = 'Puzles'
+        self.category.save()
+        self.assertEqual(self.game_payload()['categories'][0]['name'], 'Puzles')
+
+        self.category.games.remove(self.game)
+        self.assertEqual(self.game_payload()['categories'], [])
+
+        Review.objects.create(user=self.user, game=self.game, rating=5, comment='Genial')
+        self.assertEqual(self.game_payload()['total_reviews'], 1)
+
+
+class FastSerializerTest(TestCase):
+    """Tests para la serialización rápida de los listados"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='critic', password='testpass123')
+        developer = Developer.objects.create(name='Valve')
+        action = Category.objects.create(name='Acción', icon='bi-lightning')
+        puzzle = Category.objects.create(name='Puzzle')
+        self.portal = Game.objects.create(
+            title='Portal', description='Puzzles', release_date='2007-10-10', price=9.99,
+            developer=developer, steam_url='https://store.steampowered.com/app/400/',
+            cover_image=SimpleUploadedFile('portal.gif', b'GIF89a', content_type='image/gif'),
+        )
+        self.portal.categories.add(puzzle, action)
+        # Sin desarrollador: DRF omite developer_name
+        self.orphan = Game.objects.create(title='Orphan', description='Desc', release_date='2020-02-29', price=0)
+        Review.objects.create(user=self.user, game=self.portal, rating=4, comment='Bien')
+
+    def tearDown(self):
+        self.portal.cover_image.delete(save=False)
+
+    def responses(self, url):
+        with self.settings(LIBRARY_FAST_SERIALIZERS=False):
+            standard = self.client.get(url).content
+        cache.clear()
+        with self.settings(LIBRARY_FAST_SERIALIZERS=True):
+            fast = self.client.get(url).content
+        return standard, fast
+
+    def test_games_byte_compatible(self):
+        standard, fast = self.responses('/api/games/')
+        self.assertEqual(fast, standard)
+        self.assertNotIn('developer_name', json.loads(fast)['results'][0])
+
+    def test_reviews_byte_compatible(self):
+        standard, fast = self.responses('/api/reviews/?ordering=rating')
+        self.assertEqual(fast, standard)
+        self.assertEqual(json.loads(fast)['results'][0]['user_username'], 'critic')
+
+    def test_fast_reviews_pagination(self):
+        for number in range(12):
+            user = User.objects.create_user(username=f'user{number}', password='testpass123')
+            Review.objects.create(user=user, game=self.orphan, rating=number % 5 + 1, comment='Ok')
+        with self.settings(LIBRARY_FAST_SERIALIZERS=True):
+            first = self.client.get('/api/reviews/').json()
+            second = self.client.get(first['next']).json()
+        ids = [review['id'] for review in first['results'] + second['results']]
+        self.assertEqual(ids, list(Review.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+
+class SparseFieldsetTest(TestCase):
+    """Tests para ?fields= / ?omit= en la API"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='critic', password='testpass123')
+        self.category = Category.objects.create(name='Puzzle', icon='bi-puzzle')
+        self.game = Game.objects.create(title='Portal', description='Puzzles', release_date='2007-10-10',
+                                        price=9.99, developer=Developer.objects.create(name='Valve'))
+        self.game.categories.add(self.category)
+        Review.objects.create(user=self.user, game=self.game, rating=4, comment='Bien')
+
+    def test_fields_trim_payload_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/games/', {'fields': 'id,title,rating'})
+        self.assertEqual(response.json()['results'], [{'id': self.game.pk, 'title': 'Portal', 'rating': '4.00'}])
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('description', sql)
+        self.assertNotIn('library_game_categories', sql)
+
+    def test_nested_serializers_keep_their_fields(self):
+        response = self.client.get(f'/api/games/{self.game.pk}/', {'fields': 'categories,developer_name'})
+        self.assertEqual(response.json(), {
+            'developer_name': 'Valve',
+            'categories': [{'id': self.category.pk, 'name': 'Puzzle', 'description': '', 'icon': 'bi-puzzle'}],
+        })
+
+    def test_omit_and_fast_mode(self):
+        response = self.client.get('/api/reviews/', {'omit': 'comment,updated_at,created_at'})
+        self.assertEqual(set(response.json()['results'][0]), {
+            'id', 'user', 'user_username', 'game', 'game_title', 'rating', 'is_helpful'
+        })
+        with self.settings(LIBRARY_FAST_SERIALIZERS=True):
+            fast = self.client.get('/api/reviews/', {'omit': 'comment,updated_at,created_at'})
+            games = self.client.get('/api/games/', {'fields': 'id,rating_histogram'})
+        self.assertEqual(fast.content, response.content)
+        self.assertEqual(games.json()['results'], [
+            {'id': self.game.pk, 'rating_histogram': {'1': 0, '2': 0, '3': 0, '4': 1, '5': 0}}
+        ])
+
+
+class GameReviewsActionTest(TestCase):
+    """Tests para las reseñas de un juego en la API (paginadas y en streaming)"""
+
+    def setUp(self):
+        self.game = Game.objects.create(title='Portal', description='Puzzles', release_date='2007-10-10', price=9.99)
+        for number in range(12):
+            user = User.objects.create_user(username=f'critic{number}', password='testpass123')
+            Review.objects.create(user=user, game=self.game, rating=number % 5 + 1, comment=f'Reseña {number}')
+
+    def test_reviews_are_paginated(self):
+        url = f'/api/games/{self.game.pk}/reviews/'
+        first = self.client.get(url).json()
+        self.assertEqual(len(first['results']), 10)
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 2)
+        self.assertIsNone(second['next'])
+        ids = [review['id'] for review in first['results'] + second['results']]
+        self.assertEqual(ids, list(self.game.reviews.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+    def test_ndjson_stream(self):
+        url = f'/api/games/{self.game.pk}/reviews/'
+        expected = self.client.get(url).json()['results']
+        for params, headers in (({'format': 'ndjson'}, {}), ({}, {'HTTP_ACCEPT': 'application/x-ndjson'})):
+            response = self.client.get(url, params, **headers)
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            lines = b''.join(response.streaming_content).decode().splitlines()
+            self.assertEqual(len(lines), 12)
+            self.assertEqual([json.loads(line) for line in lines[:10]], expected)
+        with self.settings(LIBRARY_FAST_SERIALIZERS=True):
+            fast = self.client.get(url, {'format': 'ndjson'})
+            self.assertEqual(b''.join(fast.streaming_content).decode().splitlines(), lines)
+
+    def test_unknown_game(self):
+        self.assertEqual(self.client.get('/api/games/999/reviews/').status_code, 404)
+
+
+class GameBatchAPITest(TestCase):
+    """Tests para /api/games/batch/"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Acción')
+        developer = Developer.objects.create(name='Valve')
+        self.games = []
+        for number in range(4):
+            game = Game.objects.create(title=f'Juego {number}', description='Desc', release_date='2020-01-01',
+                                       price=10, developer=developer)
+            game.categories.add(category)
+            self.games.append(game)
+
+    def test_requested_order_and_missing_ids(self):
+        ids = [self.games[2].pk, 999, self.games[0].pk]
+        response = self.client.get('/api/games/batch/', {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([game['id'] for game in data['results']], [self.games[2].pk, self.games[0].pk])
+        self.assertEqual(data['missing'], [999])
+        detail = self.client.get(f'/api/games/{self.games[2].pk}/').json()
+        self.assertEqual(data['results'][0], detail)
+
+    def test_post_uses_payload_cache(self):
+        ids = [game.pk for game in reversed(self.games)]
+        # Sin caché: ids y updated_at, juegos con su desarrollador y el prefetch de categorías
+        with self.assertNumQueries(3):
+            first = self.client.post('/api/games/batch/', {'ids': ids}, content_type='application/json')
+        with self.assertNumQueries(1):
+            second = self.client.post('/api/games/batch/', {'ids': ids}, content_type='application/json')
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual([game['id'] for game in first.json()['results']], ids)
+
+    def test_invalid_ids(self):
+        self.assertEqual(self.client.get('/api/games/batch/', {'ids': '1,abc'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/games/batch/', {'ids': '99999999999999999999999'}).status_code, 400)
+        response = self.client.post('/api/games/batch/', {'ids': [1, -2 ** 64]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/games/batch/', {'ids': list(range(101))}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkLibraryAPITest(TestCase):
+    """Tests para la sincronización masiva de la biblioteca"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='collector', password='pass')
+        self.client.login(username='collector', password='pass')
+        self.games = [
+            Game.objects.create(title=f'Game {number}', description='Desc', release_date='2024-01-01', price=9.99)
+            for number in range(4)
+        ]
+        UserLibrary.objects.create(user=self.user, game=self.games[0], hours_played=1)
+        UserLibrary.objects.create(user=self.user, game=self.games[1])
+
+    def post(self, rows):
+        return self.client.post('/api/library/bulk/', json.dumps(rows), content_type='application/json')
+
+    def test_operations_and_results(self):
+        rows = [
+            {'op': 'set', 'game': self.games[0].pk, 'hours_played': '12.5', 'is_favorite': True},
+            {'op': 'remove', 'game': self.games[1].pk},
+            {'op': 'add', 'game': self.games[2].pk, 'hours_played': '3'},
+            {'op': 'add', 'game': self.games[0].pk},
+            {'op': 'set', 'game': self.games[3].pk, 'is_favorite': True},
+            {'op': 'add', 'game': 999999},
+            {'op': 'fly', 'game': self.games[3].pk},
+        ]
+        # 11 de las operaciones y el borrado, 2 del savepoint del bulk_create,
+        # 1 UPDATE de UserStats por la fila borrada y 1 por las agregadas y modificadas
+        with self.assertNumQueries(11 + 2 + 1 + 1):
+            response = self.post(rows)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in response.json()['results']],
+                         ['updated', 'removed', 'created', 'error', 'not_found', 'not_found', 'error'])
+        library = {item.game_id: item for item in UserLibrary.objects.filter(user=self.user)}
+        self.assertEqual(set(library), {self.games[0].pk, self.games[2].pk})
+        self.assertEqual((float(library[self.games[0].pk].hours_played), library[self.games[0].pk].is_favorite),
+                         (12.5, True))
+        self.assertEqual(float(library[self.games[2].pk].hours_played), 3.0)
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual((stats.library_count, float(stats.total_hours), stats.favorites_count), (2, 15.5, 1))
+
+    def test_too_many_operations(self):
+        rows = [{'op': 'remove', 'game': self.games[1].pk}] * 1001
+        self.assertEqual(self.post(rows).status_code, 400)
+        self.assertTrue(UserLibrary.objects.filter(user=self.user, game=self.games[1]).exists())
+
+    def test_rows_added_meanwhile_count_as_existing(self):
+        # Simula una escritura concurrente: la fila no estaba al leer las existentes
+        UserLibrary.objects.create(user=self.user, game=self.games[2], hours_played=2)
+        rows = [{'op': 'add', 'game': self.games[2].pk, 'hours_played': '3'},
+                {'op': 'add', 'game': self.games[3].pk, 'is_favorite': True}]
+        with mock.patch.object(UserLibrary.objects, 'select_for_update', return_value=UserLibrary.objects.none()):
+            response = self.post(rows)
+        self.assertEqual([result['status'] for result in response.json()['results']], ['exists', 'created'])
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual((stats.library_count, float(stats.total_hours), stats.favorites_count), (4, 3.0, 1))
+
+    def test_add_existing_without_fields(self):
+        response = self.post([{'op': 'add', 'game': self.games[1].pk}])
+        self.assertEqual(response.json()['results'], [{'index': 0, 'game': self.games[1].pk, 'status': 'exists'}])
+
+    def test_requires_authentication(self):
+        self.client.logout()
+        self.assertIn(self.post([]).status_code, (401, 403))
+
+
+class SyncAPITest(TestCase):
+    """Tests para la sincronización incremental /api/sync/"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='offline', password='pass')
+        self.other = User.objects.create_user(username='other', password='pass')
+        self.developer = Developer.objects.create(name='Valve')
+        self.category = Category.objects.create(name='Acción')
+        self.game = Game.objects.create(title='Portal', description='Desc', release_date='2007-10-10',
+                                        price=9.99, developer=self.developer)
+        self.item = UserLibrary.objects.create(user=self.user, game=self.game)
+        self.client.login(username='offline', password='pass')
+
+    def last_token(self):
+        """Token que cubre todo lo registrado hasta ahora"""
+        return sync.encode_token(ChangeLog.objects.order_by('-id').values_list('id', flat=True).first() or 0)
+
+    def test_full_snapshot_without_token(self):
+        data = self.client.get('/api/sync/').json()
+        self.assertEqual([game['id'] for game in data['games']], [self.game.pk])
+        self.assertEqual([item['id'] for item in data['library']], [self.item.pk])
+        self.assertEqual(data['deleted'], {name: [] for name in
+                                           ('games', 'developers', 'categories', 'library', 'reviews')})
+        self.assertTrue(data['token'])
+
+    def test_delta_since_token(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        token = self.last_token()
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(user=self.user, game=self.game, rating=5, comment='Genial')
+            Review.objects.create(user=self.other, game=self.game, rating=3, comment='Ajena')
+            category_id, item_id = self.category.pk, self.item.pk
+            self.category.delete()
+            self.item.delete()
+        data = self.client.get('/api/sync/', {'since': token}).json()
+        # La reseña actualiza los contadores del juego
+        self.assertEqual([game['id'] for game in data['games']], [self.game.pk])
+        self.assertEqual(data['developers'], [])
+        self.assertEqual([review['user'] for review in data['reviews']], [self.user.pk])
+        self.assertEqual(data['library'], [])
+        self.assertEqual(data['deleted']['categories'], [category_id])
+        self.assertEqual(data['deleted']['library'], [item_id])
+
+    def test_long_transaction_is_not_lost(self):
+        # La fila se escribió hace diez minutos, pero su transacción se confirma después de emitir el token
+        token = self.last_token()
+        self.developer.name = 'Valve Corporation'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.developer.save()
+        Developer.objects.filter(pk=self.developer.pk).update(updated_at=timezone.now() - timedelta(minutes=10))
+        data = self.client.get('/api/sync/', {'since': token}).json()
+        self.assertEqual([developer['name'] for developer in data['developers']], ['Valve Corporation'])
+        # Una entrada reciente no adelanta el token hasta asentarse
+        self.assertEqual(sync.decode_token(data['token']), sync.decode_token(token))
+        ChangeLog.objects.update(created_at=timezone.now() - timedelta(minutes=1))
+        data = self.client.get('/api/sync/', {'since': token}).json()
+        self.assertEqual(sync.decode_token(data['token']), sync.decode_token(self.last_token()))
+        self.assertEqual(self.client.get('/api/sync/', {'since': data['token']}).json()['developers'], [])
+
+    def test_full_snapshot_is_paginated(self):
+        second = Game.objects.create(title='Portal 2', description='Desc', release_date='2011-04-19', price=9.99)
+        pages = []
+        with mock.patch.object(sync, 'SYNC_PAGE_SIZE', 2):
+            data = self.client.get('/api/sync/').json()
+            pages.append(data)
+            while data['next']:
+                data = self.client.get('/api/sync/', {'page': data['next']}).json()
+                pages.append(data)
+        self.assertTrue(all(page['full'] for page in pages))
+        self.assertEqual({page['token'] for page in pages}, {pages[0]['token']})
+        self.assertEqual([game['id'] for page in pages for game in page['games']], [self.game.pk, second.pk])
+        self.assertEqual([item['id'] for page in pages for item in page['library']], [self.item.pk])
+        self.assertEqual(self.client.get('/api/sync/', {'page': 'basura'}).status_code, 400)
+
+    def test_prune_compacts_and_expires_entries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        token = self.last_token()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.developer.save()
+            self.developer.save()
+            self.game.save()
+        ChangeLog.objects.exclude(kind='developer').update(created_at=timezone.now() - timedelta(days=60))
+        call_command('prune_changelog', days=30, stdout=StringIO())
+        # Queda una entrada por objeto y la más reciente, aunque esté vencida
+        self.assertEqual(list(ChangeLog.objects.values_list('kind', 'object_id')),
+                         [('game', self.game.pk), ('developer', self.developer.pk)])
+        # El token es anterior a entradas recortadas: copia completa
+        data = self.client.get('/api/sync/', {'since': token}).json()
+        self.assertTrue(data['full'])
+        self.assertEqual([item['id'] for item in data['library']], [self.item.pk])
+        data = self.client.get('/api/sync/', {'since': self.last_token()}).json()
+        self.assertFalse(data['full'])
+
+    def test_anonymous_and_invalid_token(self):
+        self.client.logout()
+        data = self.client.get('/api/sync/').json()
+        self.assertNotIn('library', data)
+        self.assertNotIn('reviews', data)
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'basura'}).status_code, 400)
+
+
+class GameCountCounterTest(TestCase):
+    """Tests para los contadores de juegos de desarrolladores y categorías"""
+
+    def setUp(self):
+        self.valve = Developer.objects.create(name='Valve')
+        self.bethesda = Developer.objects.create(name='Bethesda')
+        self.action = Category.objects.create(name='Acción')
+        self.puzzle = Category.objects.create(name='Puzzle')
+        self.game = Game.objects.create(title='Portal', description='Desc', release_date='2007-10-10',
+                                        price=9.99, developer=self.valve)
+
+    def counts(self):
+        return {obj.name: obj.game_count for obj in [*Developer.objects.all(), *Category.objects.all()]}
+
+    def test_developer_changes(self):
+        self.assertEqual(self.counts()['Valve'], 1)
+        self.game.developer = self.bethesda
+        self.game.save()
+        self.assertEqual((self.counts()['Valve'], self.counts()['Bethesda']), (0, 1))
+        self.game.delete()
+        self.assertEqual(self.counts()['Bethesda'], 0)
+
+    def test_category_changes_in_both_directions(self):
+        self.game.categories.add(self.action, self.puzzle)
+        self.game.categories.add(self.action)
+        other = Game.objects.create(title='Doom', description='Desc', release_date='1993-12-10', price=4.99)
+        self.action.games.add(other)
+        self.assertEqual((self.counts()['Acción'], self.counts()['Puzzle']), (2, 1))
+        self.game.categories.remove(self.puzzle)
+        self.action.games.clear()
+        self.assertEqual((self.counts()['Acción'], self.counts()['Puzzle']), (0, 0))
+        other.categories.set([self.puzzle])
+        other.delete()
+        self.assertEqual(self.counts()['Puzzle'], 0)
+
+    def test_removing_unlinked_category(self):
+        self.game.categories.add(self.action)
+        self.game.categories.remove(self.action, self.puzzle)
+        self.game.categories.remove(self.puzzle)
+        self.assertEqual((self.counts()['Acción'], self.counts()['Puzzle']), (0, 0))
+        other = Game.objects.create(title='Doom', description='Desc', release_date='1993-12-10', price=4.99)
+        self.puzzle.games.add(self.game)
+        self.puzzle.games.remove(self.game, other)
+        self.assertEqual(self.counts()['Puzzle'], 0)
+
+    def test_views_read_stored_column(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/developers/')
+        self.assertEqual({row['name']: row['game_count'] for row in response.json()['results']},
+                         {'Valve': 1, 'Bethesda': 0})
+        self.assertNotIn('COUNT(', ' '.join(query['sql'] for query in queries).upper().replace(
+            'COUNT(*)', ''))
+        response = self.client.get(reverse('library:developer_list'))
+        self.assertEqual([developer.name for developer in response.context['developers']], ['Valve', 'Bethesda'])
+
+
+class TypedExportTest(TestCase):
+    """Tests para las exportaciones JSON/NDJSON/Parquet/Arrow de bibliotecas y reseñas"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='analyst', password='pass')
+        developer = Developer.objects.create(name='Valve')
+        self.games = [
+            Game.objects.create(title=f'Juego {number}', description='Desc', release_date='2020-01-01',
+                                price=10, developer=developer if number else None)
+            for number in range(3)
+        ]
+        for number, game in enumerate(self.games):
+            UserLibrary.objects.create(user=self.user, game=game, hours_played=Decimal(f'{number}.25'))
+            Review.objects.create(user=self.user, game=game, rating=number + 1, comment=f'Reseña ñ {number}')
+        self.client.login(username='analyst', password='pass')
+
+    def export(self, url, export_format):
+        response = self.client.get(url, {'format': export_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_json_and_ndjson(self):
+        response, body = self.export('/api/library/export/', 'ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('biblioteca.ndjson', response['Content-Disposition'])
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(sorted(row['hours_played'] for row in rows), ['0.25', '1.25', '2.25'])
+        self.assertEqual({row['developer_name'] for row in rows}, {None, 'Valve'})
+        _, body = self.export('/api/reviews/export/', 'json')
+        reviews = json.loads(body)
+        self.assertEqual([review['rating'] for review in reviews], [3, 2, 1])
+        self.assertEqual(reviews[0]['comment'], 'Reseña ñ 2')
+        Review.objects.all().delete()
+        self.assertEqual(json.loads(self.export('/api/reviews/export/', 'json')[1]), [])
+
+    @skipUnless(exports.columnar_available(), 'pyarrow no está instalado')
+    def test_parquet_and_arrow_keep_types(self):
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+        _, body = self.export('/api/library/export/', 'parquet')
+        table = pyarrow.parquet.read_table(BytesIO(body))
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.schema.field('hours_played').type, pyarrow.decimal128(6, 2))
+        self.assertEqual(str(table.schema.field('date_added').type), 'timestamp[us, tz=UTC]')
+        self.assertEqual(sorted(table.column('hours_played').to_pylist()),
+                         [Decimal('0.25'), Decimal('1.25'), Decimal('2.25')])
+        _, body = self.export('/api/reviews/export/', 'arrow')
+        table = pyarrow.ipc.open_stream(body).read_all()
+        self.assertEqual(table.column('rating').to_pylist(), [3, 2, 1])
+        self.assertEqual(table.column('created_at').to_pylist()[0],
+                         Review.objects.order_by('-created_at', '-id').first().created_at)
+
+    def test_library_export_is_per_user(self):
+        other = User.objects.create_user(username='other', password='pass')
+        UserLibrary.objects.create(user=other, game=self.games[0])
+        _, body = self.export('/api/library/export/', 'ndjson')
+        self.assertEqual(len(body.decode().splitlines()), 3)
+
+    def test_review_export_requires_login_and_is_scoped(self):
+        other = User.objects.create_user(username='other', password='pass')
+        Review.objects.create(user=other, game=self.games[0], rating=5, comment='Ajena')
+        self.client.logout()
+        self.assertIn(self.client.get('/api/reviews/export/', {'format': 'json'}).status_code, (401, 403))
+        self.client.login(username='analyst', password='pass')
+        _, body = self.export('/api/reviews/export/', 'json')
+        self.assertEqual({review['user'] for review in json.loads(body)}, {self.user.pk})
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        _, body = self.export('/api/reviews/export/', 'json')
+        self.assertEqual(len(json.loads(body)), 4)
+
+    def test_columnar_without_pyarrow(self):
+        with mock.patch.object(exports, 'pyarrow', None):
+            response = self.client.get('/api/reviews/export/', {'format': 'parquet'})
+        self.assertEqual(response.status_code, 406)
+        self.assertIn('pyarrow', response.json()['detail'])
+
+
+class LibraryImportTest(TestCase):
+    """Tests para la importación de bibliotecas desde CSV/JSON"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='migrant', password='pass')
+        valve = Developer.objects.create(name='Valve')
+        bethesda = Developer.objects.create(name='Bethesda')
+        self.portal = Game.objects.create(title='Portal', description='Desc', release_date='2007-10-10',
+                                          price=9.99, developer=valve)
+        self.doom = Game.objects.create(title='Doom', description='Desc', release_date='1993-12-10',
+                                        price=4.99, developer=bethesda)
+        self.doom_remake = Game.objects.create(title='Doom', description='Desc', release_date='2016-05-13',
+                                               price=19.99, developer=valve)
+        self.client.login(username='migrant', password='pass')
+
+    def upload(self, name, content):
+        return self.client.post(reverse('library:import_library'),
+                                {'file': SimpleUploadedFile(name, content.encode())})
+
+    def test_csv_report(self):
+        content = ('Juego,Desarrollador,Horas Jugadas,Favorito,Fecha Agregado\n'
+                   'Portal,Valve,12.50,Sí,2024-01-01\n'
+                   'Doom,N/A,1,No,2024-01-01\n'
+                   'Doom,Bethesda,3,No,2024-01-01\n'
+                   'Half-Life 3,Valve,0,No,2024-01-01\n'
+                   'Portal,Valve,1,No,2024-01-01\n'
+                   'Quake,id,muchas,No,2024-01-01\n')
+        response = self.upload('biblioteca.csv', content)
+        report = response.context['report']
+        self.assertEqual((report['created'], report['existing'], report['matched']), (2, 1, 3))
+        self.assertEqual([entry['row'] for entry in report['ambiguous']], [2])
+        self.assertEqual(report['unknown'], [{'row': 4, 'title': 'Half-Life 3'}])
+        self.assertEqual([entry['row'] for entry in report['invalid']], [6])
+        portal = UserLibrary.objects.get(user=self.user, game=self.portal)
+        self.assertEqual((float(portal.hours_played), portal.is_favorite), (12.5, True))
+        self.assertTrue(UserLibrary.objects.filter(user=self.user, game=self.doom).exists())
+
+    def test_one_lookup_per_chunk(self):
+        from .imports import import_library
+        rows = [{'title': title} for title in ('Portal', 'Doom', 'Nada') * 20]
+        # Por lote: títulos, entradas existentes, inserción en su savepoint y sus ids para ChangeLog
+        # (solo el primero) y el savepoint del lote; al final, el recálculo de UserStats
+        with self.assertNumQueries(8 + 4 + 4):
+            import_library(self.user, iter(rows), chunk_size=30)
+
+    def test_rows_added_meanwhile_count_as_existing(self):
+        from .imports import import_library
+        real_filter = UserLibrary.objects.filter
+        calls = []
+
+        def stale_filter(*args, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                # Otra petición agrega Portal justo después de la lectura de las entradas existentes
+                UserLibrary.objects.create(user=self.user, game=self.portal)
+                return real_filter(*args, **kwargs).none()
+            return real_filter(*args, **kwargs)
+
+        rows = [{'title': 'Portal'}, {'title': 'Doom', 'developer': 'Bethesda'}]
+        with mock.patch.object(UserLibrary.objects, 'filter', side_effect=stale_filter):
+            report = import_library(self.user, iter(rows))
+        self.assertEqual((report['created'], report['existing']), (1, 1))
+        self.assertEqual(UserLibrary.objects.filter(user=self.user).count(), 2)
+
+    def test_format_error_midway_returns_partial_report(self):
+        path = os.path.join(tempfile.mkdtemp(), 'biblioteca.json')
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write('[{"game_title": "Portal"},\n {"game_title": "Doom", "developer_name": "Valve"},\n {"game_')
+        with self.assertRaisesMessage(CommandError, 'Fila 3'):
+            call_command('import_library', 'migrant', path, chunk_size=1, stdout=StringIO())
+        self.assertEqual(set(UserLibrary.objects.filter(user=self.user).values_list('game_id', flat=True)),
+                         {self.portal.pk, self.doom_remake.pk})
+
+    def test_json_array_and_command_with_ndjson(self):
+        response = self.upload('biblioteca.json', json.dumps([{'game_title': 'Portal', 'hours_played': '2.00'}]))
+        self.assertEqual(response.context['report']['created'], 1)
+        other = User.objects.create_user(username='other', password='pass')
+        path = os.path.join(tempfile.mkdtemp(), 'biblioteca.ndjson')
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write('{"game_title": "Portal", "is_favorite": true}\n\n'
+                         '{"game_title": "Doom", "developer_name": "Valve"}\n')
+        out = StringIO()
+        call_command('import_library', 'other', path, stdout=out)
+        self.assertIn('2 juegos encontrados', out.getvalue())
+        self.assertEqual(set(UserLibrary.objects.filter(user=other).values_list('game_id', flat=True)),
+                         {self.portal.pk, self.doom_remake.pk})
+
+    def test_non_finite_hours_are_invalid_rows(self):
+        content = ('Juego,Horas Jugadas\n'
+                   'Portal,NaN\n'
+                   'Portal,Infinity\n'
+                   'Doom,sNaN\n')
+        response = self.upload('biblioteca.csv', content)
+        self.assertEqual(response.status_code, 200)
+        report = response.context['report']
+        self.assertEqual([entry['row'] for entry in report['invalid']], [1, 2, 3])
+        self.assertEqual(report['created'], 0)
+
+    def test_invalid_file(self):
+        response = self.upload('biblioteca.json', '{"game_title": ')
+        self.assertEqual(response.context['report']['error']['row'], 1)
+        self.assertEqual(response.context['report']['created'], 0)
+        self.assertContains(response, 'Archivo inválido')
+
+
+class ExportJobTest(TestCase):
+    """Tests para las exportaciones en segundo plano"""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.staff = User.objects.create_user(username='support', password='pass', is_staff=True)
+        game = Game.objects.create(title='Portal', description='Desc', release_date='2007-10-10', price=9.99)
+        for number in range(3):
+            user = User.objects.create_user(username=f'player{number}', password='pass')
+            UserLibrary.objects.create(user=user, game=game, hours_played=number)
+            Review.objects.create(user=user, game=game, rating=number + 2, comment='Bien')
+        self.client.login(username='support', password='pass')
+
+    def create_job(self, dataset, file_format='ndjson'):
+        with mock.patch.object(jobs, 'get_executor') as executor, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/export-jobs/', {'dataset': dataset, 'file_format': file_format})
+        self.assertEqual(response.status_code, 201)
+        executor.return_value.submit.assert_called_once()
+        return response.json()['id']
+
+    def test_job_writes_file_and_notifies(self):
+        job_id = self.create_job('libraries')
+        self.assertEqual(self.client.get(f'/api/export-jobs/{job_id}/').json()['status'], 'pending')
+        with self.settings(MEDIA_ROOT=self.media):
+            jobs.run_export_job(job_id)
+            data = self.client.get(f'/api/export-jobs/{job_id}/').json()
+            self.assertEqual((data['status'], data['total_rows'], data['processed_rows'], data['percent_complete']),
+                             ('done', 3, 3, 100.0))
+            self.assertGreater(data['rows_per_second'], 0)
+            response = self.client.get(data['download_url'])
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['user_username'] for row in rows], ['player0', 'player1', 'player2'])
+        notification = Notification.objects.get(user=self.staff)
+        self.assertEqual((notification.title, notification.link), ('Exportación lista', f'/api/export-jobs/{job_id}/download/'))
+
+    def test_pending_download_and_permissions(self):
+        job_id = self.create_job('reviews', 'json')
+        self.assertEqual(self.client.get(f'/api/export-jobs/{job_id}/download/').status_code, 409)
+        self.client.login(username='player0', password='pass')
+        self.assertEqual(self.client.get('/api/export-jobs/').status_code, 403)
+
+    def test_failure_is_recorded(self):
+        job_id = self.create_job('reviews')
+        with self.settings(MEDIA_ROOT=self.media), \
+                mock.patch.object(exports, 'row_batches', side_effect=RuntimeError('disco lleno')):
+            with self.assertRaises(RuntimeError):
+                jobs.run_export_job(job_id)
+        job = ExportJob.objects.get(pk=job_id)
+        self.assertEqual((job.status, job.error), ('failed', 'disco lleno'))
+        self.assertEqual(Notification.objects.get(user=self.staff).title, 'Exportación fallida')
+
+    def test_failure_before_writing_is_recorded(self):
+        job_id = self.create_job('reviews')
+        broken = (mock.Mock(side_effect=RuntimeError('sin conexión')), exports.REVIEW_COLUMNS)
+        with mock.patch.dict(jobs.DATASETS, {'reviews': broken}), self.assertRaises(RuntimeError):
+            jobs.run_export_job(job_id)
+        self.assertEqual(ExportJob.objects.get(pk=job_id).status, 'failed')
+
+    def test_stale_running_jobs_fail_once(self):
+        stale, active = self.create_job('reviews'), self.create_job('libraries')
+        ExportJob.objects.filter(pk=stale).update(status='running', heartbeat_at=timezone.now() - timedelta(hours=1))
+        ExportJob.objects.filter(pk=active).update(status='running', heartbeat_at=timezone.now())
+        jobs.fail_stale_jobs()
+        jobs.fail_stale_jobs()
+        self.assertEqual(dict(ExportJob.objects.values_list('pk', 'status')), {stale: 'failed', active: 'running'})
+        self.assertEqual(Notification.objects.filter(user=self.staff).count(), 1)
+
+    def test_download_link_is_valid(self):
+        job_id = self.create_job('reviews')
+        with self.settings(MEDIA_ROOT=self.media):
+            jobs.run_export_job(job_id)
+        Notification.objects.get(user=self.staff).full_clean()
+
+
+
+class UserStatsTest(TestCase):
+    """Tests para el resumen denormalizado de estadísticas por usuario"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='stats', password='pass')
+        self.client.login(username='stats', password='pass')
+        self.games = [
+            Game.objects.create(title=f'Game {number}', description='Desc', release_date='2024-01-01', price=9.99)
+            for number in range(3)
+        ]
+        self.item = UserLibrary.objects.create(user=self.user, game=self.games[0], hours_played=10, is_favorite=True)
+        UserLibrary.objects.create(user=self.user, game=self.games[1], hours_played=2.5)
+        self.review = Review.objects.create(user=self.user, game=self.games[0], rating=5, comment='A')
+        Review.objects.create(user=self.user, game=self.games[1], rating=2, comment='B')
+
+    def stats(self):
+        return UserStats.objects.get(user=self.user)
+
+    def assertMatchesRecompute(self):
+        stored = self.stats()
+        UserStats.recompute([self.user.pk])
+        fresh = self.stats()
+        self.assertEqual([getattr(stored, field) for field in UserStats.FIELDS],
+                         [getattr(fresh, field) for field in UserStats.FIELDS])
+
+    def test_writes_update_row(self):
+        stats = self.stats()
+        self.assertEqual((stats.library_count, stats.total_hours, stats.favorites_count), (2, Decimal('12.50'), 1))
+        self.assertEqual((stats.reviews_count, stats.average_rating), (2, 3.5))
+        self.item.hours_played = Decimal('4.25')
+        self.item.is_favorite = False
+        self.item.save()
+        self.review.rating = 3
+        self.review.save()
+        stats = self.stats()
+        self.assertEqual((stats.total_hours, stats.favorites_count, stats.average_rating),
+                         (Decimal('6.75'), 0, 2.5))
+        self.item.delete()
+        Review.objects.filter(user=self.user).delete()
+        stats = self.stats()
+        self.assertEqual((stats.library_count, stats.reviews_count, stats.average_rating), (1, 0, None))
+        self.assertMatchesRecompute()
+
+    def test_cascades_update_row(self):
+        self.games[0].delete()
+        stats = self.stats()
+        self.assertEqual((stats.library_count, stats.favorites_count, stats.reviews_count), (1, 0, 1))
+        self.assertMatchesRecompute()
+
+    def test_bulk_library_updates_row(self):
+        response = self.client.post('/api/library/bulk/', json.dumps([
+            {'op': 'add', 'game': self.games[2].pk, 'is_favorite': True},
+            {'op': 'set', 'game': self.games[0].pk, 'hours_played': '1'},
+            {'op': 'remove', 'game': self.games[1].pk},
+        ]), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        stats = self.stats()
+        self.assertEqual((stats.library_count, stats.total_hours, stats.favorites_count), (2, Decimal('1.00'), 2))
+
+    def test_bulk_reviews_update_row(self):
+        self.client.post('/api/reviews/bulk/', json.dumps([
+            {'game': self.games[2].pk, 'rating': 5, 'comment': 'C'},
+        ]), content_type='application/json')
+        stats = self.stats()
+        self.assertEqual((stats.reviews_count, stats.rating_sum), (3, 12))
+
+    def test_missing_row_is_computed(self):
+        UserStats.objects.filter(user=self.user).delete()
+        self.assertEqual(UserStats.for_user(self.user.pk).library_count, 2)
+        self.assertTrue(UserStats.objects.filter(user=self.user).exists())
+
+    def test_pages_read_stats_row(self):
+        response = self.client.get(reverse('library:user_profile', args=[self.user.pk]))
+        self.assertEqual(response.context['stats'].favorites_count, 1)
+        self.assertContains(response, '3,5')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('library:my_library'))
+        self.assertEqual(response.context['total_games'], 2)
+        self.assertNotIn('SUM(', ' '.join(query['sql'] for query in queries).upper())
+        self.assertEqual(len([query for query in queries if 'library_userstats' in query['sql']]), 1)
@@ -34,6 +34,7 @@ urlpatterns = [
     path('my-library/', views.my_library_view, name='my_library'),
     path('my-library/<int:pk>/update/', views.update_library_item, name='update_library_item'),
     path('my-library/export/', views.export_library_csv, name='export_library_csv'),
+    path('my-library/import/', views.import_library_view, name='import_library'),
     
     # Desarrolladores
     path('developers/', views.DeveloperListView.as_view(), name='developer_list'),
@@ -45,5 +46,6 @@ urlpatterns = [
     # Notificaciones
     path('notifications/', views.notifications_view, name='notifications'),
     path('notifications/<int:pk>/read/', views.mark_notification_read, name='mark_notification_read'),
+    path('notifications/read-all/', views.mark_all_notifications_read, name='mark_all_notifications_read'),
 ]
 
@@ -8,13 +8,18 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth import get_user_model
 from django.contrib import messages
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
-from django.db.models import Q, Count, Avg, Sum
+from django.db.models import Q
 from django.core.paginator import Paginator
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 import csv
-from .models import Game, Review, UserLibrary, Developer, Category, Notification
-from .forms import CustomUserCreationForm, GameForm, ReviewForm, UserLibraryForm, SearchForm
+from .models import Game, Review, UserLibrary, UserStats, Developer, Notification
+from .forms import CustomUserCreationForm, GameForm, ReviewForm, UserLibraryForm, SearchForm, LibraryImportForm
+from .caching import HOME_SECTIONS, get_or_compute, reset_unread_notifications
+from .pagination import paginate_request
+from .facets import active_filters, apply_filters, facet_counts
+from .imports import detect_format, import_library, read_rows
+from .search import fuzzy_search, get_search_backend
 
 
 # ==================== VISTAS DE AUTENTICACIÓN ====================
@@ -45,43 +50,75 @@ class GameListView(ListView):
     template_name = 'library/game_list.html'
     context_object_name = 'games'
     paginate_by = 12
+    # Faceta, título y parámetro GET de su filtro
+    facet_params = [
+        ('category', 'Categorías', 'category'),
+        ('developer', 'Desarrolladores', 'developer'),
+        ('rating', 'Calificación', 'min_rating'),
+        ('year', 'Año de lanzamiento', 'year'),
+    ]
 
     def get_queryset(self):
-        queryset = Game.objects.select_related('developer').prefetch_related('categories').all()
-        
-        # Búsqueda
-        query = self.request.GET.get('q')
-        if query:
-            queryset = queryset.filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(developer__name__icontains=query)
-            )
-        
-        # Filtro por categoría
-        category_id = self.request.GET.get('category')
-        if category_id:
-            queryset = queryset.filter(categories__id=category_id)
-        
-        # Filtro por calificación mínima
-        min_rating = self.request.GET.get('min_rating')
-        if min_rating:
-            queryset = queryset.filter(rating__gte=min_rating)
+        queryset = self.search_queryset()
+        self.filters = active_filters(self.request.GET)
+        queryset = apply_filters(queryset, self.filters)
         
-        # Ordenamiento
-        order_by = self.request.GET.get('order_by', '-release_date')
+        # Ordenamiento (por relevancia si hay búsqueda y no se eligió otro)
+        order_by = self.request.GET.get('order_by')
         if order_by in ['title', '-title', 'rating', '-rating', 'release_date', '-release_date']:
             queryset = queryset.order_by(order_by)
+        elif 'title_length' in queryset.query.annotations:
+            queryset = queryset.order_by('-search_rank', 'title_length', 'title')
+        elif 'search_rank' in queryset.query.annotations:
+            queryset = queryset.order_by('-search_rank', '-release_date', 'title')
+        else:
+            queryset = queryset.order_by('-release_date', 'title')
         
         return queryset.distinct()
 
+    def paginate_queryset(self, queryset, page_size):
+        """Paginación por cursor: sin COUNT ni OFFSET"""
+        page = paginate_request(self.request, queryset, page_size)
+        return None, page, page.object_list, page.has_other_pages()
+
+    def search_queryset(self):
+        """Juegos que cumplen la búsqueda de texto, antes de los filtros por faceta"""
+        queryset = Game.objects.select_related('developer').prefetch_related('categories').all()
+        
+        # Búsqueda de texto completo, o difusa por trigramas con fuzzy=1
+        query = self.request.GET.get('q', '').strip()
+        if query and self.request.GET.get('fuzzy') == '1':
+            queryset = fuzzy_search(queryset, query)
+        elif query:
+            queryset = get_search_backend().search(queryset, query)
+        return queryset
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.annotate(game_count=Count('games')).order_by('-game_count')[:10]
+        context['facets'] = self.facet_links(facet_counts(self.search_queryset(), self.filters))
         context['search_form'] = SearchForm(self.request.GET)
         context['total_games'] = Game.objects.count()
         return context
 
+    def facet_links(self, counts):
+        """Opciones de cada faceta con la URL que activa (o quita) su filtro"""
+        facets = []
+        for name, title, param in self.facet_params:
+            options = []
+            for value, label, count in counts[name]:
+                query = self.request.GET.copy()
+                query.pop('page', None)
+                active = query.get(param) == str(value)
+                if active:
+                    query.pop(param)
+                else:
+                    query[param] = value
+                options.append({
+                    'label': label, 'count': count, 'active': active, 'url': f'?{query.urlencode()}',
+                })
+            facets.append({'name': name, 'title': title, 'options': options})
+        return facets
+
 
 class GameDetailView(DetailView):
     """Detalle de un juego"""
@@ -90,21 +127,27 @@ class GameDetailView(DetailView):
     context_object_name = 'game'
 
     def get_queryset(self):
-        return Game.objects.select_related('developer').prefetch_related('categories', 'reviews__user')
+        return Game.objects.select_related('developer').prefetch_related('categories')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        game = self.get_object()
+        game = self.object
         
         # Reseñas paginadas
-        reviews = game.reviews.select_related('user').order_by('-created_at')
-        paginator = Paginator(reviews, 5)
-        page = self.request.GET.get('page')
-        context['reviews'] = paginator.get_page(page)
+        reviews = game.reviews.select_related('user').order_by('-created_at', '-id')
+        context['reviews'] = paginate_request(self.request, reviews, 5)
         
-        # Estadísticas
-        context['avg_rating'] = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-        context['total_reviews'] = reviews.count()
+        # Estadísticas desde los contadores del juego, sin consultar las reseñas
+        context['avg_rating'] = game.rating
+        context['total_reviews'] = game.total_reviews
+        context['rating_distribution'] = [
+            {
+                'stars': stars,
+                'count': count,
+                'percent': round(count * 100 / game.total_reviews) if game.total_reviews else 0,
+            }
+            for stars, count in sorted(game.rating_histogram.items(), reverse=True)
+        ]
         
         # Verificar si el usuario tiene el juego en su biblioteca
         if self.request.user.is_authenticated:
@@ -286,12 +329,11 @@ def my_library_view(request):
     page = request.GET.get('page')
     library_items = paginator.get_page(page)
     
+    stats = UserStats.for_user(request.user.pk)
     return render(request, 'library/my_library.html', {
         'library_items': library_items,
-        'total_games': UserLibrary.objects.filter(user=request.user).count(),
-        'total_hours': UserLibrary.objects.filter(user=request.user).aggregate(
-            total=Sum('hours_played')
-        )['total'] or 0,
+        'total_games': stats.library_count,
+        'total_hours': stats.total_hours,
     })
 
 
@@ -315,24 +357,58 @@ def update_library_item(request, pk):
     })
 
 
+@login_required
+def import_library_view(request):
+    """Importar juegos a la biblioteca desde un CSV o JSON"""
+    report = None
+    if request.method == 'POST':
+        form = LibraryImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            uploaded = form.cleaned_data['file']
+            report = import_library(request.user, read_rows(uploaded.file, detect_format(uploaded.name)))
+            if report['error']:
+                messages.error(request, f'{report["error"]["error"]} (fila {report["error"]["row"]}). '
+                                        f'Se importaron las filas anteriores: {report["created"]} juegos agregados.')
+            else:
+                messages.success(request, f'{report["created"]} juegos agregados a tu biblioteca.')
+    else:
+        form = LibraryImportForm()
+
+    return render(request, 'library/import_library.html', {'form': form, 'report': report})
+
+
 # ==================== VISTAS ADICIONALES ====================
 
+HOME_SECTION_SIZE = 6
+HOME_CACHE_TIMEOUT = 60 * 60
+
+
+def home_section_ids():
+    """IDs de las secciones de la portada; el conteo de reseñas sale del contador del juego"""
+    games = Game.objects.order_by()
+    return {
+        'featured_games': list(games.order_by('-rating', 'id').values_list('id', flat=True)[:HOME_SECTION_SIZE]),
+        'recent_games': list(games.order_by('-release_date', 'id').values_list('id', flat=True)[:HOME_SECTION_SIZE]),
+        'popular_games': list(
+            games.order_by('-total_reviews', 'id').values_list('id', flat=True)[:HOME_SECTION_SIZE]
+        ),
+    }
+
+
 def home_view(request):
     """Vista principal"""
-    featured_games = Game.objects.select_related('developer').order_by('-rating')[:6]
-    recent_games = Game.objects.select_related('developer').order_by('-release_date')[:6]
-    popular_games = Game.objects.select_related('developer').annotate(
-        review_count=Count('reviews')
-    ).order_by('-review_count')[:6]
-    
+    sections = get_or_compute(HOME_SECTIONS, home_section_ids, HOME_CACHE_TIMEOUT)
+    # Una sola consulta para los juegos de las tres secciones
+    games = Game.objects.select_related('developer').in_bulk(
+        {pk for ids in sections.values() for pk in ids}
+    )
     context = {
-        'featured_games': featured_games,
-        'recent_games': recent_games,
-        'popular_games': popular_games,
+        name: [games[pk] for pk in ids if pk in games]
+        for name, ids in sections.items()
     }
     
     if request.user.is_authenticated:
-        context['my_library_count'] = UserLibrary.objects.filter(user=request.user).count()
+        context['my_library_count'] = UserStats.for_user(request.user.pk).library_count
     
     return render(request, 'library/home.html', context)
 
@@ -342,17 +418,10 @@ def user_profile_view(request, pk):
     """Perfil de usuario"""
     User = get_user_model()
     user = get_object_or_404(User, pk=pk)
-    library_count = UserLibrary.objects.filter(user=user).count()
-    reviews_count = Review.objects.filter(user=user).count()
-    total_hours = UserLibrary.objects.filter(user=user).aggregate(
-        total=Sum('hours_played')
-    )['total'] or 0
     
     return render(request, 'library/user_profile.html', {
         'profile_user': user,
-        'library_count': library_count,
-        'reviews_count': reviews_count,
-        'total_hours': total_hours,
+        'stats': UserStats.for_user(user.pk),
     })
 
 
@@ -364,11 +433,11 @@ class DeveloperListView(ListView):
     paginate_by = 12
 
     def get_queryset(self):
-        queryset = Developer.objects.annotate(game_count=Count('games'))
+        queryset = Developer.objects.all()
         query = self.request.GET.get('q')
         if query:
             queryset = queryset.filter(name__icontains=query)
-        return queryset.order_by('-game_count')
+        return queryset.order_by('-game_count', 'name')
 
 
 class DeveloperDetailView(DetailView):
@@ -390,10 +459,8 @@ class DeveloperDetailView(DetailView):
 @login_required
 def notifications_view(request):
     """Vista de notificaciones"""
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')
-    paginator = Paginator(notifications, 10)
-    page = request.GET.get('page')
-    notifications = paginator.get_page(page)
+    notifications = Notification.objects.filter(user=request.user).order_by('-created_at', '-id')
+    notifications = paginate_request(request, notifications, 10)
     
     return render(request, 'library/notifications.html', {
         'notifications': notifications
@@ -406,30 +473,62 @@ def mark_notification_read(request, pk):
     """Marcar notificación como leída"""
     notification = get_object_or_404(Notification, pk=pk, user=request.user)
     notification.is_read = True
-    notification.save()
+    notification.save(update_fields=['is_read'])
     return JsonResponse({'status': 'ok'})
 
 
+@login_required
+@require_http_methods(["POST"])
+def mark_all_notifications_read(request):
+    """Marcar todas las notificaciones como leídas"""
+    updated = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    # update() no emite señales
+    reset_unread_notifications(request.user.pk)
+    messages.success(request, f'{updated} notificaciones marcadas como leídas.')
+    return redirect('library:notifications')
+
+
 # ==================== EXPORTAR DATOS ====================
 
+# Filas que se leen de la base de datos por vuelta al exportar
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """Pseudo-búfer para csv.writer: ``write`` devuelve la línea en lugar de guardarla"""
+
+    def write(self, value):
+        return value
+
+
+def library_csv_rows(user):
+    """Genera el CSV de la biblioteca línea por línea, leyendo la base de datos por lotes"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(['Juego', 'Desarrollador', 'Horas Jugadas', 'Favorito', 'Fecha Agregado'])
+    rows = UserLibrary.objects.filter(user=user).values_list(
+        'game__title', 'game__developer__name', 'hours_played', 'is_favorite', 'date_added'
+    )
+    for title, developer, hours_played, is_favorite, date_added in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield writer.writerow([
+            title,
+            developer if developer is not None else 'N/A',
+            hours_played,
+            'Sí' if is_favorite else 'No',
+            date_added.strftime('%Y-%m-%d')
+        ])
+
+
 @login_required
 def export_library_csv(request):
-    """Exportar biblioteca a CSV"""
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="mi_biblioteca.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Juego', 'Desarrollador', 'Horas Jugadas', 'Favorito', 'Fecha Agregado'])
-    
-    library_items = UserLibrary.objects.filter(user=request.user).select_related('game', 'game__developer')
-    for item in library_items:
-        writer.writerow([
-            item.game.title,
-            item.game.developer.name if item.game.developer else 'N/A',
-            item.hours_played,
-            'Sí' if item.is_favorite else 'No',
-            item.date_added.strftime('%Y-%m-%d')
-        ])
-    
+    """Exportar biblioteca a CSV (en streaming).
+
+    El staff puede exportar la biblioteca de otro usuario con ``?user=<id>``.
+    """
+    user = request.user
+    if request.user.is_staff and request.GET.get('user', '').isdigit():
+        user = get_object_or_404(get_user_model(), pk=request.GET['user'])
+    filename = 'mi_biblioteca.csv' if user == request.user else f'biblioteca_{user.username}.csv'
+    response = StreamingHttpResponse(library_csv_rows(user), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
 
@@ -15,3 +15,13 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'steam_library.settings')
 
 application = get_asgi_application()
 
+# Exportaciones que un reinicio dejó en curso (library.jobs)
+from django.db import DatabaseError  # noqa: E402
+from library.jobs import fail_stale_jobs  # noqa: E402
+
+try:
+    fail_stale_jobs()
+except DatabaseError:
+    # Base de datos todavía sin migrar
+    pass
+
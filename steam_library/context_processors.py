@@ -1,13 +1,21 @@
 """
 Context processors personalizados
 """
-from library.models import Notification
+from functools import lru_cache
+
+from library.caching import unread_notifications_count
 
 
 def notifications_count(request):
-    """Agrega el conteo de notificaciones no leídas al contexto"""
-    if request.user.is_authenticated:
-        unread_count = Notification.objects.filter(user=request.user, is_read=False).count()
-        return {'unread_notifications_count': unread_count}
-    return {'unread_notifications_count': 0}
+    """Agrega el conteo de notificaciones no leídas al contexto.
+
+    El valor es un callable que la plantilla evalúa al usarlo: las páginas que
+    no muestran el contador no consultan la caché ni la base de datos.
+    """
+    @lru_cache(maxsize=None)
+    def unread_count():
+        if request.user.is_authenticated:
+            return unread_notifications_count(request.user.pk)
+        return 0
 
+    return {'unread_notifications_count': unread_count}
@@ -81,6 +81,28 @@ DATABASES = {
 }
 
 
+# Caché compartida por todos los procesos: guarda los contadores de versión,
+# el registro de cambios del autocompletado y los conteos de no leídas.
+# CACHE_BACKEND: database (requiere `python manage.py createcachetable`), redis,
+# memcached o locmem (solo sirve con un único proceso, como runserver). Por
+# defecto locmem con DEBUG y database sin él. CACHE_LOCATION reemplaza la ubicación.
+CACHE_BACKENDS = {
+    'database': ('django.core.cache.backends.db.DatabaseCache', 'library_cache'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+    'memcached': ('django.core.cache.backends.memcached.PyMemcacheCache', '127.0.0.1:11211'),
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', ''),
+}
+CACHE_BACKEND, CACHE_DEFAULT_LOCATION = CACHE_BACKENDS[
+    os.environ.get('CACHE_BACKEND', 'locmem' if DEBUG else 'database')
+]
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION') or CACHE_DEFAULT_LOCATION,
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -158,3 +180,17 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+
+# Búsqueda de texto completo: ruta a una clase de library.search
+# (por defecto se elige según el motor de base de datos)
+LIBRARY_SEARCH_BACKEND = os.environ.get('LIBRARY_SEARCH_BACKEND') or None
+
+# Serialización rápida (desde values()) en los listados de juegos y reseñas de la API
+LIBRARY_FAST_SERIALIZERS = os.environ.get('LIBRARY_FAST_SERIALIZERS', 'False') == 'True'
+
+# Hilos del pool que genera las exportaciones en segundo plano (library.jobs)
+LIBRARY_EXPORT_WORKERS = int(os.environ.get('LIBRARY_EXPORT_WORKERS', 2))
+
+# Días que se conserva el registro de cambios de /api/sync/ (comando prune_changelog);
+# un token más antiguo recibe una copia completa
+LIBRARY_SYNC_RETENTION_DAYS = int(os.environ.get('LIBRARY_SYNC_RETENTION_DAYS', 30))